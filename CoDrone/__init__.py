@@ -1,15 +1,37 @@
 __all__ = [
+    "asynccodrone",
     "crc",
+    "devicecache",
+    "fleet",
+    "shardedfleet",
+    "flightlog",
+    "metrics",
     "codrone",
+    "connector",
+    "controller",
     "protocol",
     "receiver",
+    "scheduler",
     "storage",
+    "subscription",
     "system",
+    "writer",
     ]
 
 from CoDrone.codrone import *
+from CoDrone.asynccodrone import *
 from CoDrone.storage import *
 from CoDrone.system import *
+from CoDrone.connector import *
+from CoDrone.controller import *
 from CoDrone.crc import *
+from CoDrone.devicecache import *
+from CoDrone.fleet import *
+from CoDrone.flightlog import *
+from CoDrone.metrics import *
 from CoDrone.protocol import *
 from CoDrone.receiver import *
+from CoDrone.scheduler import *
+from CoDrone.shardedfleet import *
+from CoDrone.subscription import *
+from CoDrone.writer import *
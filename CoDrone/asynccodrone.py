@@ -0,0 +1,679 @@
+import asyncio
+import os
+from operator import eq
+from time import time
+
+import serial
+from serial.tools.list_ports import comports
+
+from CoDrone.codrone import convertByteArrayToString, makeTransferDataArray
+from CoDrone.connector import *
+from CoDrone.devicecache import *
+from CoDrone.receiver import *
+from CoDrone.storage import *
+
+
+class AsyncCoDrone:
+    """asyncio version of CoDrone. The serial port is read by the event loop(add_reader on the port's file
+    descriptor, polling where the port has none), so one loop can drive many drones without blocking threads.
+    Writes never block the loop either: what the port does not take at once is queued and written when the port is
+    writable again(add_writer, or the poll task), see _write().
+
+    Examples:
+        >>> drone = AsyncCoDrone()
+        >>> await drone.connect()
+        >>> await drone.takeoff()
+        >>> height = await drone.getHeight()
+        >>> async for attitude in drone.telemetry(DataType.Attitude):
+        ...     print(attitude.yaw)
+    """
+
+    def __init__(self, flagShowErrorMessage=False, flagShowLogMessage=False):
+
+        self._serialport = None
+        self._loop = None
+        self._taskPoll = None
+        self._fileno = None                 # file descriptor registered to the loop, None while polling
+        self._receiveBuffer = bytearray(4096)
+        self._sendBuffer = bytearray()      # bytes the port did not take yet, in order
+
+        self._receiver = Receiver()
+        self._controlFrame = ControlFrame()
+
+        self._flagShowErrorMessage = flagShowErrorMessage
+        self._flagShowLogMessage = flagShowLogMessage
+
+        self._storageHeader = StorageHeader()
+        self._storage = Storage()
+        self._storageCount = StorageCount()
+        self._storageHistory = StorageHistory()
+        self._parser = Parser()
+        self._eventHandler = EventHandler()
+
+        self._waiters = {dataType: [] for dataType in DataType}        # futures of _getDataWhile, _checkAck
+        self._subscribers = {dataType: [] for dataType in DataType}    # queues of telemetry()
+
+        self._devices = []
+        self._eventLink = asyncio.Event()      # set on every link event and discovered device
+        self._eventConnected = asyncio.Event()
+        self._connector = None                  # LinkConnector of a running connect()
+        self.deviceCache = None                 # DeviceCache of the drones connected before, None to always scan
+        self._flagConnected = False
+
+        # Data
+        self._timer = Timer()
+        self._data = Data(self._timer)
+        self._cache = SensorCache()
+        self._setAllEventHandler()
+
+        # Parameter
+        self._lowBatteryPercent = 30
+
+    ### DATA PROCESSING -------- START
+
+    def _setAllEventHandler(self):
+        self._eventHandler.d[DataType.Address] = self._data.eventUpdateAddress
+        self._eventHandler.d[DataType.Attitude] = self._data.eventUpdateAttitude
+        self._eventHandler.d[DataType.Battery] = self._data.eventUpdateBattery
+        self._eventHandler.d[DataType.Pressure] = self._data.eventUpdatePressure
+        self._eventHandler.d[DataType.Range] = self._data.eventUpdateRange
+        self._eventHandler.d[DataType.State] = self._data.eventUpdateState
+        self._eventHandler.d[DataType.Imu] = self._data.eventUpdateImu
+        self._eventHandler.d[DataType.TrimFlight] = self._data.eventUpdateTrim
+        self._eventHandler.d[DataType.ImageFlow] = self._data.eventUpdateImageFlow
+        self._eventHandler.d[DataType.Ack] = self._data.eventUpdateAck
+
+    def _onReadable(self):
+        """Reader callback of the event loop, pass every waiting byte to the receiver at once.
+        """
+        try:
+            size = self._serialport.readinto(self._receiveBuffer)
+        except (OSError, serial.SerialException) as error:
+            self._printError(">> Serial port error : {0}".format(error))
+            self.close()
+            return
+
+        if size:
+            self._onReceive(memoryview(self._receiveBuffer)[:size])
+
+    def _onWritable(self):
+        """Writer callback of the event loop, write as much of the queued bytes as the port takes.
+        """
+        try:
+            size = self._writeSome(self._sendBuffer)
+        except (OSError, serial.SerialException) as error:
+            self._printError(">> Serial port error : {0}".format(error))
+            size = len(self._sendBuffer)    # drop them, the reader closes a broken port
+
+        del self._sendBuffer[:size]
+        if (not self._sendBuffer) and (self._fileno is not None):
+            self._loop.remove_writer(self._fileno)
+
+    async def _poll(self):
+        """Reader and writer task for serial ports without a file descriptor.
+        """
+        while self.isOpen():
+            if self._serialport.in_waiting > 0:
+                self._onReadable()
+            if self._sendBuffer:
+                self._onWritable()
+            await asyncio.sleep(0.001)
+
+    def _onReceive(self, dataArray):
+        frames = self._receiver.scan(dataArray)
+
+        for message in self._receiver.errors:
+            self._printError(message)
+
+        for header, data in frames:
+            self._handler(header, data)
+
+    def _handler(self, header, dataArray):
+        """Parse and store the data, run the event handler and wake up the waiters and subscribers.
+        """
+        dataType = header.dataType
+
+        if self._parser.d[dataType] is not None:
+            self._storageHeader.d[dataType] = header
+            self._storage.d[dataType] = self._parser.d[dataType](dataArray)
+            if self._storage.d[dataType] is not None:
+                self._cache.update(dataType)
+
+        if (self._storageHistory.d[dataType] is not None) and (self._storage.d[dataType] is not None):
+            self._storageHistory.d[dataType].append(dataArray, time())
+
+        data = self._storage.d[dataType]
+        self._storageCount.d[dataType] += 1
+
+        # no parser or a payload of another length, nothing to hand out
+        if data is None:
+            return
+
+        if self._eventHandler.d[dataType] is not None:
+            self._eventHandler.d[dataType](data)
+
+        if dataType == DataType.LinkEvent:
+            self._eventLinkHandler(data.eventLink)
+        elif dataType == DataType.LinkEventAddress:
+            self._eventLinkHandler(data.eventLink, data.address)
+        elif dataType == DataType.LinkDiscoveredDevice:
+            self._eventLinkDiscoveredDevice(data)
+
+        # Ack is waited for by the data type it answers
+        waiters = self._waiters[data.dataType if dataType == DataType.Ack else dataType]
+        while waiters:
+            future = waiters.pop()
+            if not future.done():
+                future.set_result(data)
+
+        for queue in self._subscribers[dataType]:
+            if queue.full():
+                queue.get_nowait()  # drop the oldest
+            queue.put_nowait(data)
+
+    def _eventLinkHandler(self, eventLink, address=None):
+        if eventLink == EventLink.Scanning:
+            self._devices.clear()
+
+        elif eventLink == EventLink.Connected:
+            self._flagConnected = True
+            self._eventConnected.set()
+
+        elif eventLink == EventLink.Disconnected:
+            self._flagConnected = False
+            self._eventConnected.clear()
+
+        if self._connector is not None:
+            self._connector.onLinkEvent(eventLink, self._loop.time(), address)
+        self._eventLink.set()
+
+        self._printLog(eventLink)
+
+    def _eventLinkDiscoveredDevice(self, data):
+        self._devices.append(data)
+
+        if self._connector is not None:
+            self._connector.onDiscovered(data, self._loop.time())
+        self._eventLink.set()
+
+        self._printLog(
+            "LinkDiscoveredDevice / {0} / {1} / {2} / {3}".format(data.index, convertByteArrayToString(data.address),
+                                                                  data.name, data.rssi))
+
+    ### DATA PROCESSING -------- END
+
+
+    ### PRIVATE -------- START
+
+    def _transfer(self, header, data):
+        if not self.isOpen():
+            return
+
+        dataArray = makeTransferDataArray(header, data)
+        self._write(dataArray)
+        return dataArray
+
+    def _write(self, dataArray):
+        """Write without blocking the event loop. Bytes the port does not take at once are queued behind the
+        ones already waiting and written by _onWritable().
+        """
+        if not self._sendBuffer:
+            try:
+                size = self._writeSome(dataArray)
+            except (OSError, serial.SerialException) as error:
+                self._printError(">> Serial port error : {0}".format(error))
+                return
+
+            if size >= len(dataArray):
+                return
+            dataArray = dataArray[size:]
+            if self._fileno is not None:
+                self._loop.add_writer(self._fileno, self._onWritable)
+
+        self._sendBuffer += dataArray
+
+    def _writeSome(self, dataArray):
+        """Returns: The number of bytes the port took, 0 if it is not writable now.
+        """
+        if self._fileno is not None:
+            try:
+                return os.write(self._fileno, dataArray)     # the port is opened non-blocking
+            except BlockingIOError:
+                return 0
+        return self._serialport.write(dataArray) or 0   # write_timeout=0: what fits, without waiting
+
+    def _sendCommand(self, commandType, option=0):
+        header = Header()
+
+        header.dataType = DataType.Command
+        header.length = Command.getSize()
+
+        data = Command()
+
+        data.commandType = commandType
+        data.option = option
+
+        return self._transfer(header, data)
+
+    async def _waitData(self, dataType, send, timeOnce, timeAll, count):
+        """Call send() and wait for dataType, calling send() again every timeOnce sec at most count times.
+
+        Returns: The received data, None if timeAll sec passed.
+        """
+        future = self._loop.create_future()
+        self._waiters[dataType].append(future)
+
+        timeStart = self._loop.time()
+        flag = 1
+        send()
+
+        try:
+            while True:
+                timeNext = timeOnce * flag if flag < count else timeAll
+                try:
+                    return await asyncio.wait_for(asyncio.shield(future),
+                                                  max(0, timeNext - (self._loop.time() - timeStart)))
+                except asyncio.TimeoutError:
+                    if flag < count:
+                        send()
+                        flag += 1
+                    else:
+                        return None
+        finally:
+            if future in self._waiters[dataType]:
+                self._waiters[dataType].remove(future)
+
+    async def _checkAck(self, header, data, timeOnce=0.03, timeAll=0.2, count=5):
+        """Transfer the data and wait for its ack, same resend schedule as CoDrone._checkAck().
+
+        Returns: True if the ack arrived, False otherwise.
+        """
+        ack = await self._waitData(header.dataType, lambda: self._transfer(header, data), timeOnce, timeAll, count)
+        if ack is None:
+            self._printError(">> Failed to receive ack : {}".format(header.dataType))
+        return ack is not None
+
+    async def _getDataWhile(self, dataType, maxAge=0):
+        """Request the data, resend every 0.03 sec maximum 3 times and wait 0.15 sec in total.
+        The request is skipped while the stored data is at most maxAge sec old, see CoDrone._getDataWhile().
+
+        Returns: True if the stored data is fresh or the data arrived, False otherwise.
+        """
+        if self._cache.isFresh(dataType, maxAge):
+            return True
+
+        data = await self._waitData(dataType, lambda: self.sendRequest(dataType), 0.03, 0.15, 3)
+        return data is not None
+
+    def _printLog(self, message):
+        if self._flagShowLogMessage and message is not None:
+            print("[AsyncCoDrone] {0}".format(message))
+
+    def _printError(self, message):
+        if self._flagShowErrorMessage and message is not None:
+            print("[AsyncCoDrone] {0}".format(message))
+
+    ### PRIVATE -------- END
+
+
+    ### PUBLIC COMMON -------- START
+
+    def isOpen(self):
+        if self._serialport is not None:
+            return self._serialport.isOpen()
+        else:
+            return False
+
+    def isConnected(self):
+        return self.isOpen() and self._flagConnected
+
+    def open(self, portName="None"):
+        """Open serial port and register it to the running event loop.
+
+        Args: Serial port name such as "COM14". If not specified, the last detected port.
+
+        Returns: True if port is opened, false otherwise.
+        """
+        if eq(portName, "None"):
+            nodes = comports()
+            if len(nodes) > 0:
+                portName = nodes[len(nodes) - 1].device
+            else:
+                return False
+
+        self._loop = asyncio.get_running_loop()
+        self._serialport = serial.Serial(
+            port=portName,
+            baudrate=115200,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            bytesize=serial.EIGHTBITS,
+            timeout=0,
+            write_timeout=0)
+
+        if not self.isOpen():
+            self._printError(">> Could not open the serial port.")
+            return False
+
+        self._sendBuffer.clear()
+        try:
+            self._fileno = self._serialport.fileno()
+            self._loop.add_reader(self._fileno, self._onReadable)
+        except (AttributeError, NotImplementedError, OSError):
+            self._fileno = None
+            self._taskPoll = self._loop.create_task(self._poll())
+
+        self._printLog(">> Connected.({0})".format(portName))
+        return True
+
+    def close(self):
+        if self._serialport is None:
+            return
+
+        if self.isOpen():
+            self.sendLinkDisconnect()
+            if self._sendBuffer:
+                self._onWritable()  # last try, the rest is dropped with the port
+
+            if self._taskPoll is not None:
+                self._taskPoll.cancel()
+                self._taskPoll = None
+            elif self._fileno is not None:
+                self._loop.remove_reader(self._fileno)
+                self._loop.remove_writer(self._fileno)
+                self._fileno = None
+
+            self._sendBuffer.clear()
+            self._serialport.close()
+
+        self._flagConnected = False
+
+    async def connect(self, deviceName="None", portName="None", timeout=5, retries=5, discoverWindow=0.3,
+                      readyTimeout=1.2, directTimeout=1.0):
+        """Open the serial port if needed, search for CODRONE and connect it.
+        Every step ends with the LinkEvent which completes it, see LinkConnector. With a DeviceCache in
+        deviceCache(None by default), a deviceName connected before through the same port is connected directly
+        and every connection is written to the cache file, see CoDrone.connect().
+
+        Args:
+            deviceName: 4 digit device name. If not specified, the device with the strongest signal.
+            portName: Serial port name.
+            timeout: Seconds to wait for the discovery and for the connection of each attempt.
+            retries: Attempts to discover and connect.
+            discoverWindow: Seconds to wait for more devices after the first one without a deviceName.
+            readyTimeout: Seconds to wait for ReadyToControl after the connection.
+            directTimeout: Seconds to wait for the direct connection of a known device.
+
+        Returns: True if connected, false otherwise.
+        """
+        if (not eq(deviceName, "None")) and (len(deviceName) != 4):
+            self._printError(">> Device name length error(" + deviceName + ").")
+            return False
+
+        if not self.isOpen():
+            self.open(portName)
+
+        if not self.isOpen():
+            self._printError(">> Could not connect to serial port.")
+            return False
+
+        # the LINK acks its own commands
+        await self._waitData(DataType.Command, lambda: self.sendLinkModeBroadcast(ModeLinkBroadcast.Passive),
+                             0.1, 0.1, 1)
+
+        known = None
+        if (self.deviceCache is not None) and (not eq(deviceName, "None")):
+            known = self.deviceCache.get(deviceName)
+            if (known is not None) and (known.portName != self._serialport.port):
+                known = None
+
+        connector = LinkConnector(self.sendLinkDiscoverStart, self.sendLinkDiscoverStop, self.sendLinkConnect,
+                                  deviceName, timeout, retries, discoverWindow, readyTimeout, known, directTimeout,
+                                  self.sendLinkDisconnect)
+        self._flagConnected = False
+        self._devices.clear()
+        self._connector = connector
+        try:
+            connector.start(self._loop.time())
+            while True:
+                deadline = connector.getDeadline()
+                if deadline is None:
+                    break
+                self._eventLink.clear()
+                try:
+                    await asyncio.wait_for(self._eventLink.wait(), max(0, deadline - self._loop.time()))
+                except asyncio.TimeoutError:
+                    pass
+                connector.poll(self._loop.time())
+        finally:
+            self._connector = None
+
+        if not (connector.isReady() and self._flagConnected):
+            self._printError(">> Fail to connect.")
+            return False
+
+        if self.deviceCache is not None:
+            device = connector.target
+            if connector.address is not None:
+                device.address = connector.address
+            self.deviceCache.remember(device, self._serialport.port)
+
+        battery = await self.getBatteryPercentage()
+        if battery < self._lowBatteryPercent:
+            self._printLog(">> Low Battery!!")
+        return True
+
+    def telemetry(self, dataType, maxsize=16):
+        """Async iterator over the received data of dataType. If the consumer is slower than the stream,
+        the oldest data is dropped.
+
+        Examples:
+            >>> async for attitude in drone.telemetry(DataType.Attitude):
+            ...     print(attitude.roll, attitude.pitch, attitude.yaw)
+        """
+        queue = asyncio.Queue(maxsize)
+        subscribers = self._subscribers[dataType]
+
+        async def iterate():
+            subscribers.append(queue)
+            try:
+                while True:
+                    yield await queue.get()
+            finally:
+                subscribers.remove(queue)
+
+        return iterate()
+
+    def getData(self, dataType):
+        return self._storage.d[dataType]
+
+    def getCount(self, dataType):
+        return self._storageCount.d[dataType]
+
+    def enableHistory(self, dataType, capacity=1024):
+        """Keep the last capacity records of a numeric DataType, see CoDrone.enableHistory().
+        """
+        if (self._storageHistory.d[dataType] is None) or (self._storageHistory.d[dataType].capacity != capacity):
+            self._storageHistory.d[dataType] = History(dataType, capacity)
+
+        return self._storageHistory.d[dataType]
+
+    def getHistory(self, dataType):
+        return self._storageHistory.d[dataType]
+
+    def setMaxAge(self, dataType, seconds):
+        self._cache.maxAge[dataType] = seconds
+
+    def getCacheStats(self):
+        return self._cache.snapshot()
+
+    ### PUBLIC COMMON -------- END
+
+
+    ### SENDING -------- START
+
+    def sendRequest(self, dataType):
+        header = Header()
+
+        header.dataType = DataType.Request
+        header.length = Request.getSize()
+
+        data = Request()
+        data.dataType = dataType
+
+        return self._transfer(header, data)
+
+    def sendControl(self, roll, pitch, yaw, throttle):
+        """Send one control frame. Values are from -100 to 100.
+        """
+        if not self.isOpen():
+            return
+
+        dataArray = self._controlFrame.setAll(roll, pitch, yaw, throttle)
+        self._write(dataArray)
+        return dataArray
+
+    async def sendControlDuration(self, roll, pitch, yaw, throttle, duration):
+        """Send control every 0.02 sec for the duration, then hover for 1 sec.
+        """
+        timeStart = self._loop.time()
+        while (self._loop.time() - timeStart) < duration:
+            self.sendControl(roll, pitch, yaw, throttle)
+            await asyncio.sleep(0.02)
+
+        await self.hover(1)
+
+    def sendLinkModeBroadcast(self, modeLinkBroadcast):
+        return self._sendCommand(CommandType.LinkModeBroadcast, modeLinkBroadcast.value)
+
+    def sendLinkDiscoverStart(self):
+        return self._sendCommand(CommandType.LinkDiscoverStart)
+
+    def sendLinkDiscoverStop(self):
+        return self._sendCommand(CommandType.LinkDiscoverStop)
+
+    def sendLinkConnect(self, index):
+        return self._sendCommand(CommandType.LinkConnect, index)
+
+    def sendLinkDisconnect(self):
+        return self._sendCommand(CommandType.LinkDisconnect)
+
+    ### SENDING -------- END
+
+
+    ### FLIGHT COMMANDS -------- START
+
+    async def takeoff(self):
+        """Take off and hover for 3 sec to stabilize.
+        """
+        self._data.takeoffFuncFlag = 1
+
+        header = Header()
+        header.dataType = DataType.Command
+        header.length = Command.getSize()
+
+        data = Command()
+        data.commandType = CommandType.FlightEvent
+        data.option = FlightEvent.TakeOff.value
+
+        if not await self._checkAck(header, data):
+            self._printError(">> Failed to takeoff")
+        await asyncio.sleep(3)
+
+    async def land(self):
+        """Stop all commands, hover and make a soft landing.
+        """
+        header = Header()
+        header.dataType = DataType.Command
+        header.length = Command.getSize()
+
+        data = Command()
+        data.commandType = CommandType.FlightEvent
+        data.option = FlightEvent.Landing.value
+
+        if not await self._checkAck(header, data):
+            self._printError(">> Failed to land")
+        await asyncio.sleep(3)
+
+    async def hover(self, duration=0):
+        """Hover for duration sec. If 0, send one hover control and wait for the ack.
+        """
+        if duration != 0:
+            timeStart = self._loop.time()
+            while (self._loop.time() - timeStart) < duration:
+                self.sendControl(0, 0, 0, 0)
+                await asyncio.sleep(0.1)
+        else:
+            header = Header()
+            header.dataType = DataType.Control
+            header.length = Control.getSize()
+
+            if not await self._checkAck(header, Control()):
+                self._printError(">> Failed to hover")
+
+    async def emergencyStop(self):
+        """Stop all motors immediately.
+        """
+        self._data.stopFuncFlag = 1
+
+        header = Header()
+        header.dataType = DataType.Command
+        header.length = Command.getSize()
+
+        data = Command()
+        data.commandType = CommandType.Stop
+        data.option = 0
+
+        if not await self._checkAck(header, data):
+            self._printError(">> Failed to emergency stop")
+
+    ### FLIGHT COMMANDS -------- END
+
+
+    ### SENSORS -------- START
+
+    async def getHeight(self, maxAge=None):
+        await self._getDataWhile(DataType.Range, maxAge)
+        return self._data.range
+
+    async def getPressure(self, maxAge=None):
+        await self._getDataWhile(DataType.Pressure, maxAge)
+        return self._data.pressure
+
+    async def getDroneTemp(self, maxAge=None):
+        await self._getDataWhile(DataType.Pressure, maxAge)
+        return self._data.temperature
+
+    async def getAngularSpeed(self, maxAge=None):
+        await self._getDataWhile(DataType.Imu, maxAge)
+        return self._data.gyro
+
+    async def getGyroAngles(self, maxAge=None):
+        await self._getDataWhile(DataType.Attitude, maxAge)
+        return self._data.attitude
+
+    async def getAccelerometer(self, maxAge=None):
+        await self._getDataWhile(DataType.Imu, maxAge)
+        return self._data.accel
+
+    async def getOptFlowPosition(self, maxAge=None):
+        await self._getDataWhile(DataType.ImageFlow, maxAge)
+        return self._data.imageFlow
+
+    async def getState(self, maxAge=None):
+        await self._getDataWhile(DataType.State, maxAge)
+        return self._data.state.name
+
+    async def getBatteryPercentage(self, maxAge=None):
+        await self._getDataWhile(DataType.Battery, maxAge)
+        return self._data.batteryPercent
+
+    async def getBatteryVoltage(self, maxAge=None):
+        await self._getDataWhile(DataType.Battery, maxAge)
+        return self._data.batteryVoltage
+
+    async def getTrim(self, maxAge=None):
+        await self._getDataWhile(DataType.TrimFlight, maxAge)
+        return self._data.trim
+
+    ### SENSORS -------- END
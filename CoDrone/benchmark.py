@@ -0,0 +1,466 @@
+import argparse
+from binascii import crc_hqx
+import json
+import os
+import platform
+import random
+import tracemalloc
+from time import perf_counter, perf_counter_ns
+
+from CoDrone.codrone import CoDrone
+from CoDrone.crc import CRC16
+from CoDrone.protocol import *
+from CoDrone.receiver import Receiver, StateLoading
+from CoDrone.storage import Parser
+from CoDrone.writer import FrameWriter, TransferPriority
+
+
+def makeFrameBodies():
+    """Make the crc input(header + data) of every frame type in protocol.py.
+
+    Returns: A list of (DataType, bytes). Each type appears with its default values and with random data.
+    """
+    bodies = []
+
+    for dataType in DataType:
+        cls = globals().get(dataType.name)
+        if (cls is None) or (not isinstance(cls, type)) or (not issubclass(cls, ISerializable)):
+            continue
+
+        size = cls.getSize()
+
+        header = Header()
+        header.dataType = dataType
+        header.length = size
+
+        # some toArray() of the receive only types do not work with the default values
+        try:
+            dataArray = bytes(cls().toArray())
+        except Exception:
+            dataArray = None
+
+        if (dataArray is not None) and (len(dataArray) == size):
+            bodies.append((dataType, header.toArray() + dataArray))
+
+        bodies.append((dataType, header.toArray() + os.urandom(size)))
+
+    return bodies
+
+
+def _timeit(func, bodies, repeat):
+    timeStart = perf_counter()
+    for i in range(repeat):
+        for dataType, body in bodies:
+            func(body, 0)
+    return (perf_counter() - timeStart) / (repeat * len(bodies))
+
+
+def benchmarkCrc16(repeat=2000):
+    """Check every crc engine against the table implementation and measure ns per frame.
+
+    Returns: A dict of engine name and ns per frame.
+
+    Raises: AssertionError if an engine does not match the table implementation.
+    """
+    bodies = makeFrameBodies()
+
+    engines = {
+        "table": CRC16.calcTable,
+        "hqx": lambda data, crc: crc_hqx(data, crc),
+    }
+
+    for dataType, body in bodies:
+        expected = CRC16.calcTable(body, 0)
+        for name, func in engines.items():
+            assert func(body, 0) == expected, "{0} / {1} crc mismatch".format(name, dataType)
+            assert func(memoryview(body), 0) == expected, "{0} / {1} crc mismatch".format(name, dataType)
+
+    result = {}
+    for name, func in engines.items():
+        result[name] = _timeit(func, bodies, repeat) * 1e9
+
+    return result
+
+
+def _measureHistory(factory, count):
+    tracemalloc.start()
+    snapshotStart = tracemalloc.take_snapshot()
+    history = [factory() for i in range(count)]
+    snapshotEnd = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    size = sum(stat.size_diff for stat in snapshotEnd.compare_to(snapshotStart, "filename"))
+    del history
+    return size / count
+
+
+def benchmarkMemory(count=100000):
+    """Measure the bytes per instance when a long history of telemetry objects is kept in a list.
+    Each slotted class is compared with the same class without __slots__(a per-instance __dict__).
+
+    Returns: A dict of class name and (bytes with __dict__, bytes with __slots__).
+    """
+    result = {}
+
+    for cls in (Attitude, Imu, Range, Pressure, ImageFlow, Battery, State):
+        dataArray = bytes(cls.getSize())
+        dictClass = type(cls.__name__ + "Dict", (), {"__init__": cls.__init__, "struct": cls.struct,
+                                                      "parseFrom": classmethod(cls.parseFrom.__func__)})
+
+        sizeDict = _measureHistory(lambda: dictClass.parseFrom(dataArray), count)
+        sizeSlots = _measureHistory(lambda: cls.parseFrom(dataArray), count)
+        result[cls.__name__] = (sizeDict, sizeSlots)
+
+    for cls, args in ((Angle, (1, 2, 3)), (Axis, (1, 2, 3)), (Position, (1, 2)), (Flight, (1, 2, 3, 4))):
+        dictClass = type(cls.__name__ + "Dict", (), {"__init__": cls.__init__})
+
+        sizeDict = _measureHistory(lambda: dictClass(*args), count)
+        sizeSlots = _measureHistory(lambda: cls(*args), count)
+        result[cls.__name__] = (sizeDict, sizeSlots)
+
+    return result
+
+
+# received data types of the synthetic streams
+streamTypes = (DataType.Attitude, DataType.Imu, DataType.Range, DataType.Pressure, DataType.ImageFlow,
+               DataType.Battery, DataType.State, DataType.Ack, DataType.TrimFlight)
+
+
+def _makeFrame(dataType, dataArray):
+    body = bytes([dataType.value, len(dataArray)]) + bytes(dataArray)
+    return b'\x0A\x55' + body + pack('<H', CRC16.calc(body, 0))
+
+
+def makeStream(count=10000, corruptRatio=0.05, partialRatio=0.02, seed=0):
+    """Make a received byte stream of mixed data types. Some frames have a broken crc and some are cut off
+    in the middle, as they are dropped on a noisy serial line.
+
+    Returns: (stream bytes, number of valid frames in the stream)
+    """
+    generator = random.Random(seed)
+    stream = bytearray()
+    valid = 0
+
+    for i in range(count):
+        dataType = generator.choice(streamTypes)
+        size = globals()[dataType.name].getSize()
+
+        if dataType == DataType.State:
+            dataArray = State().toArray()
+        elif dataType == DataType.Ack:
+            dataArray = pack('<IB', generator.getrandbits(32), DataType.Command.value)
+        else:
+            dataArray = bytes(generator.getrandbits(8) for j in range(size))
+
+        frame = bytearray(_makeFrame(dataType, dataArray))
+
+        chance = generator.random()
+        if chance < corruptRatio:
+            frame[-1] ^= 0xFF
+        elif chance < corruptRatio + partialRatio:
+            frame = frame[:generator.randrange(3, len(frame) - 1)]
+        else:
+            valid += 1
+
+        stream.extend(frame)
+
+    return bytes(stream), valid
+
+
+def splitStream(stream, chunkSize):
+    return [stream[i:i + chunkSize] for i in range(0, len(stream), chunkSize)]
+
+
+def _percentile(values, ratio):
+    index = min(len(values) - 1, int(len(values) * ratio))
+    return values[index]
+
+
+def _measure(func, items, frames, repeat=5):
+    """Measure func(item) over every item.
+
+    Returns: A dict with
+        framesPerSec, nsPerFrame: throughput of the best of repeat runs.
+        allocBytesPerFrame: bytes allocated(traced peak) per frame while running every item once.
+        leakBytesPerFrame, leakBlocksPerFrame: memory still allocated per frame after one run, from a tracemalloc
+            snapshot diff without the allocations of tracemalloc itself.
+        p50Ns, p99Ns: latency of one func(item) call.
+    """
+    best = None
+    for i in range(repeat):
+        timeStart = perf_counter()
+        for item in items:
+            func(item)
+        interval = perf_counter() - timeStart
+        best = interval if best is None else min(best, interval)
+
+    latencies = []
+    for item in items:
+        timeStart = perf_counter_ns()
+        func(item)
+        latencies.append(perf_counter_ns() - timeStart)
+    latencies.sort()
+
+    allocated = 0
+    tracemalloc.start()
+    snapshotStart = tracemalloc.take_snapshot()
+    for item in items:
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        func(item)
+        allocated += tracemalloc.get_traced_memory()[1] - current
+    snapshotEnd = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    filters = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+    leaks = snapshotEnd.filter_traces(filters).compare_to(snapshotStart.filter_traces(filters), "traceback")
+
+    return {
+        "frames": frames,
+        "framesPerSec": frames / best,
+        "nsPerFrame": best / frames * 1e9,
+        "allocBytesPerFrame": allocated / frames,
+        "leakBytesPerFrame": sum(stat.size_diff for stat in leaks) / frames,
+        "leakBlocksPerFrame": sum(stat.count_diff for stat in leaks) / frames,
+        "p50Ns": _percentile(latencies, 0.50),
+        "p99Ns": _percentile(latencies, 0.99),
+    }
+
+
+class _NullSerial:
+    """Serial port which drops every write, to measure the transfer side without a device.
+    """
+
+    in_waiting = 0
+
+    def __init__(self):
+        self._flagOpen = True
+
+    def isOpen(self):
+        return self._flagOpen
+
+    def write(self, dataArray):
+        return len(dataArray)
+
+    def close(self):
+        self._flagOpen = False
+
+
+class _SyncWriter(FrameWriter):
+    """FrameWriter which writes in the calling thread, so a transfer is measured from building the frame to the
+    write and no writer thread runs in the background of the measurements.
+    """
+
+    def send(self, dataArray, dataType, priority=TransferPriority.Request, future=None):
+        self._write(dataArray)
+        self.countWritten += 1
+        if self._onWritten is not None:
+            self._onWritten(dataType, dataArray)
+
+        if (future is not None) and future.set_running_or_notify_cancel():
+            future.set_result(True)
+        return future
+
+
+def _makeDrone():
+    drone = CoDrone()
+    drone._serialport = _NullSerial()
+    drone._writer = _SyncWriter(drone._writeSerial, drone._transferred, drone._eventWriteError)
+    return drone
+
+
+def benchmarkReceive(count=10000, chunkSize=64, repeat=5):
+    """Push the synthetic stream through each stage of the receive path.
+
+    receiveCall: Receiver.call() byte by byte(the previous receive path).
+    receiveScan: Receiver.scan() per chunk of chunkSize bytes.
+    parse: Parser of each valid frame.
+    handler: CoDrone._handler() of each valid frame(storage, event handlers, waiters).
+    pipeline: CoDrone._check() per chunk, the whole receive path behind the serial port.
+
+    Latency is per chunk for receiveCall, receiveScan and pipeline, per frame otherwise.
+
+    Returns: A dict of stage name and _measure() result.
+    """
+    stream, valid = makeStream(count)
+    chunks = splitStream(stream, chunkSize)
+
+    frames = Receiver().scan(stream)
+    assert len(frames) == valid, "scan found {0} of {1} frames".format(len(frames), valid)
+
+    result = {}
+
+    receiver = Receiver()
+
+    def call(chunk):
+        for data in chunk:
+            if receiver.call(data) == StateLoading.Loaded:
+                receiver.checked()
+
+    result["receiveCall"] = _measure(call, chunks, valid, max(1, repeat // 5))
+
+    receiver = Receiver()
+    result["receiveScan"] = _measure(receiver.scan, chunks, valid, repeat)
+
+    parser = Parser()
+    result["parse"] = _measure(lambda frame: parser.d[frame[0].dataType](frame[1]), frames, valid, repeat)
+
+    drone = _makeDrone()
+    drone._flagShowErrorMessage = False
+    result["handler"] = _measure(lambda frame: drone._handler(*frame), frames, valid, repeat)
+
+    def check(chunk):
+        drone._bufferHandler.extend(chunk)
+        drone._check()
+
+    result["pipeline"] = _measure(check, chunks, valid, repeat)
+
+    return result
+
+
+def transferCases(drone):
+    """Returns: A list of (name, function) which build and write one frame of each send command.
+    """
+    return [
+        ("sendPing", drone.sendPing),
+        ("sendRequest", lambda: drone.sendRequest(DataType.Attitude)),
+        ("control", lambda: drone._transferControl(10, 20, 30, 40)),
+        ("sendLinkModeBroadcast", lambda: drone.sendLinkModeBroadcast(ModeLinkBroadcast.Passive)),
+        ("sendLinkSystemReset", drone.sendLinkSystemReset),
+        ("sendLinkDiscoverStart", drone.sendLinkDiscoverStart),
+        ("sendLinkDiscoverStop", drone.sendLinkDiscoverStop),
+        ("sendLinkConnect", lambda: drone.sendLinkConnect(0)),
+        ("sendLinkDisconnect", drone.sendLinkDisconnect),
+        ("sendLinkRssiPollingStart", drone.sendLinkRssiPollingStart),
+        ("sendLinkRssiPollingStop", drone.sendLinkRssiPollingStop),
+        ("sendTakeOff", drone.sendTakeOff),
+        ("sendLanding", drone.sendLanding),
+        ("sendStop", drone.sendStop),
+        ("sendControlDrive", lambda: drone.sendControlDrive(10, 20)),
+        ("sendCommand", lambda: drone.sendCommand(CommandType.Stop)),
+        ("sendModeVehicle", lambda: drone.sendModeVehicle(ModeVehicle.FlightGuard)),
+        ("sendHeadless", lambda: drone.sendHeadless(Headless.Normal)),
+        ("sendTrim", lambda: drone.sendTrim(Trim.RollIncrease)),
+        ("sendTrimFlight", lambda: drone.sendTrimFlight(1, 2, 3, 4)),
+        ("sendTrimDrive", lambda: drone.sendTrimDrive(5)),
+        ("sendFlightEvent", lambda: drone.sendFlightEvent(FlightEvent.TakeOff)),
+        ("sendDriveEvent", lambda: drone.sendDriveEvent(DriveEvent.Stop)),
+        ("sendClearTrim", drone.sendClearTrim),
+        ("sendClearGyroBias", drone.sendClearGyroBias),
+        ("sendUpdateLookupTarget", lambda: drone.sendUpdateLookupTarget(DeviceType.DroneMain)),
+        ("sendMotor", lambda: drone.sendMotor(1, 2, 3, 4)),
+        ("sendIrMessage", lambda: drone.sendIrMessage(1)),
+    ]
+
+
+def benchmarkTransfer(count=2000, repeat=5):
+    """Build and write every send command frame count times to a null serial port, in the calling thread.
+
+    Returns: A dict of command name and _measure() result, "skipped" lists the commands which
+        did not build a frame.
+    """
+    drone = _makeDrone()
+    result = {}
+    skipped = []
+
+    for name, func in transferCases(drone):
+        if func() is None:
+            skipped.append(name)
+            continue
+
+        result[name] = _measure(lambda item: func(), range(count), count, repeat)
+
+    result["skipped"] = skipped
+    return result
+
+
+def run(quick=False):
+    """Run every benchmark.
+
+    Returns: A dict which can be saved with json and compared with compare().
+    """
+    scale = 10 if quick else 1
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "crcBackend": CRC16.backend,
+        },
+        "crc16": benchmarkCrc16(2000 // scale),
+        "receive": benchmarkReceive(10000 // scale),
+        "transfer": benchmarkTransfer(2000 // scale),
+        "memory": benchmarkMemory(100000 // scale),
+    }
+
+
+def compare(old, new, key="nsPerFrame"):
+    """Compare two results of run().
+
+    Returns: A list of (name, old, new, new / old) of every measurement in both results.
+    """
+    rows = []
+
+    for group in ("receive", "transfer"):
+        for name, value in new.get(group, {}).items():
+            if (name == "skipped") or (name not in old.get(group, {})):
+                continue
+            rows.append(("{0}/{1}".format(group, name), old[group][name][key], value[key],
+                         value[key] / old[group][name][key]))
+
+    for name, value in new.get("crc16", {}).items():
+        if name in old.get("crc16", {}):
+            rows.append(("crc16/" + name, old["crc16"][name], value, value / old["crc16"][name]))
+
+    return rows
+
+
+def printResult(result):
+    for name, ns in result["crc16"].items():
+        print("crc16 / {0:8s} : {1:10.1f} ns/frame".format(name, ns))
+
+    for group in ("receive", "transfer"):
+        for name, value in result[group].items():
+            if name == "skipped":
+                if value:
+                    print("{0} / skipped : {1}".format(group, ", ".join(value)))
+                continue
+            print("{0} / {1:24s} : {2:12.0f} frames/s {3:9.1f} ns/frame {4:8.1f} B/frame {5:6.2f} leak blocks/frame"
+                  " p50 {6:8d} ns p99 {7:8d} ns".format(group, name, value["framesPerSec"], value["nsPerFrame"],
+                                                        value["allocBytesPerFrame"], value["leakBlocksPerFrame"],
+                                                        value["p50Ns"], value["p99Ns"]))
+
+    for name, (sizeDict, sizeSlots) in result["memory"].items():
+        print("memory / {0:10s} : {1:7.1f} -> {2:7.1f} bytes/instance".format(name, sizeDict, sizeSlots))
+
+
+def main():
+    argumentParser = argparse.ArgumentParser(description="CoDrone receive, parse and transfer benchmarks")
+    argumentParser.add_argument("--output", help="save the results as json")
+    argumentParser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                                help="compare two saved results instead of running")
+    argumentParser.add_argument("--quick", action="store_true", help="run 10 times fewer iterations")
+    arguments = argumentParser.parse_args()
+
+    if arguments.compare:
+        with open(arguments.compare[0]) as file:
+            old = json.load(file)
+        with open(arguments.compare[1]) as file:
+            new = json.load(file)
+
+        for name, valueOld, valueNew, ratio in compare(old, new):
+            print("{0:40s} : {1:10.1f} -> {2:10.1f} ns/frame ({3:5.2f}x)".format(name, valueOld, valueNew, ratio))
+        return
+
+    result = run(arguments.quick)
+    printResult(result)
+
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            json.dump(result, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
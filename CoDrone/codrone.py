@@ -1,15 +1,29 @@
+from concurrent.futures import Future
+from functools import wraps
 from operator import eq
-from queue import Queue
+from threading import Condition
+from threading import Event
+from threading import Lock
 from threading import RLock
 from threading import Thread
+from threading import current_thread
+from time import perf_counter
 from time import sleep
 import colorama
 from colorama import Fore, Back, Style
 import serial
 from serial.tools.list_ports import comports
 
+from CoDrone.flightlog import *
+from CoDrone.connector import *
+from CoDrone.controller import *
+from CoDrone.devicecache import *
+from CoDrone.metrics import *
+from CoDrone.scheduler import *
 from CoDrone.receiver import *
 from CoDrone.storage import *
+from CoDrone.subscription import *
+from CoDrone.writer import *
 
 
 def convertByteArrayToString(dataArray):
@@ -25,26 +39,94 @@ def convertByteArrayToString(dataArray):
     return string
 
 
+# TransferPriority of the frames from _transfer(), other DataTypes are TransferPriority.Request
+transferPriorities = {DataType.Control: TransferPriority.Control}
+transferPriorities.update({dataType: TransferPriority.Led for dataType in DataType if dataType.name.startswith("Light")})
+
+
+def makeTransferDataArray(header, data):
+    """Make transfer byte data array(preamble, header, data, crc)
+    """
+    if (header is None) or (data is None):
+        return None
+
+    if (not isinstance(header, Header)) or (not isinstance(data, ISerializable)):
+        return None
+
+    size = data.getSize()
+
+    dataArray = bytearray(6 + size)
+    dataArray[0] = 0x0A
+    dataArray[1] = 0x55
+    header.packInto(dataArray, 2)
+    data.packInto(dataArray, 4)
+
+    crc16 = CRC16.calc(memoryview(dataArray)[2:4 + size], 0)
+    pack_into('<H', dataArray, 4 + size, crc16)
+
+    return dataArray
+
+
 class CoDrone:
 
     def __init__(self, flagCheckBackground=True, flagShowErrorMessage=False, flagShowLogMessage=False,
-                 flagShowTransferData=False, flagShowReceiveData=False):
+                 flagShowTransferData=False, flagShowReceiveData=False, receiveChunkSize=0, controlRate=50):
 
         self._serialport = None
-        self._bufferQueue = Queue(4096)
         self._bufferHandler = bytearray()
         self._index = 0
 
+        # Receive buffer, 0 reads everything waiting in the serial port at once
+        self._receiveChunkSize = receiveChunkSize
+        self._receiveBuffer = bytearray(max(4096, receiveChunkSize))
+        self._countReceiveBytes = 0
+        self._countReceiveSyscall = 0
+        self._timeReceiveStart = time()
+
+        # Flight log, see startRecording()
+        self._recorder = None
+
+        # Counters and round trip times, see getMetrics()
+        self.metrics = Metrics()
+
         # Thread
+        # _receiving: the only reader of the serial port, parses and stores the frames and wakes up the waiters.
+        # _writer: the only writer of the serial port, every transfer is queued to it.
+        # _sendRequestState: queues a State request every 2 sec, it never waits for a lock.
+        # _controlScheduler: sends the control setpoint at a fixed rate.
+        # _requestScheduler: sends the requests of subscribe() at their rates.
+        #
+        # Lock ordering: _lockFlight first, then _lockSubscription, then at most one of the leaf locks
+        # (_lockControlFrame, _lockAck, _conditionReceive and the locks inside FrameWriter, ControlScheduler,
+        # RequestScheduler and Subscription). Nothing is called while a leaf lock is held, so they never nest. Requests and acks wait on _conditionReceive or a Future
+        # without holding a lock, so getters run while a flight command holds _lockFlight.
         self._threadReceiving = None
         self._threadSendState = None
-        self._lock = RLock()
-        self._lockState = None
-        self._lockReciving = None
         self._flagThreadRun = False
+        self._eventStop = Event()    # wakes up _sendRequestState on close()
+        self._lockFlight = RLock()  # flight commands which drive the control scheduler, see lockFlight
+        self._depthFlight = 0       # nested flight commands of the thread holding _lockFlight
+        self._conditionReceive = Condition()   # notified by _handler whenever a frame arrives
+        self._lockControlFrame = Lock()     # the prebuilt control frame is patched from the scheduler and user threads
+        self._writer = FrameWriter(self._writeSerial, self._transferred, self._eventWriteError)
+        self._ackFutures = {}   # DataType and the futures waiting for its ack, see send() and _checkAck()
+        self._lockAck = Lock()
+        self._requestScheduler = RequestScheduler(self._transferRequest)
+        self._subscriptions = []
+        self._subscribers = {}  # DataType and a tuple of its subscriptions, replaced instead of modified
+        self._lockSubscription = Lock()
 
         self._receiver = Receiver()
         self._control = Control()
+        self._controlFrame = ControlFrame()
+        self._controlScheduler = ControlScheduler(
+            self._transferControl, controlRate, lambda error: self._printError(">> Control error : {0}".format(error)))
+        self._requestFrames = {}    # prebuilt request frame of each DataType, see _transferRequest()
+        self.headingController = HeadingController()    # gains of turnTo(), turnBy()
+        self.altitudeController = AltitudeController()  # gains of holdAltitude()
+        self._threadAltitude = None
+        self._eventAltitudeStop = Event()   # stop of the running hold thread, each thread gets its own
+        self._eventAltitudeStop.set()
 
         self._flagCheckBackground = flagCheckBackground
         self._flagShowErrorMessage = flagShowErrorMessage
@@ -57,16 +139,20 @@ class CoDrone:
         self._storageHeader = StorageHeader()
         self._storage = Storage()
         self._storageCount = StorageCount()
+        self._storageHistory = StorageHistory()
         self._parser = Parser()
 
         self._devices = []  # when using auto connect, save search list
         self._flagDiscover = False  # when using auto connect, notice is discover
         self._flagConnected = False  # when using auto connect, notice connection with device
+        self._connector = None  # LinkConnector of a running connect()
+        self.deviceCache = None     # DeviceCache of the drones connected before, None to always scan
         self.timeStartProgram = time()  # record program starting time
 
         # Data
         self._timer = Timer()
         self._data = Data(self._timer)
+        self._cache = SensorCache()     # freshness of the stored data, see setMaxAge()
         self._setAllEventHandler()
 
         # Parameter
@@ -85,65 +171,95 @@ class CoDrone:
 
     ### DATA PROCESSING THREAD -------- START
 
-    def _receiving(self, lock, lockState):
-        """Data receiving Thread, Save received data to buffer.
-
-        Args:
-            lock: main thread lock
-            lockState: _sendRequestState lock
+    def _receiving(self):
+        """Data receiving Thread, Read every waiting byte into the receive buffer at once.
+        This is the only thread which reads the port and touches the receive buffer, so it needs no lock.
         """
-        self._lockReciving = RLock()
+        self._countReceiveBytes = 0
+        self._countReceiveSyscall = 0
+        self._timeReceiveStart = time()
+
+        view = memoryview(self._receiveBuffer)
         while self._flagThreadRun:
-            # lock other threads for reading
-            with lock and lockState and self._lockReciving:
-                self._bufferQueue.put(self._serialport.read())
+            size = self._receiveChunkSize
+            if size == 0:
+                size = min(self._serialport.in_waiting, len(view))
+                self._countReceiveSyscall += 1
+
+            if size > 0:
+                size = self._serialport.readinto(view[:size])
+                self._countReceiveSyscall += 1
+
+            if not size:
+                sleep(0.001)
+                continue
+
+            self._countReceiveBytes += size
+            self.metrics.bytesIn += size
+            self._bufferHandler.extend(view[:size])
+
+            recorder = self._recorder
+            if recorder is not None:
+                recorder.write(LogDirection.Receive, view[:size])
 
             # auto-update when background check for receive data is on
             if self._flagCheckBackground:
                 while self._check() != DataType.None_:
                     pass
-                    # sleep(0.001)
+
+    def getReceiveRate(self):
+        """This function gets the throughput of the receiving thread since the port was opened.
+
+        Returns: A dict with bytesPerSec and syscallsPerSec.
+        """
+        interval = time() - self._timeReceiveStart
+        if interval <= 0:
+            return {"bytesPerSec": 0, "syscallsPerSec": 0}
+
+        return {"bytesPerSec": self._countReceiveBytes / interval,
+                "syscallsPerSec": self._countReceiveSyscall / interval}
 
     def _check(self):
-        """Read 1-byte of data stored in the buffer and pass it to the receiver.
+        """Pass the data stored in the buffer to the receiver in one chunk.
 
         Returns: A member value in the DataType class.
-            If one data block received call _handler(), data parsing and return the datatype.
+            Every complete frame in the buffer is passed to _handler(), returns the datatype of the last one.
             Returns DataType.None_ if no data received.
         """
-        while not self._bufferQueue.empty():
-            dataArray = self._bufferQueue.get_nowait()
-            self._bufferQueue.task_done()
+        dataType = DataType.None_
 
-            if (dataArray is not None) and (len(dataArray) > 0):
-                # print receive data
-                self._printReceiveData(dataArray)
-                self._bufferHandler.extend(dataArray)
+        if len(self._bufferHandler) == 0:
+            return dataType
 
-        while len(self._bufferHandler) > 0:
-            stateLoading = self._receiver.call(self._bufferHandler.pop(0))
+        # print receive data
+        self._printReceiveData(self._bufferHandler)
 
-            # print error
-            if stateLoading == StateLoading.Failure:
-                # print receive data
-                self._printReceiveDataEnd()
+        self.metrics.updateQueueDepth(len(self._bufferHandler))
 
-                # print error
-                self._printError(self._receiver.message)
+        frames = self._receiver.scan(self._bufferHandler)
+        self._bufferHandler.clear()
 
-            # print log
-            if stateLoading == StateLoading.Loaded:
-                # print receive data
-                self._printReceiveDataEnd()
+        self.metrics.receiveErrors += len(self._receiver.errors)
+        for dataType in self._receiver.crcErrors:
+            self.metrics.crcErrors[dataType] += 1
 
-                # print log
-                self._printLog(self._receiver.message)
+        # print error
+        for message in self._receiver.errors:
+            self._printReceiveDataEnd()
+            self._printError(message)
 
-            if self._receiver.state == StateLoading.Loaded:
-                self._handler(self._receiver.header, self._receiver.data)
-                return self._receiver.header.dataType
+        for header, data in frames:
+            # print receive data
+            self._printReceiveDataEnd()
+
+            # print log
+            if self._flagShowLogMessage:
+                self._printLog("Success / Receiver / Section.End / Receive complete / {0}".format(header.dataType))
 
-        return DataType.None_
+            self._handler(header, data)
+            dataType = header.dataType
+
+        return dataType
 
     def _handler(self, header, dataArray):
         """Save header internally. Data parsing and saved internal class.
@@ -163,6 +279,17 @@ class CoDrone:
 
         # count number of request
         self._storageCount.d[header.dataType] += 1
+        self.metrics.received[header.dataType] += 1
+
+        # deliver to subscribe()
+        subscribers = self._subscribers.get(header.dataType)
+        if subscribers and (self._storage.d[header.dataType] is not None):
+            for subscription in subscribers:
+                subscription._deliver(header.dataType, self._storage.d[header.dataType])
+
+        # complete the futures waiting for this ack
+        if (header.dataType == DataType.Ack) and (self._storage.d[DataType.Ack] is not None):
+            self._eventAck(self._storage.d[DataType.Ack])
 
         # process LinkEvent separately(event check like connect or disconnect)
         if (header.dataType == DataType.LinkEvent) and (self._storage.d[DataType.LinkEvent] != None):
@@ -177,6 +304,10 @@ class CoDrone:
                 self._storage.d[DataType.LinkDiscoveredDevice] is not None):
             self._eventLinkDiscoveredDevice(self._storage.d[DataType.LinkDiscoveredDevice])
 
+        # wake up the threads waiting for data, after the link events so connect() sees them
+        with self._conditionReceive:
+            self._conditionReceive.notify_all()
+
         # complete data process
         self._receiver.checked()
 
@@ -188,6 +319,13 @@ class CoDrone:
         if self._parser.d[header.dataType] is not None:
             self._storageHeader.d[header.dataType] = header
             self._storage.d[header.dataType] = self._parser.d[header.dataType](dataArray)
+            if self._storage.d[header.dataType] is not None:
+                self.metrics.parsed[header.dataType] += 1
+                self._cache.update(header.dataType)
+
+        # only frames which parsed, a payload of another length does not fit the history record
+        if (self._storageHistory.d[header.dataType] is not None) and (self._storage.d[header.dataType] is not None):
+            self._storageHistory.d[header.dataType].append(dataArray, time())
 
     def _runEventHandler(self, dataType):
         """Call event handler with specified type of data
@@ -212,31 +350,35 @@ class CoDrone:
         self._eventHandler.d[DataType.ImageFlow] = self._data.eventUpdateImageFlow
         self._eventHandler.d[DataType.Ack] = self._data.eventUpdateAck
 
-    def _sendRequestState(self, lock):
+    def _sendRequestState(self):
         """Data request Thread, Send state data request every 2 sec.
-        Args:
-            lock: main thread lock
+        The request is queued to the writer thread, so it keeps its period while a flight command runs.
         """
-        self._lockState = RLock()
-        while self._flagThreadRun:
+        while not self._eventStop.wait(2):
             if self._flagConnected:
-                with lock and self._lockState:
-                    self.sendRequest(DataType.State)
-                    sleep(0.01)
-            sleep(2)
+                self._transferRequest(DataType.State)
 
-    def lockState(func):
-        """This function is a decorator for thread-locking.
-        If you apply this decorator to the function, the data request thread doesn't work while the function works.
+    def lockFlight(func):
+        """This function is a decorator for the flight commands which drive the control scheduler.
+        Flight commands from different threads run one after another instead of mixing their setpoints.
+        The outermost one resumes the control scheduler after emergencyStop() or land() aborted it.
+        Getters, LED functions, land() and emergencyStop() do not take this lock.
 
         Examples:
-            @lockState
+            @lockFlight
             def func:
                 pass
         """
+        @wraps(func)
         def wrapper(self, *args, **kwargs):
-            with self._lockState:
-                return func(self, *args, **kwargs)
+            with self._lockFlight:
+                self._depthFlight += 1
+                try:
+                    if self._depthFlight == 1:
+                        self._controlScheduler.resume()
+                    return func(self, *args, **kwargs)
+                finally:
+                    self._depthFlight -= 1
         return wrapper
 
     ### DATA PROCESSING THREAD -------- END
@@ -247,39 +389,80 @@ class CoDrone:
     def _makeTransferDataArray(self, header, data):
         """Make transfer byte data array
         """
-        if (header is None) or (data is None):
-            return None
+        return makeTransferDataArray(header, data)
 
-        if (not isinstance(header, Header)) or (not isinstance(data, ISerializable)):
-            return None
+    def _transfer(self, header, data, priority=None, future=None):
+        """Transfer data, the frame is queued for the writer thread and this returns without waiting for the write.
 
-        crc16 = CRC16.calc(header.toArray(), 0)
-        crc16 = CRC16.calc(data.toArray(), crc16)
+        Args:
+            priority: A member value in the TransferPriority class, None for the one of header.dataType.
+            future: A concurrent.futures.Future which gets True once the frame is written.
+        """
+        if not self.isOpen():
+            return
+
+        dataArray = self._makeTransferDataArray(header, data)
+        if dataArray is None:
+            return
 
-        dataArray = bytearray()
-        dataArray.extend((0x0A, 0x55))
-        dataArray.extend(header.toArray())
-        dataArray.extend(data.toArray())
-        dataArray.extend(pack('H', crc16))
+        if priority is None:
+            priority = transferPriorities.get(header.dataType, TransferPriority.Request)
 
+        self._writer.send(dataArray, header.dataType, priority, future)
         return dataArray
 
-    def _transfer(self, header, data):
-        """Transfer data
+    def _transferControl(self, roll, pitch, yaw, throttle):
+        """Transfer control with the prebuilt frame. The frame is patched only when the values change, the
+        cached bytes are queued unchanged.
         """
         if not self.isOpen():
             return
 
-        dataArray = self._makeTransferDataArray(header, data)
-        with self._lockReciving and self._lock and self._lockState:
-            self._serialport.write(dataArray)
+        with self._lockControlFrame:
+            dataArray = self._controlFrame.setAll(roll, pitch, yaw, throttle)
+
+        self._writer.send(dataArray, DataType.Control, TransferPriority.Control)
+        return dataArray
+
+    def _transferRequest(self, dataType):
+        """Transfer a request with a prebuilt frame, for the background threads which request data at a fixed rate.
+        """
+        if not self.isOpen():
+            return
+
+        dataArray = self._requestFrames.get(dataType)
+        if dataArray is None:
+            header = Header()
+            header.dataType = DataType.Request
+            header.length = Request.getSize()
+
+            data = Request()
+            data.dataType = dataType
+
+            dataArray = bytes(self._makeTransferDataArray(header, data))
+            self._requestFrames[dataType] = dataArray
+
+        self._writer.send(dataArray, DataType.Request, TransferPriority.Request)
+        return dataArray
+
+    def _writeSerial(self, dataArray):
+        self._serialport.write(dataArray)
+
+    def _transferred(self, dataType, dataArray):
+        """Count, record and print a frame after the writer thread wrote it.
+        """
+        self.metrics.sent[dataType] += 1
+        self.metrics.bytesOut += len(dataArray)
+
+        recorder = self._recorder
+        if recorder is not None:
+            recorder.write(LogDirection.Transfer, dataArray)
 
         # print _transfer data
         self._printTransferData(dataArray)
         return dataArray
 
-    @lockState
-    def _checkAck(self, header, data, timeOnce=0.03, timeAll=0.2, count=5):
+    def _checkAck(self, header, data, timeOnce=0.03, timeAll=0.2, count=5, priority=None):
         """This function checks the ack response after the data transfer.
         If not received, repeat the data transfer depending on parameters.
 
@@ -287,27 +470,45 @@ class CoDrone:
             timeOnce: The time interval between the retransmissions of data. The number of seconds as type float.
             timeAll: The time until the function ends. The number of seconds as type float.
             count: The number of transfers
+            priority: A member value in the TransferPriority class, None for the one of header.dataType.
 
         Returns: True if the transfer works well, False otherwise.
         """
-        self._data.ack.dataType = 0
         flag = 1
+        future = self._registerAck(header.dataType)
+        received = future.done
 
-        self._transfer(header, data)
+        self._transfer(header, data, priority)
         startTime = time()
-        while self._data.ack.dataType != header.dataType:
+        timeRequest = perf_counter()
+        while not received():
             interval = time() - startTime
             # Break the loop if request time is over timeAll sec, send the request maximum flagAll times
             if interval > timeOnce * flag and flag < count:
-                self._transfer(header, data)
+                self._transfer(header, data, priority)
                 flag += 1
             elif interval > timeAll:
                 self._printError(">> Failed to receive ack : {}".format(header.dataType))
+                self.metrics.addTimeout(header.dataType, flag - 1)
+                future.cancel()
                 break
-            sleep(0.01)
-        return self._data.ack.dataType == header.dataType
 
-    def _eventLinkHandler(self, eventLink):
+            # sleep until the ack arrives or the next resend
+            timeNext = timeOnce * flag if flag < count else timeAll
+            self._waitReceive(received, timeNext - (time() - startTime))
+        else:
+            self.metrics.addResponse(header.dataType, perf_counter() - timeRequest, flag - 1)
+        return received()
+
+    def _waitReceive(self, predicate, timeout):
+        """Block until predicate() is true or timeout seconds passed. _handler wakes it up on every frame.
+
+        Returns: The last result of predicate().
+        """
+        with self._conditionReceive:
+            return self._conditionReceive.wait_for(predicate, max(0.001, timeout))
+
+    def _eventLinkHandler(self, eventLink, address=None):
         if eventLink == EventLink.Scanning:
             self._devices.clear()
             self._flagDiscover = True
@@ -321,18 +522,55 @@ class CoDrone:
         elif eventLink == EventLink.Disconnected:
             self._flagConnected = False
 
+        connector = self._connector
+        if connector is not None:
+            connector.onLinkEvent(eventLink, perf_counter(), address)
+
         # print log
         self._printLog(eventLink)
 
+    def _registerAck(self, dataType):
+        """Returns: A Future which completes with the next Ack of dataType.
+        """
+        future = Future()
+        with self._lockAck:
+            futures = [f for f in self._ackFutures.get(dataType, ()) if not f.done()]
+            futures.append(future)
+            self._ackFutures[dataType] = futures
+        return future
+
+    def _eventAck(self, data):
+        with self._lockAck:
+            futures = self._ackFutures.pop(data.dataType, ())
+
+        for future in futures:
+            if future.set_running_or_notify_cancel():
+                future.set_result(data)
+
+    def _cancelAck(self):
+        with self._lockAck:
+            futures = [future for futures in self._ackFutures.values() for future in futures]
+            self._ackFutures.clear()
+
+        for future in futures:
+            future.cancel()
+
+    def _eventWriteError(self, dataType, error):
+        self._printError(">> Failed to transfer : {0} / {1}".format(dataType, error))
+
     def _eventLinkEvent(self, data):
         self._eventLinkHandler(data.eventLink)
 
     def _eventLinkEventAddress(self, data):
-        self._eventLinkHandler(data.eventLink)
+        self._eventLinkHandler(data.eventLink, data.address)
 
     def _eventLinkDiscoveredDevice(self, data):
         self._devices.append(data)
 
+        connector = self._connector
+        if connector is not None:
+            connector.onDiscovered(data, perf_counter())
+
         # print log
         self._printLog(
             "LinkDiscoveredDevice / {0} / {1} / {2} / {3}".format(data.index, convertByteArrayToString(data.address),
@@ -409,9 +647,15 @@ class CoDrone:
             timeout=0)
 
         if self.isOpen():
+            self._writer.start()
             self._flagThreadRun = True
-            self._threadSendState = Thread(target=self._sendRequestState, args=(self._lock,), daemon=True).start()
-            self._threadReceving = Thread(target=self._receiving, args=(self._lock, self._lockState,), daemon=True).start()
+            self._eventStop.clear()
+            self._threadSendState = Thread(target=self._sendRequestState, daemon=True)
+            self._threadSendState.start()
+            self._threadReceiving = Thread(target=self._receiving, daemon=True)
+            self._threadReceiving.start()
+            self._controlScheduler.start()
+            self._requestScheduler.start()
 
             # print log
             self._printLog(">> Connected.({0})".format(portName))
@@ -430,35 +674,66 @@ class CoDrone:
             self._printLog("Closing serial port.")
 
         # close thread
+        self.stopAltitudeHold()
+        self._controlScheduler.stop()
+        self._requestScheduler.stop()
         if self._flagThreadRun:
             self._flagThreadRun = False
-            sleep(0.01)
+            self._eventStop.set()
+            for thread in (self._threadReceiving, self._threadSendState):
+                if thread is not current_thread():     # close() from an event handler
+                    thread.join(1)
+            self._threadReceiving = None
+            self._threadSendState = None
 
         for i in range(5):
             self.sendLinkDisconnect()
             sleep(0.01)
 
+        self._writer.stop()
+        self._cancelAck()
+
         while self.isOpen():
             self._serialport.close()
             sleep(0.01)
 
-    def connect(self, deviceName="None", portName="None", flagSystemReset=False):
+        self.stopRecording()
+
+    def connect(self, deviceName="None", portName="None", flagSystemReset=False, timeout=5, retries=5,
+                discoverWindow=0.3, readyTimeout=1.2, directTimeout=1.0):
         """If the serial port is not open, open the serial port,
         Search for CODRONE and connect it to the device with the strongest signal.
+        Every step waits for the LinkEvent which ends it, see LinkConnector, so connecting takes as long as the
+        LINK needs and not a fixed delay.
+        With a DeviceCache in deviceCache, a deviceName connected before through the same port is connected
+        directly without a scan, the scan only runs if that fails. Every successful connection is then written to
+        the cache file(~/.codrone/devices.json unless DeviceCache got another path). deviceCache is None by default,
+        so nothing is written unless it is set:
+
+            >>> drone.deviceCache = DeviceCache()
 
         Args:
             deviceName: If specify a deviceName, Connect only when the specified device is discovered.
             portName: Serial port name.
             flagSystemReset: Use to reset and start the first CODRONE LINK after the serial communication connection.
+            timeout: Seconds to wait for the discovery and for the connection of each attempt.
+            retries: Attempts to discover and connect.
+            discoverWindow: Seconds to wait for more devices after the first one without a deviceName.
+            readyTimeout: Seconds to wait for ReadyToControl after the connection.
+            directTimeout: Seconds to wait for the direct connection of a known device.
 
         Returns: True if connected, false otherwise.
         """
 
+        # a device name is the last 4 digits of the full one, anything else can never match
+        if (not eq(deviceName, "None")) and (len(deviceName) != 4):
+            self._printError(">> Device name length error(" + deviceName + ").")
+            return False
+
         # case for serial port is None(connect to last connection)
         if not self.isOpen():
             self.close()
             self.open(portName)
-            sleep(0.1)
 
         # if not connect with serial port print error and return
         if not self.isOpen():
@@ -471,99 +746,62 @@ class CoDrone:
             self.sendLinkSystemReset()
             sleep(3)
 
-        # ModeLinkBroadcast.Passive mode change
+        # ModeLinkBroadcast.Passive mode change, the LINK acks its own commands
+        ack = self._registerAck(DataType.Command)
         self.sendLinkModeBroadcast(ModeLinkBroadcast.Passive)
-        sleep(0.1)
-
-        for reconnection in range(5):
-            # start searching device
-            self._devices.clear()
-            self._flagDiscover = True
-            self.sendLinkDiscoverStart()
-
-            # wait for 5sec
-            for i in range(50):
-                sleep(0.1)
-                if not self._flagDiscover:
+        self._waitReceive(ack.done, 0.1)
+        ack.cancel()
+
+        known = None
+        if (self.deviceCache is not None) and (not eq(deviceName, "None")):
+            known = self.deviceCache.get(deviceName)
+            if (known is not None) and (known.portName != self._serialport.port):
+                known = None    # the index belongs to the device table of another LINK
+
+        connector = LinkConnector(self.sendLinkDiscoverStart, self.sendLinkDiscoverStop, self.sendLinkConnect,
+                                  deviceName, timeout, retries, discoverWindow, readyTimeout, known, directTimeout,
+                                  self.sendLinkDisconnect)
+        self._flagConnected = False
+        self._devices.clear()
+        self._connector = connector
+        try:
+            connector.start(perf_counter())
+            while True:
+                # read once, the receive thread can finish the connector at any time
+                deadline = connector.getDeadline()
+                if deadline is None:
                     break
+                self._waitReceive(connector.isDone, deadline - perf_counter())
+                connector.poll(perf_counter())
+        finally:
+            self._connector = None
+
+        if connector.isReady() and self._flagConnected:
+            self._rememberDevice(connector)
+            battery = self.getBatteryPercentage()
+            print(">> Drone battery : [{}]".format(battery))
+            if battery < self._lowBatteryPercent:
+                print(">> Low Battery!!")
+            return True
 
-            sleep(2)
-
-            length = len(self._devices)
-
-            if eq(deviceName, "None"):
-                # If not specify a name, connect to the nearest device
-                if length > 0:
-                    closestDevice = self._devices[0]
-
-                    # If more than two device is found, select the closest device
-                    if len(self._devices) > 1:
-                        for i in range(len(self._devices)):
-                            if closestDevice.rssi < self._devices[i].rssi:
-                                closestDevice = self._devices[i]
-
-                    # connect the device
-                    self._flagConnected = False
-                    self.sendLinkConnect(closestDevice.index)
-
-                    # wait for 5 seconds to connect the device
-                    for i in range(50):
-                        sleep(0.1)
-                        if self._flagConnected:
-                            break
-                    sleep(1.2)
-
-                else:
-                    self._printError(">> Could not find CODRONE.")
-
-            else:
-                # check the name of connected device
-                targetDevice = None
-
-                if (len(self._devices) > 0):
-                    if (len(deviceName) == 4):
-                        for i in range(len(self._devices)):
-                            if (len(self._devices[i].name) > 12) and (deviceName == self._devices[i].name[8:12]):
-                                targetDevice = self._devices[i]
-                                break
-
-                        if targetDevice != None:
-                            # if find the device, connect the device
-                            self._flagConnected = False
-                            self.sendLinkConnect(targetDevice.index)
-
-                            # wait for 5 seconds to connect the device
-                            for i in range(50):
-                                sleep(0.1)
-                                if self._flagConnected:
-                                    break
-
-                            # connect and wait another 1.2 seconds.
-                            sleep(1.2)
-
-                        else:
-                            self._printError(">> Could not find " + deviceName + ".")
+        if connector.devices or (connector.target is not None):
+            self._printError(">> Fail to connect.")
+        elif eq(deviceName, "None"):
+            self._printError(">> Could not find CODRONE.")
+        else:
+            self._printError(">> Could not find " + deviceName + ".")
+        return False
 
-                    else:
-                        self._printError(">> Device name length error(" + deviceName + ").")
+    def _rememberDevice(self, connector):
+        """Store the connected device in deviceCache for the next connect().
+        """
+        if self.deviceCache is None:
+            return
 
-                else:
-                    self._printError(">> Could not find CODRONE.")
-
-            ## TO DO
-            ## How to alert low battery
-            if self._flagConnected:
-                battery = self.getBatteryPercentage()
-                print(">> Drone battery : [{}]".format(battery))
-                if battery < self._lowBatteryPercent:
-                    print(">> Low Battery!!")
-                sleep(3)
-                return self._flagConnected
-            else:
-                self._printError(">> Trying to connect : {}/5".format(reconnection+1))
-                if i == 4:
-                    self._printError(">> Fail to connect.")
-        return self._flagConnected
+        device = connector.target
+        if connector.address is not None:
+            device.address = connector.address
+        self.deviceCache.remember(device, self._serialport.port)
 
     def disconnect(self):
         """Disconnect the drone.
@@ -585,6 +823,30 @@ class CoDrone:
 
     ### SENDING -------- Start
 
+    def send(self, header, data, priority=None, ack=False):
+        """This function queues a frame for the writer thread and returns without waiting for the write.
+        Frames are written by priority: emergency stop > control > requests and commands > LED.
+
+        Args:
+            header: A Header of the frame.
+            data: A member of the protocol classes such as Command.
+            priority: A member value in the TransferPriority class, None for the one of header.dataType.
+            ack: True to get a future which completes with the Ack when the drone confirms header.dataType.
+                The frame is not retransmitted, cancel() the future to stop waiting.
+
+        Examples:
+            >>> future = send(header, command, ack=True)
+            >>> future.result(0.2)
+
+        Returns: A concurrent.futures.Future if ack is True, None otherwise.
+        """
+        future = self._registerAck(header.dataType) if ack else None
+
+        if self._transfer(header, data, priority) is None and future is not None:
+            future.cancel()
+
+        return future
+
     def sendPing(self):
         header = Header()
 
@@ -597,7 +859,6 @@ class CoDrone:
 
         return self._transfer(header, data)
 
-    @lockState
     def sendRequest(self, dataType):
         """This function sends data request with specified datatype.
 
@@ -623,7 +884,7 @@ class CoDrone:
         data.dataType = dataType
         return self._transfer(header,data)
 
-    @lockState
+    @lockFlight
     def sendControl(self, roll, pitch, yaw, throttle):
         """This function sends control request.
 
@@ -635,20 +896,12 @@ class CoDrone:
 
         Returns: True if responds well, false otherwise.
         """
-        header = Header()
-
-        header.dataType = DataType.Control
-        header.length = Control.getSize()
-
-        control = Control()
-        control.setAll(roll, pitch, yaw, throttle)
-
         timeStart = time()
 
         receivingFlag = self._storageCount.d[DataType.Attitude]
 
         while (time() - timeStart) < 0.2:
-            self._transfer(header, control)
+            self._transferControl(roll, pitch, yaw, throttle)
             sleep(0.02)
             if self._storageCount.d[DataType.Attitude] > receivingFlag:
                 break
@@ -657,7 +910,7 @@ class CoDrone:
 
         return self._storageCount.d[DataType.Attitude] == receivingFlag
 
-    @lockState
+    @lockFlight
     def sendControlDuration(self, roll, pitch, yaw, throttle, duration):
         """This function sends control request for the duration
 
@@ -672,20 +925,8 @@ class CoDrone:
         if duration == 0:
             return self.sendControl(roll, pitch, yaw, throttle)
 
-        header = Header()
-
-        header.dataType = DataType.Control
-        header.length = Control.getSize()
-
-        control = Control()
-        control.setAll(roll, pitch, yaw, throttle)
-
-        self._transfer(header, control)
-
-        timeStart = time()
-        while (time() - timeStart) < duration:
-            self._transfer(header, control)
-            sleep(0.02)
+        self._transferControl(roll, pitch, yaw, throttle)
+        self._controlScheduler.hold(roll, pitch, yaw, throttle, duration)
 
         self.hover(1)
 
@@ -769,6 +1010,7 @@ class CoDrone:
 
     ### FLIGHT COMMANDS (START/STOP) -------- START
 
+    @lockFlight
     def takeoff(self):
         """This function makes the drone take off and begin hovering.
         The drone will always hover for 3 seconds in order to stabilize before it executes the next command.
@@ -795,6 +1037,8 @@ class CoDrone:
         The function will also zero-out all of the flight motion variables to 0.
         """
         self._control.setAll(0, 0, 0, 0)    # set the flight motion variables to 0.
+        self._controlScheduler.abort()     # stop the continuous control and the running flight command
+        self.stopAltitudeHold()
 
         header = Header()
 
@@ -810,13 +1054,13 @@ class CoDrone:
             self._printError(">> Failed to land")
         sleep(3)
 
+    @lockFlight
     def hover(self, duration=0):
         """This function makes the drone hover for a given amount of time.
 
         Args:
             duration: The number of seconds to hover as type float. If 0, the duration is infinity.
         """
-        timeStart = time()
         header = Header()
 
         header.dataType = DataType.Control
@@ -826,9 +1070,7 @@ class CoDrone:
         control.setAll(0, 0, 0, 0)
 
         if duration != 0:
-            while (time() - timeStart) < duration:
-                self._transfer(header, control)
-                sleep(0.1)
+            self._controlScheduler.hold(0, 0, 0, 0, duration)
         else:
             if not self._checkAck(header, control):
                 self._printError(">> Failed to hover")
@@ -839,6 +1081,9 @@ class CoDrone:
         """
         self._data.stopFuncFlag = 1    # Event states
         self._control.setAll(0, 0, 0, 0)     # set the flight motion variables to 0
+        self._controlScheduler.abort()     # stop the continuous control and the running flight command
+        self._eventAltitudeStop.set()      # without joining, the next holdAltitude() joins the old thread
+        self._writer.clear(TransferPriority.Control)    # drop the controls which did not go out yet
 
         header = Header()
 
@@ -850,7 +1095,7 @@ class CoDrone:
         data.commandType = CommandType.Stop
         data.option = 0
 
-        if not self._checkAck(header, data):
+        if not self._checkAck(header, data, priority=TransferPriority.EmergencyStop):
             self._printError(">> Failed to emergency stop")
 
     ### FLIGHT COMMANDS (START/STOP) -------- END
@@ -926,7 +1171,7 @@ class CoDrone:
         else:
             self.sendControlDuration(0, 0, yaw, 0, duration)
 
-    @lockState
+    @lockFlight
     def turnDegree(self, direction, degree):
         """An Senior level function that yaws by a given degree in a given direction.
         This function takes an input degree in an input direction, and turns until it reaches the given degree.
@@ -943,53 +1188,101 @@ class CoDrone:
             self._printError(">>> Parameter Type Error")    # print error message
             return None
 
-        power = 20
-        bias = 3
-
-        yawPast = self.getGyroAngles().YAW
         direction = ((direction == Direction.RIGHT) - (direction == Direction.LEFT))  # right = 1 / left = -1
-        degreeGoal = direction * (degree.value - bias) + yawPast
-
-        start_time = time()
-        while (time() - start_time) < degree.value / 3:
-            yaw = self._data.attitude.YAW  # Receive attitude data every time you send a flight command
-            if abs(yawPast - yaw) > 180:  # When the sign changes
-                degreeGoal -= direction * 360
-            yawPast = yaw
-            if direction > 0 and degreeGoal > yaw:  # Clockwise
-                self.sendControl(0, 0, power, 0)
-            elif direction < 0 and degreeGoal < yaw:  # Counterclockwise
-                self.sendControl(0, 0, -power, 0)
-            else:
-                break
-            sleep(0.05)
-
-        self.sendControl(0, 0, 0, 0)
-        sleep(1)
+        self.turnBy(direction * degree.value)
+        self._controlScheduler.hold(0, 0, 0, 0, 1)
 
-    @lockState
+    @lockFlight
     def rotate180(self):
         """This function makes the drone rotate 180 degrees.
         """
-        power = 20
-        bias = 3
+        self.turnBy(180)
 
-        yawPast = self.getGyroAngles().YAW
-        degreeGoal = 180 - bias + yawPast
+    @lockFlight
+    def turnTo(self, heading, timeout=None):
+        """This function turns the drone to an absolute heading the shortest way, using the heading controller.
 
-        start_time = time()
-        while (time() - start_time) < 60:
-            yaw = self._data.attitude.YAW  # Receive attitude data every time you send a flight command
-            if abs(yawPast - yaw) > 180:  # When the sign changes
-                degreeGoal -= 360
-            yawPast = yaw
-            if degreeGoal > yaw:  # Clockwise
-                self.sendControl(0, 0, power, 0)
-            else:
+        Args:
+            heading: The target yaw in degrees, -180 ~ 180 like getGyroAngles().YAW.
+            timeout: Seconds to give up after. If None, depends on the angle.
+
+        Examples:
+            >>> turnTo(0)   # face the heading of the takeoff
+            >>> turnTo(-90)
+
+        Returns: True if the heading was reached, False otherwise.
+        """
+        if not self._getDataWhile(DataType.Attitude):
+            self._printError(">> Failed to receive attitude")
+            return False
+
+        return self._turn(wrapDegree(heading - self._data.attitude.YAW), timeout)
+
+    @lockFlight
+    def turnBy(self, degrees, timeout=None):
+        """This function turns the drone by any angle, using the heading controller.
+        Turns over 180 degrees, and full turns, go the given way.
+
+        Args:
+            degrees: Positive turns right(clockwise), negative turns left.
+            timeout: Seconds to give up after. If None, depends on the angle.
+
+        Examples:
+            >>> turnBy(90)  # turn right 90 degrees
+            >>> turnBy(-720)    # turn left twice
+
+        Returns: True if the angle was reached, False otherwise.
+        """
+        if not self._getDataWhile(DataType.Attitude):
+            self._printError(">> Failed to receive attitude")
+            return False
+
+        return self._turn(degrees, timeout)
+
+    def _turn(self, degrees, timeout):
+        """Run the heading controller from the last attitude, every new attitude updates the yaw setpoint.
+        """
+        if timeout is None:
+            timeout = 2 + abs(degrees) / 45
+
+        controller = self.headingController
+        controller.start(self._data.attitude.YAW, degrees)
+
+        done = False
+        timeStart = time()
+        while (time() - timeStart) < timeout:
+            if not self._waitData(DataType.Attitude, 0.1):
+                continue
+
+            if self._controlScheduler.isAborted():
+                break
+
+            power, done = controller.update(self._data.attitude.YAW)
+            if done:
                 break
-            sleep(0.05)
+            self._controlScheduler.setSetpoint(0, 0, power, 0)
+
+        self._controlScheduler.clearSetpoint()
+        self._transferControl(0, 0, 0, 0)
+
+        if not done:
+            self._printError(">> Failed to turn, {0:.1f} degrees left".format(controller.error))
+        return done
+
+    def _waitData(self, dataType, timeout):
+        """Wait for the next data of dataType, it is requested too in case the drone does not stream it.
+
+        Returns: True if new data arrived.
+        """
+        count = self._storageCount.d[dataType]
 
-    @lockState
+        def received():
+            return self._storageCount.d[dataType] != count
+
+        self._transferRequest(dataType)
+        return self._waitReceive(received, timeout)
+
+    @lockFlight
     def goToHeight(self, height):
         """This is a setter function will make the drone fly to the given height above the object directly below its IR sensor (usually the ground).
         It’s effective between 20 and 1500 millimeters.
@@ -997,43 +1290,92 @@ class CoDrone:
 
         height: An int from 20 to 2000 in millimeters.
         """
-        power = 30
-        interval = 20  # height - 10 ~ height + 10
+        self.holdAltitude(height)
 
         start_time = time()
         while time() - start_time < 100:
-            state = self.getHeight()
-            differ = height - state
-            if differ > interval:   # Up
-                self.sendControl(0, 0, 0, power)
-                sleep(0.1)
-            elif differ < -interval:    # Down
-                self.sendControl(0, 0, 0, -power)
-                sleep(0.1)
-            else:
+            if self.altitudeController.isSettled() or self._controlScheduler.isAborted():
                 break
+            self._controlScheduler.waitTick(0.1)
+
+        self.stopAltitudeHold()
+        self._controlScheduler.hold(0, 0, 0, 0, 1)
+
+    @lockFlight
+    def holdAltitude(self, height):
+        """This function keeps the drone at the given height in the background, other flight commands keep working
+        and only their throttle is replaced. Calling it again changes the height.
+        Every new range data(requested at the control rate) runs a filter and a PID, see AltitudeController.
+
+        Args:
+            height: An int from 20 to 2000 in millimeters.
+
+        Examples:
+            >>> holdAltitude(800)
+            >>> go(Direction.FORWARD, 2)    # flies forward at 800 mm
+            >>> stopAltitudeHold()
+        """
+        self.altitudeController.setTarget(height)
+
+        if not self._eventAltitudeStop.is_set():
+            return
+
+        # a thread stopped by emergencyStop() may still be running, one thread at a time drives the throttle
+        self.stopAltitudeHold()
+
+        self.altitudeController.reset()
+        self._eventAltitudeStop = Event()
+        self._threadAltitude = Thread(target=self._holdingAltitude, args=(self._eventAltitudeStop,), daemon=True)
+        self._threadAltitude.start()
+
+    def stopAltitudeHold(self):
+        """This function stops holdAltitude(), the throttle of the flight commands is used again.
+        """
+        thread = self._threadAltitude
+        if thread is None:
+            return
+
+        self._eventAltitudeStop.set()
+        if thread is not current_thread():
+            thread.join()
+        self._threadAltitude = None
+
+    def isAltitudeHeld(self):
+        """Returns: True while holdAltitude() runs and the height is within the tolerance of the target.
+        """
+        return (not self._eventAltitudeStop.is_set()) and self.altitudeController.isSettled()
+
+    def _holdingAltitude(self, stop):
+        """Altitude hold thread, run the controller on every new range data until stop is set.
+        """
+        controller = self.altitudeController
+        timeout = self._controlScheduler.period * 2
 
-        self.sendControl(0, 0, 0, 0)
-        sleep(1)
+        while (not stop.is_set()) and self.isOpen():
+            if self._waitData(DataType.Range, timeout):
+                self._controlScheduler.setThrottle(controller.update(self._data.range))
+
+        self._controlScheduler.setThrottle(None)
 
     ### FLIGHT COMMANDS (MOVEMENT) -------- END
 
 
     ### SENSORS -------- START
 
-    @lockState
-    def _getDataWhile(self, dataType, timer=None):
+    def _getDataWhile(self, dataType, maxAge=0):
         """This function checks if a request arrived or not and requests again maximum 3 times, 0.15sec
 
         Args:
             dataType: member values in the DataType class
-            timer: member values in the Timer class
+            maxAge: Seconds the stored data may be old to skip the request, None for the maxAge of the dataType,
+                0 to always request.
+
+        Returns: True if the stored data is fresh or new data arrived.
         """
-        timeStart = time()
+        if self._cache.isFresh(dataType, maxAge):
+            return True
 
-        if timer is not None:
-            if timer[0] > (timeStart - timer[1]):
-                return False
+        timeStart = time()
 
         header = Header()
         header.dataType = DataType.Request
@@ -1045,91 +1387,186 @@ class CoDrone:
         # Break the loop if request time is over 0.15sec, send the request maximum 3 times
         receivingFlag = self._storageCount.d[dataType]
         resendFlag = 1
+
+        def received():
+            return self._storageCount.d[dataType] != receivingFlag
+
         self._transfer(header, data)
-        while self._storageCount.d[dataType] == receivingFlag:
+        timeRequest = perf_counter()
+        while not received():
             interval = time() - timeStart
             if interval > 0.03 * resendFlag and resendFlag < 3:
                 self._transfer(header, data)
                 resendFlag += 1
             elif interval > 0.15:
+                self.metrics.addTimeout(dataType, resendFlag - 1)
                 break
-            sleep(0.01)
+
+            # sleep until the data arrives or the next resend
+            timeNext = 0.03 * resendFlag if resendFlag < 3 else 0.15
+            self._waitReceive(received, timeNext - (time() - timeStart))
+        else:
+            self.metrics.addResponse(dataType, perf_counter() - timeRequest, resendFlag - 1)
         return self._storageCount.d[dataType] > receivingFlag
 
-    def getHeight(self):
+    def getSnapshot(self, dataTypes, timeout=0.15):
+        """This function requests several sensors at once and waits for all of them with one shared deadline,
+        so reading N sensors costs about one round trip instead of N.
+        The requests go out back to back, only the missing ones are sent again, at most 3 times each.
+
+        Args:
+            dataTypes: A list of member values in the DataType class.
+            timeout: Seconds to wait for all the data.
+
+        Examples:
+            >>> snapshot = getSnapshot([DataType.Attitude, DataType.Imu, DataType.Range, DataType.Battery])
+            >>> snapshot[DataType.Range].bottom
+            >>> snapshot.missing    # the DataTypes which did not arrive
+
+        Returns: A Snapshot, None if a dataType is not a member of the DataType class.
+        """
+        if not all(isinstance(dataType, DataType) for dataType in dataTypes):
+            self._printError(">>> Parameter Type Error")    # print error message
+            return None
+
+        counts = {dataType: self._storageCount.d[dataType] for dataType in dataTypes}
+        data = {}
+        times = {}
+        resends = dict.fromkeys(counts, 0)
+
+        def received():
+            for dataType in counts:
+                if (dataType not in data) and (self._storageCount.d[dataType] != counts[dataType]):
+                    data[dataType] = self._storage.d[dataType]
+                    times[dataType] = time()
+                    self.metrics.addResponse(dataType, perf_counter() - timeRequest, resends[dataType])
+            return len(data) == len(counts)
+
+        timeRequest = perf_counter()
+        for dataType in counts:
+            self._transferRequest(dataType)
+
+        resendFlag = 1
+        while not received():
+            interval = perf_counter() - timeRequest
+            if interval > timeout:
+                break
+
+            if (interval > 0.03 * resendFlag) and (resendFlag < 3):
+                for dataType in counts:
+                    if dataType not in data:
+                        self._transferRequest(dataType)
+                        resends[dataType] += 1
+                resendFlag += 1
+
+            # sleep until all the data arrives, the next resend or the deadline
+            timeNext = min(0.03 * resendFlag, timeout) if resendFlag < 3 else timeout
+            self._waitReceive(received, timeNext - (perf_counter() - timeRequest))
+
+        missing = [dataType for dataType in counts if dataType not in data]
+        for dataType in missing:
+            self.metrics.addTimeout(dataType, resends[dataType])
+
+        return Snapshot(max(times.values()) if (times and not missing) else time(), data, times, missing)
+
+    def getHeight(self, maxAge=None):
         """This is a getter function gets the current height of the drone from the object directly below its IR sensor.
 
+        Args:
+            maxAge: Seconds the cached data may be old, None for the default of setMaxAge(), 0 to always request.
+
         Returns:  The current height above the object directly below the drone’s IR height sensor.
         """
 
         #Checks if a request arrived or not and requests again maximum 3 times, 0.15sec
-        self._getDataWhile(DataType.Range, self._timer.range)
+        self._getDataWhile(DataType.Range, maxAge)
         return self._data.range
 
-    def getPressure(self):
+    def getPressure(self, maxAge=None):
         """This is a getter function gets the data from the barometer sensor.
 
+        Args:
+            maxAge: Seconds the cached data may be old, None for the default of setMaxAge(), 0 to always request.
+
         Returns: The barometer’s air pressure in milibars at (0.13 resolution).
         """
 
         # Checks if a request arrived or not and requests again maximum 3 times, 0.15sec
-        self._getDataWhile(DataType.Pressure, self._timer.pressure)
+        self._getDataWhile(DataType.Pressure, maxAge)
         return self._data.pressure
 
-    def getDroneTemp(self):
+    def getDroneTemp(self, maxAge=None):
         """This is a getter function gets the data from the drone’s temperature sensor.
         Importantly, it reads the drone’s temperature, not the air around it.
 
+        Args:
+            maxAge: Seconds the cached data may be old, None for the default of setMaxAge(), 0 to always request.
+
         Returns: The temperature in celsius as an integer.
         """
 
         # Checks if a request arrived or not and requests again maximum 3 times, 0.15sec
-        self._getDataWhile(DataType.Pressure, self._timer.pressure)
+        self._getDataWhile(DataType.Pressure, maxAge)
         return self._data.temperature
 
-    def getAngularSpeed(self):
+    def getAngularSpeed(self, maxAge=None):
         """This function gets the data from the gyrometer sensor for the roll, pitch, and yaw angular speed.
 
+        Args:
+            maxAge: Seconds the cached data may be old, None for the default of setMaxAge(), 0 to always request.
+
         Returns: The Angle class. Angle has ROLL, PITCH, YAW.
         """
 
         # Checks if a request arrived or not and requests again maximum 3 times, 0.15sec
-        self._getDataWhile(DataType.Imu, self._timer.imu)
+        self._getDataWhile(DataType.Imu, maxAge)
         return self._data.gyro
 
-    def getGyroAngles(self):
+    def getGyroAngles(self, maxAge=None):
         """This function gets the data from the gyrometer sensor to determine the roll, pitch, and yaw as angles.
 
+        Args:
+            maxAge: Seconds the cached data may be old, None for the default of setMaxAge(), 0 to always request.
+
         Returns: The Angle class. Angle has ROLL, PITCH, YAW.
         """
 
         # Checks if a request arrived or not and requests again maximum 3 times, 0.15sec
-        self._getDataWhile(DataType.Attitude, self._timer.attitude)
+        self._getDataWhile(DataType.Attitude, maxAge)
         return self._data.attitude
 
-    def getAccelerometer(self):
+    def getAccelerometer(self, maxAge=None):
         """This function gets the accelerometer sensor data, which returns x, y, and z values in m/s2.
 
+        Args:
+            maxAge: Seconds the cached data may be old, None for the default of setMaxAge(), 0 to always request.
+
         Returns: The Axis class. Axis has X,Y,Z
         """
 
         # Checks if a request arrived or not and requests again maximum 3 times, 0.15sec
-        self._getDataWhile(DataType.Imu, self._timer.imu)
+        self._getDataWhile(DataType.Imu, maxAge)
         return self._data.accel
 
-    def getOptFlowPosition(self):
+    def getOptFlowPosition(self, maxAge=None):
         """This function gets the x and y coordinates from the optical flow sensor.
 
+        Args:
+            maxAge: Seconds the cached data may be old, None for the default of setMaxAge(), 0 to always request.
+
         Returns: The Position class. Position has X,Y
         """
 
         # Checks if a request arrived or not and requests again maximum 3 times, 0.15sec
-        self._getDataWhile(DataType.ImageFlow, self._timer.imageFlow)
+        self._getDataWhile(DataType.ImageFlow, maxAge)
         return self._data.imageFlow
 
-    def getState(self):
+    def getState(self, maxAge=None):
         """This function gets the state of the drone, as in whether it’s: ready, take off, flight, flip, stop, landing, reverse, accident, error
 
+        Args:
+            maxAge: Seconds the cached data may be old, None for the default of setMaxAge(), 0 to always request.
+
         Returns: string of member values in the ModeFlight class.
             READY, TAKE_OFF, FLIGHT, FLIP, STOP, LANDING, REVERSE, ACCIDENT, ERROR
 
@@ -1139,37 +1576,46 @@ class CoDrone:
         """
 
         # Checks if a request arrived or not and requests again maximum 3 times, 0.15sec
-        self._getDataWhile(DataType.State, self._timer.state)
+        self._getDataWhile(DataType.State, maxAge)
         return self._data.state.name
 
-    def getBatteryPercentage(self):
+    def getBatteryPercentage(self, maxAge=None):
         """This function gets the battery percentage of the drone.
 
+        Args:
+            maxAge: Seconds the cached data may be old, None for the default of setMaxAge(), 0 to always request.
+
         Returns: The battery’s percentage as an integer from 0 - 100.
         """
 
         # Checks if a request arrived or not and requests again maximum 3 times, 0.15sec
-        self._getDataWhile(DataType.Battery, self._timer.battery)
+        self._getDataWhile(DataType.Battery, maxAge)
         return self._data.batteryPercent
 
-    def getBatteryVoltage(self):
+    def getBatteryVoltage(self, maxAge=None):
         """This function gets the voltage of the battery.
 
+        Args:
+            maxAge: Seconds the cached data may be old, None for the default of setMaxAge(), 0 to always request.
+
         Returns: The voltage of the battery as an a float
         """
 
         # Checks if a request arrived or not and requests again maximum 3 times, 0.15sec
-        self._getDataWhile(DataType.Battery, self._timer.battery)
+        self._getDataWhile(DataType.Battery, maxAge)
         return self._data.batteryVoltage
 
-    def getTrim(self):
+    def getTrim(self, maxAge=None):
         """This function gets the current trim values of the drone.
 
+        Args:
+            maxAge: Seconds the cached data may be old, None for the default of setMaxAge(), 0 to always request.
+
         Returns: The Flight class. Flight has ROLL, PITCH, YAW, THROTTLE
         """
 
         # Checks if a request arrived or not and requests again maximum 3 times, 0.15sec
-        self._getDataWhile(DataType.TrimFlight, self._timer.trim)
+        self._getDataWhile(DataType.TrimFlight, maxAge)
         return self._data.trim
 
     ### SENSORS -------- END
@@ -1576,6 +2022,7 @@ class CoDrone:
 
     ### FLIGHT SEQUENCES -------- START
 
+    @lockFlight
     def flySequence(self, sequence):
         """This function makes the drone fly in a given pattern, then land.
 
@@ -1599,6 +2046,7 @@ class CoDrone:
         else:
             return None
 
+    @lockFlight
     def flyRoulette(self):
         """This function makes yaw for a random number of seconds between 5 and 10, then pitch forward in that direction.
         """
@@ -1608,12 +2056,14 @@ class CoDrone:
 
         self.hover(1)
 
+    @lockFlight
     def turtleTurn(self):
         """If the drone is in the upside down state.
         This function makes the drone turn right side up by spinning the right two propellers
         """
         self.go(Direction.UP, 1, 100)
 
+    @lockFlight
     def flySquare(self):
 
         self.go(Direction.RIGHT, 2, 30)
@@ -1623,33 +2073,38 @@ class CoDrone:
 
         self.hover(1)
 
+    @lockFlight
     def flyCircle(self):
 
         power = -50
-        yaw = self.getGyroAngles().YAW
+        yaw = self.getGyroAngles(0).YAW
         degree = -360 + yaw
 
+        # steer on every new attitude, like _turn(), not on a cached one
         startTime = time()
-        while (time() - startTime) < 15:
-            if abs(yaw - self._data.attitude.YAW) > 180:
+        while ((time() - startTime) < 15) and (not self._controlScheduler.isAborted()):
+            if not self._waitData(DataType.Attitude, 0.1):
+                continue
+            yawNow = self._data.attitude.YAW
+            if abs(yaw - yawNow) > 180:
                 degree += 360
-            yaw = self._data.attitude.YAW
+            yaw = yawNow
             if degree < yaw:
-                self.sendControl(10, 0, power, 0)
-                sleep(0.1)
+                self._controlScheduler.setSetpoint(10, 0, power, 0)
             else:
                 break
 
         self.hover(1)
 
+    @lockFlight
     def flySpiral(self):
 
         for i in range(5):
-            self.sendControl(10, 0, -50, -i * 2)
-            sleep(1)
+            self._controlScheduler.hold(10, 0, -50, -i * 2, 1)
 
         self.hover(1)
 
+    @lockFlight
     def flyTriangle(self):
 
         self.turnDegree(Direction.RIGHT, Degree.ANGLE_30)
@@ -1661,6 +2116,7 @@ class CoDrone:
 
         self.hover(1)
 
+    @lockFlight
     def flyHop(self):
 
         self.sendControlDuration(0, 30, 0, 50, 1)
@@ -1668,6 +2124,7 @@ class CoDrone:
 
         self.hover(1)
 
+    @lockFlight
     def flySway(self):
 
         for i in range(2):
@@ -1676,6 +2133,7 @@ class CoDrone:
 
         self.hover(1)
 
+    @lockFlight
     def flyZigzag(self):
 
         for i in range(2):
@@ -1839,6 +2297,159 @@ class CoDrone:
 
         return self._storageCount.d[dataType]
 
+    def enableHistory(self, dataType, capacity=1024):
+        """Keep the last capacity records of a numeric DataType(Attitude, Imu, Range, Pressure, ImageFlow,
+        Battery) with their arrival time.
+
+        Returns: The History of the dataType, None if the dataType has no history.
+        """
+        if dataType not in History.fields:
+            self._printError(">>> Parameter Type Error")    # print error message
+            return None
+
+        if (self._storageHistory.d[dataType] is None) or (self._storageHistory.d[dataType].capacity != capacity):
+            self._storageHistory.d[dataType] = History(dataType, capacity)
+
+        return self._storageHistory.d[dataType]
+
+    def disableHistory(self, dataType):
+        if (not isinstance(dataType, DataType)):
+            self._printError(">>> Parameter Type Error")    # print error message
+            return None
+
+        self._storageHistory.d[dataType] = None
+
+    def subscribe(self, dataTypes, rate=10, callback=None, maxsize=64):
+        """This function requests dataTypes rate times per second in the background and delivers every update
+        through a callback, a queue or an iterator. The getters and getData() then return the cached data at once.
+        Several subscriptions of a DataType share the requests at the highest rate.
+
+        Args:
+            dataTypes: A member value in the DataType class or a list of them.
+            rate: Requests per second of each DataType, 0 to only receive what the drone streams.
+            callback: function(dataType, data) called on the receiving thread, it must return quickly.
+                Without callback the updates are queued, see Subscription.get().
+            maxsize: Updates kept in the queue, the oldest are dropped first.
+
+        Examples:
+            >>> subscription = subscribe([DataType.Attitude, DataType.Range], 50)
+            >>> subscription.latest(DataType.Attitude).yaw
+            >>> for dataType, data in subscription:
+            ...     print(dataType, data)
+            >>> subscription.cancel()
+
+        Returns: The Subscription, None if a dataType is not a member of the DataType class.
+        """
+        if isinstance(dataTypes, DataType):
+            dataTypes = [dataTypes]
+
+        if not all(isinstance(dataType, DataType) for dataType in dataTypes):
+            self._printError(">>> Parameter Type Error")    # print error message
+            return None
+
+        subscription = Subscription(dataTypes, rate, callback, maxsize, self.unsubscribe)
+        with self._lockSubscription:
+            self._subscriptions.append(subscription)
+            self._updateSubscriptions(subscription.dataTypes)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """This function stops a subscription of subscribe(), same as subscription.cancel().
+        """
+        with self._lockSubscription:
+            if subscription not in self._subscriptions:
+                return
+            self._subscriptions.remove(subscription)
+            self._updateSubscriptions(subscription.dataTypes)
+        subscription.cancel()
+
+    def _updateSubscriptions(self, dataTypes):
+        """Rebuild the subscribers and the request rate of dataTypes, with _lockSubscription held.
+        """
+        for dataType in dataTypes:
+            subscribers = tuple(s for s in self._subscriptions if dataType in s.dataTypes)
+            if subscribers:
+                self._subscribers[dataType] = subscribers
+            else:
+                self._subscribers.pop(dataType, None)
+            self._requestScheduler.setRate(dataType, max((s.rate for s in subscribers), default=0))
+
+    def setMaxAge(self, dataType, seconds):
+        """This function sets how old the stored data of dataType may be before a getter requests it again.
+        Streamed or subscribed data keeps the cache fresh, so the getters return at once.
+
+        Args:
+            dataType: A member value in the DataType class.
+            seconds: The max age, 0 to always request.
+        """
+        if (not isinstance(dataType, DataType)):
+            self._printError(">>> Parameter Type Error")    # print error message
+            return None
+
+        self._cache.maxAge[dataType] = seconds
+
+    def getCacheStats(self):
+        """This function gets the hits and misses of the getters on the sensor cache.
+
+        Returns: A dict, see SensorCache.snapshot().
+        """
+        return self._cache.snapshot()
+
+    def setControlRate(self, rate):
+        """This function sets how many control frames per second the flight commands send.
+
+        Args:
+            rate: control frames per second, 50 by default.
+        """
+        self._controlScheduler.setRate(rate)
+
+    def getControlStats(self):
+        """This function gets the statistics of the control scheduler.
+
+        Returns: A dict with the rate, sent frames, missed deadlines and the jitter in sec.
+        """
+        return self._controlScheduler.getStats()
+
+    def getSendStats(self):
+        """This function gets the statistics of the writer thread.
+
+        Returns: A dict with the written frames, coalesced controls, write errors and the pending frames.
+        """
+        return self._writer.getStats()
+
+    def getMetrics(self):
+        """This function gets the traffic counters, request round trip times and receive buffer depth.
+
+        Returns: A dict, see Metrics.snapshot().
+        """
+        return self.metrics.snapshot()
+
+    def startRecording(self, fileName):
+        """Record the raw serial traffic(received bytes and transferred frames) with monotonic ns timestamps
+        to a binary file. Read it back with FlightLogReader. An existing file is appended.
+
+        Returns: The FlightLogRecorder.
+        """
+        self.stopRecording()
+        self._recorder = FlightLogRecorder(fileName)
+        return self._recorder
+
+    def stopRecording(self):
+        recorder = self._recorder
+        self._recorder = None
+
+        if recorder is not None:
+            recorder.close()
+
+    def getHistory(self, dataType):
+        """Returns: The History of the dataType, None if enableHistory() was not called.
+        """
+        if (not isinstance(dataType, DataType)):
+            self._printError(">>> Parameter Type Error")    # print error message
+            return None
+
+        return self._storageHistory.d[dataType]
+
 
     ### LEGACY CODE -------- START
 
@@ -0,0 +1,195 @@
+from enum import Enum
+from operator import eq
+from threading import RLock
+
+from CoDrone.system import *
+
+
+class ConnectState(Enum):
+    Idle = 0x00
+    Discovering = 0x01  # LinkDiscoverStart sent, collecting LinkDiscoveredDevice
+    Connecting = 0x02   # LinkConnect sent
+    Connected = 0x03    # EventLink.Connected, waiting for EventLink.ReadyToControl
+    Ready = 0x04        # ready to control
+    Failed = 0x05       # every attempt failed
+
+
+class LinkConnector:
+    """Event driven connection of the LINK board to a drone.
+
+    The state changes as soon as the LinkEvent or LinkDiscoveredDevice which causes it arrives: the requested
+    device is connected the moment it is discovered, without a device name the strongest one is connected
+    discoverWindow sec after the first one answered(or at ScanStop if earlier). Timeouts only bound each step,
+    a failed step starts the next attempt at once.
+
+    With a known device(see DeviceCache) the first attempt sends LinkConnect with its index right away, without a
+    scan. If it does not connect within directTimeout sec, or LinkEventAddress reports another address, the
+    connector disconnects and falls back to the discovery.
+
+    The owner feeds it with onDiscovered() and onLinkEvent() from its receive path and calls poll() when the
+    deadline of getDeadline() passed, until isDone().
+
+    Examples:
+        >>> connector = LinkConnector(drone.sendLinkDiscoverStart, drone.sendLinkDiscoverStop, drone.sendLinkConnect)
+        >>> connector.start(perf_counter())
+    """
+
+    def __init__(self, discoverStart, discoverStop, connect, deviceName="None", timeout=5, retries=5,
+                 discoverWindow=0.3, readyTimeout=1.2, known=None, directTimeout=1.0, disconnect=None):
+        """
+        Args:
+            discoverStart: function() which sends LinkDiscoverStart.
+            discoverStop: function() which sends LinkDiscoverStop.
+            connect: function(index) which sends LinkConnect.
+            deviceName: 4 digit device name, "None" for the device with the strongest signal.
+            timeout: Seconds to wait for the discovery and for the connection of each attempt.
+            retries: Attempts before Failed.
+            discoverWindow: Seconds to wait for more devices after the first one without a device name.
+            readyTimeout: Seconds to wait for ReadyToControl after Connected, as not every LINK firmware sends it.
+            known: KnownDevice to connect directly first, None to start with the discovery.
+            directTimeout: Seconds to wait for the direct connection.
+            disconnect: function() which sends LinkDisconnect, after a failed direct connection.
+        """
+        self._discoverStart = discoverStart
+        self._discoverStop = discoverStop
+        self._connect = connect
+        self._disconnect = disconnect
+
+        self.deviceName = deviceName
+        self.timeout = timeout
+        self.retries = retries
+        self.discoverWindow = discoverWindow
+        self.readyTimeout = readyTimeout
+        self.known = known
+        self.directTimeout = directTimeout
+
+        self.state = ConnectState.Idle
+        self.devices = []       # LinkDiscoveredDevice of the current attempt
+        self.target = None      # LinkDiscoveredDevice or KnownDevice being connected
+        self.address = None     # address of the connected device from LinkEventAddress, if the LINK sent it
+        self.attempt = 0
+        self.direct = False     # connecting the known device without a scan
+        self._deadline = None
+        self._lock = RLock()    # the receive path and the waiting caller both drive the state
+
+    def isDone(self):
+        return self.state in (ConnectState.Ready, ConnectState.Failed)
+
+    def isReady(self):
+        return self.state == ConnectState.Ready
+
+    def getDeadline(self):
+        """Returns: The time when poll() has to be called next, None when done.
+        """
+        with self._lock:
+            return None if self.isDone() else self._deadline
+
+    def matches(self, device):
+        """Returns: True if device is the requested one(any device without a device name).
+        """
+        if eq(self.deviceName, "None"):
+            return True
+        return (len(device.name) > 12) and (self.deviceName == device.name[8:12])
+
+    def start(self, now):
+        with self._lock:
+            self.attempt = 0
+            if self.known is not None:
+                self.direct = True
+                self._linkConnect(self.known, now, self.directTimeout)
+            else:
+                self._discover(now)
+
+    def onDiscovered(self, device, now):
+        with self._lock:
+            if (self.state != ConnectState.Discovering) or (not self.matches(device)):
+                return
+
+            self.devices.append(device)
+            if not eq(self.deviceName, "None"):
+                self._linkConnect(device, now)
+            elif len(self.devices) == 1:
+                self._deadline = min(self._deadline, now + self.discoverWindow)
+
+    def onLinkEvent(self, eventLink, now, address=None):
+        """
+        Args:
+            address: the address of a LinkEventAddress, None for a LinkEvent.
+        """
+        with self._lock:
+            if (address is not None) and (self.state in (ConnectState.Connecting, ConnectState.Connected)):
+                self.address = bytearray(address)
+                if self.direct and self.known.address and (self.address != self.known.address):
+                    self._retry(now)    # the index points to another drone now
+                    return
+
+            if self.state == ConnectState.Discovering:
+                if eventLink == EventLink.ScanStop:
+                    self._select(now)
+
+            elif self.state == ConnectState.Connecting:
+                if eventLink == EventLink.Connected:
+                    self.state = ConnectState.Connected
+                    self._deadline = now + self.readyTimeout
+                elif eventLink == EventLink.ReadyToControl:
+                    self.state = ConnectState.Ready
+                elif eventLink in (EventLink.ConnectionFaild, EventLink.ConnectionFaildNoDevices,
+                                   EventLink.ConnectionFaildNotReady, EventLink.Disconnected):
+                    self._retry(now)
+
+            elif self.state == ConnectState.Connected:
+                if eventLink == EventLink.ReadyToControl:
+                    self.state = ConnectState.Ready
+                elif eventLink == EventLink.Disconnected:
+                    self._retry(now)
+
+    def poll(self, now):
+        """Move on if the deadline of the current step passed.
+        """
+        with self._lock:
+            if self.isDone() or (now < self._deadline):
+                return
+
+            if self.state == ConnectState.Discovering:
+                self._select(now)
+            elif self.state == ConnectState.Connecting:
+                self._retry(now)
+            elif self.state == ConnectState.Connected:
+                self.state = ConnectState.Ready
+
+    def _discover(self, now):
+        self.state = ConnectState.Discovering
+        self.devices = []
+        self.target = None
+        self._deadline = now + self.timeout
+        self._discoverStart()
+
+    def _select(self, now):
+        if self.devices:
+            self._linkConnect(max(self.devices, key=lambda device: device.rssi), now)
+        else:
+            self._retry(now)
+
+    def _linkConnect(self, device, now, timeout=None):
+        self.state = ConnectState.Connecting
+        self.target = device
+        self.address = None
+        self._deadline = now + (self.timeout if timeout is None else timeout)
+        if not self.direct:
+            self._discoverStop()
+        self._connect(device.index)
+
+    def _retry(self, now):
+        if self.direct:
+            # the direct attempt does not count, fall back to the discovery
+            self.direct = False
+            if (self.state != ConnectState.Discovering) and (self._disconnect is not None):
+                self._disconnect()
+            self._discover(now)
+            return
+
+        self.attempt += 1
+        if self.attempt >= self.retries:
+            self.state = ConnectState.Failed
+        else:
+            self._discover(now)
@@ -0,0 +1,214 @@
+from math import pi
+from time import perf_counter
+
+
+def wrapDegree(degree):
+    """Returns: degree in -180 ~ 180.
+    """
+    return (degree + 180) % 360 - 180
+
+
+class PID:
+    """PID controller with output clamping, anti-windup and a static feed-forward.
+
+    The integral only accumulates while the output is not saturated, and the feed-forward(minOutput) is added
+    in the direction of the error so a small error still overcomes the deadband of the motors.
+    """
+
+    def __init__(self, kp, ki=0.0, kd=0.0, outputLimit=100, minOutput=0, deadband=0, integralZone=None):
+        """
+        Args:
+            kp, ki, kd: gains.
+            outputLimit: the output is clamped to -outputLimit ~ outputLimit.
+            minOutput: feed-forward added in the direction of the error while |error| > deadband.
+            deadband: no feed-forward and no integral inside this error.
+            integralZone: no integral outside this error(None: everywhere), so a long approach does not wind up.
+        """
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+        self.outputLimit = outputLimit
+        self.minOutput = minOutput
+        self.deadband = deadband
+        self.integralZone = integralZone
+
+        self.integral = 0.0
+        self._errorPast = None
+
+    def reset(self):
+        self.integral = 0.0
+        self._errorPast = None
+
+    def update(self, error, dt):
+        """Returns: The controller output for the error measured dt sec after the previous one.
+        """
+        derivative = 0.0
+        if (self._errorPast is not None) and (dt > 0):
+            derivative = (error - self._errorPast) / dt
+        self._errorPast = error
+
+        output = self.kp * error + self.ki * self.integral + self.kd * derivative
+
+        if abs(error) > self.deadband:
+            output += self.minOutput if error > 0 else -self.minOutput
+
+            # anti-windup: integrate only while the output is not saturated
+            if (abs(output) < self.outputLimit) and ((self.integralZone is None) or (abs(error) < self.integralZone)):
+                self.integral += error * dt
+
+        return max(-self.outputLimit, min(self.outputLimit, output))
+
+
+class HeadingController:
+    """Yaw controller which turns by any angle. The yaw from the drone wraps at -180/180, so every sample is
+    unwrapped against the previous one and turns over 180 degrees(or several full turns) work the same way.
+    Positive degrees turn right(clockwise), like a positive yaw control.
+
+    Examples:
+        >>> controller = HeadingController()
+        >>> controller.start(yaw, 90)
+        >>> power, done = controller.update(yaw)   # every new attitude
+    """
+
+    def __init__(self, kp=0.9, ki=0.2, kd=0.08, maxPower=60, minPower=8, tolerance=2, settleTime=0.15):
+        """
+        Args:
+            kp, ki, kd: PID gains in yaw power per degree.
+            maxPower: yaw power limit(0 ~ 100).
+            minPower: feed-forward power to overcome the motor deadband.
+            tolerance: degrees around the target which count as reached.
+            settleTime: seconds the yaw has to stay within tolerance.
+        """
+        if not (0 <= maxPower <= 100):
+            raise ValueError("maxPower must be from 0 to 100")
+
+        self.pid = PID(kp, ki, kd, maxPower, minPower, tolerance)
+        self.tolerance = tolerance
+        self.settleTime = settleTime
+
+        self.target = 0.0   # unwrapped
+        self.yaw = 0.0      # unwrapped
+        self.error = 0.0
+
+        self._yawPast = 0.0
+        self._timePast = None
+        self._timeSettle = None
+
+    def start(self, yaw, degrees):
+        """Start a turn by degrees from the current yaw.
+        """
+        self.pid.reset()
+        self.yaw = float(yaw)
+        self.target = self.yaw + degrees
+        self.error = degrees
+
+        self._yawPast = yaw
+        self._timePast = None
+        self._timeSettle = None
+
+    def update(self, yaw, now=None):
+        """Feed a new yaw sample.
+
+        Returns: (yaw power, True if the target was reached and held for settleTime)
+        """
+        if now is None:
+            now = perf_counter()
+
+        self.yaw += wrapDegree(yaw - self._yawPast)
+        self._yawPast = yaw
+        self.error = self.target - self.yaw
+
+        dt = 0.0 if self._timePast is None else now - self._timePast
+        self._timePast = now
+
+        if abs(self.error) <= self.tolerance:
+            if self._timeSettle is None:
+                self._timeSettle = now
+            if now - self._timeSettle >= self.settleTime:
+                return 0, True
+        else:
+            self._timeSettle = None
+
+        return int(round(self.pid.update(self.error, dt))), False
+
+
+class AltitudeController:
+    """Throttle controller which holds the height from the bottom range sensor.
+
+    Samples that jump more than maxStep from the filtered height are dropped as spikes(at most 3 in a row,
+    then the jump is taken as real), the rest go through a first order low pass filter before the PID.
+
+    Examples:
+        >>> controller = AltitudeController()
+        >>> controller.setTarget(1000)
+        >>> throttle = controller.update(drone.getData(DataType.Range).bottom)   # every new range
+    """
+
+    def __init__(self, kp=0.15, ki=0.03, kd=0.02, maxThrottle=60, tolerance=10, cutoff=5.0, maxStep=300):
+        """
+        Args:
+            kp, ki, kd: PID gains in throttle per mm.
+            maxThrottle: throttle limit(0 ~ 100).
+            tolerance: mm around the target which count as reached.
+            cutoff: Hz of the low pass filter.
+            maxStep: mm between two samples above which a sample is a spike.
+        """
+        if not (0 <= maxThrottle <= 100):
+            raise ValueError("maxThrottle must be from 0 to 100")
+
+        self.pid = PID(kp, ki, kd, maxThrottle, 0, 2, integralZone=100)
+        self.tolerance = tolerance
+        self.cutoff = cutoff
+        self.maxStep = maxStep
+
+        self.target = 0
+        self.height = None      # filtered
+        self.error = 0.0
+        self.throttle = 0
+
+        self._timePast = None
+        self._countSpike = 0
+
+    def setTarget(self, height):
+        self.target = height
+        if self.height is not None:
+            self.error = self.target - self.height
+
+    def reset(self):
+        self.pid.reset()
+        self.height = None
+        self.error = 0.0
+        self.throttle = 0
+        self._timePast = None
+        self._countSpike = 0
+
+    def isSettled(self):
+        return (self.height is not None) and (abs(self.error) <= self.tolerance)
+
+    def update(self, height, now=None):
+        """Feed a new range sample in mm.
+
+        Returns: The throttle(-maxThrottle ~ maxThrottle).
+        """
+        if now is None:
+            now = perf_counter()
+
+        if self.height is None:
+            self.height = float(height)
+            self._timePast = now
+            dt = 0.0
+        else:
+            if (abs(height - self.height) > self.maxStep) and (self._countSpike < 3):
+                self._countSpike += 1
+                return self.throttle
+            self._countSpike = 0
+
+            dt = now - self._timePast
+            self._timePast = now
+
+            rc = 1 / (2 * pi * self.cutoff)
+            self.height += (height - self.height) * (dt / (dt + rc) if dt > 0 else 1.0)
+
+        self.error = self.target - self.height
+        self.throttle = int(round(self.pid.update(self.error, dt)))
+        return self.throttle
@@ -24,6 +24,7 @@
     (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
     SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
+from binascii import crc_hqx
 
 
 class CRC16:
@@ -63,6 +64,9 @@ class CRC16:
         0x6e17, 0x7e36, 0x4e55, 0x5e74, 0x2e93, 0x3eb2, 0x0ed1, 0x1ef0
     )
 
+    # buffer engine used by calc(), one of "hqx", "table"
+    backend = "hqx"
+
     @classmethod
     def calc(cls, data, crc):
 
@@ -70,11 +74,41 @@ class CRC16:
         if type(data) == int:
             index = ((crc >> 8) ^ data) & 0x00FF
             result = ((crc << 8) ^ cls.table[index]) & 0xFFFF
+        elif isinstance(data, (bytes, bytearray, memoryview)):
+            result = cls.calcBuffer(data, crc)
         elif hasattr(data, "__len__"):
-            result = crc
-            for i in range(0, len(data)):
-                index = ((result >> 8) ^ data[i]) & 0x00FF
-                result = ((result << 8) ^ cls.table[index]) & 0xFFFF
+            result = cls.calcTable(data, crc)
+
+        return result
+
+    @classmethod
+    def calcBuffer(cls, data, crc=0):
+        """Calculate the crc of a bytes, bytearray or memoryview with the selected backend.
+        """
+        if cls.backend == "hqx":
+            return crc_hqx(data, crc)
+        else:
+            return cls.calcTable(data, crc)
+
+    @classmethod
+    def calcTable(cls, data, crc=0):
+        """Byte at a time reference implementation.
+        """
+        table = cls.table
+        result = crc
+        for value in data:
+            result = ((result << 8) ^ table[((result >> 8) ^ value) & 0x00FF]) & 0xFFFF
 
         return result
 
+    @classmethod
+    def setBackend(cls, backend):
+        """Select the engine for buffers.
+
+        Args:
+            backend: "hqx"(binascii.crc_hqx, same polynomial) or "table"
+        """
+        if backend not in ("hqx", "table"):
+            raise ValueError("unknown crc backend : {0}".format(backend))
+
+        cls.backend = backend
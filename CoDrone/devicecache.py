@@ -0,0 +1,122 @@
+import json
+import os
+import tempfile
+from threading import Lock
+from time import time
+
+
+class KnownDevice:
+    """A drone connected before, with the fields of LinkDiscoveredDevice which connect() needs.
+    """
+
+    def __init__(self, name="", address=b"", index=0, rssi=0, portName="None", timeConnected=0.0):
+        self.name = name                        # full device name such as "CODRONE_1234"
+        self.address = bytearray(address)      # BLE address from LinkDiscoveredDevice/LinkEventAddress
+        self.index = index                      # index in the device table of the LINK
+        self.rssi = rssi
+        self.portName = portName                # LINK board it was connected through
+        self.timeConnected = timeConnected      # time() of the last connection
+
+    def toDict(self):
+        return {
+            "name": self.name,
+            "address": self.address.hex(),
+            "index": self.index,
+            "rssi": self.rssi,
+            "portName": self.portName,
+            "timeConnected": self.timeConnected,
+        }
+
+    @classmethod
+    def fromDict(cls, data):
+        return cls(str(data["name"]), bytearray.fromhex(data["address"]), int(data["index"]), int(data["rssi"]),
+                   str(data["portName"]), float(data["timeConnected"]))
+
+
+class DeviceCache:
+    """Drones connected before, kept in a small json file so connect() can try them without a scan.
+
+    Entries are keyed by the 4 digit device name(name[8:12]). A missing or broken file is an empty cache.
+    Every change re-reads the file, merges into it and replaces it atomically through a temporary file of its own,
+    so several drones(or processes) sharing the file keep each other's entries.
+
+    Examples:
+        >>> cache = DeviceCache()
+        >>> cache.get("1234").portName
+        >>> cache.forget("1234")
+    """
+
+    defaultPath = os.path.join(os.path.expanduser("~"), ".codrone", "devices.json")
+    _lock = Lock()  # read, merge and write of the instances in this process
+
+    def __init__(self, path=None):
+        """
+        Args:
+            path: json file, None for ~/.codrone/devices.json.
+        """
+        self.path = path if path is not None else self.defaultPath
+        self._devices = None    # loaded on first use
+
+    @staticmethod
+    def getKey(name):
+        """Returns: The 4 digit device name of a full device name, the name itself if it is not a full one.
+        """
+        name = name.rstrip("\x00")
+        return name[8:12] if len(name) >= 12 else name
+
+    def get(self, deviceName):
+        """Returns: The KnownDevice of a 4 digit device name, None if it was never connected.
+        """
+        return self._load().get(deviceName)
+
+    def getAll(self):
+        return list(self._load().values())
+
+    def remember(self, device, portName):
+        """Store a connected device(a LinkDiscoveredDevice or KnownDevice) and the port it was connected through.
+        """
+        knownDevice = KnownDevice(device.name.rstrip("\x00"), device.address, device.index, device.rssi, portName,
+                                  time())
+        with self._lock:
+            devices = self._load(True)
+            devices[self.getKey(knownDevice.name)] = knownDevice
+            self._save()
+        return knownDevice
+
+    def forget(self, deviceName=None):
+        """Remove one device, or every device if deviceName is None.
+        """
+        with self._lock:
+            devices = self._load(True)
+            if deviceName is None:
+                devices.clear()
+            elif devices.pop(deviceName, None) is None:
+                return
+            self._save()
+
+    def _load(self, reload=False):
+        if (self._devices is None) or reload:
+            self._devices = {}
+            try:
+                with open(self.path, "r") as file:
+                    for key, data in json.load(file).items():
+                        self._devices[key] = KnownDevice.fromDict(data)
+            except (OSError, ValueError, KeyError, TypeError, AttributeError):
+                pass
+        return self._devices
+
+    def _save(self):
+        pathTemp = None
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            handle, pathTemp = tempfile.mkstemp(prefix=".devices-", suffix=".tmp", dir=directory)
+            with os.fdopen(handle, "w") as file:
+                json.dump({key: device.toDict() for key, device in self._devices.items()}, file, indent=2)
+            os.replace(pathTemp, self.path)
+        except OSError:
+            if pathTemp is not None:
+                try:
+                    os.remove(pathTemp)
+                except OSError:
+                    pass
@@ -0,0 +1,214 @@
+import asyncio
+from threading import Thread
+from time import perf_counter
+
+from CoDrone.asynccodrone import AsyncCoDrone
+from CoDrone.metrics import Histogram
+
+
+class Fleet:
+    """Many drones, each behind its own LINK board, driven from a single event loop thread.
+
+    Every port is read by the same loop(see AsyncCoDrone), so N drones cost one thread instead of 2N. Commands go
+    to all drones at once: the frames are written back to back in one loop iteration, then the acks are awaited
+    together, so connecting or taking off a fleet takes as long as the slowest drone.
+    Broadcast controls patch every frame first and write them afterwards, the time between the first and the last
+    write is kept in the skew histogram. A port which does not take its frame at once queues it instead of
+    delaying the others.
+
+    Examples:
+        >>> with Fleet(["COM3", "COM4", "COM5"], ["1234", "5678", "9012"]) as fleet:
+        ...     fleet.connect()
+        ...     fleet.takeoff()
+        ...     fleet.sendControlDuration(0, 30, 0, 0, 2)
+        ...     print(fleet.gather("getBatteryPercentage"))
+        ...     fleet.land()
+    """
+
+    def __init__(self, portNames, deviceNames=None, flagShowErrorMessage=False, flagShowLogMessage=False):
+        """
+        Args:
+            portNames: Serial port name of each LINK board.
+            deviceNames: 4 digit device name of the drone of each port. A LINK board finds every drone nearby,
+                so without names each board connects to the strongest signal and boards can pick the same drone.
+        """
+        self.portNames = list(portNames)
+        self.deviceNames = list(deviceNames) if deviceNames is not None else ["None"] * len(self.portNames)
+        if len(self.deviceNames) != len(self.portNames):
+            raise ValueError("deviceNames must have one name per port")
+
+        self.drones = [AsyncCoDrone(flagShowErrorMessage, flagShowLogMessage) for _ in self.portNames]
+        self.skew = Histogram()     # seconds between the first and the last write of a broadcast
+
+        self._loop = None
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+
+    def __len__(self):
+        return len(self.drones)
+
+    def isRunning(self):
+        return self._thread is not None
+
+    def start(self):
+        """Start the event loop thread.
+        """
+        if self._thread is not None:
+            return
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Close every port and stop the event loop thread.
+        """
+        if self._thread is None:
+            return
+
+        self._call(self._closeAll())
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+        self._thread = None
+
+    def run(self, coroutine, timeout=None):
+        """Run a coroutine on the fleet's event loop and wait for its result, to script the drones directly.
+
+        Examples:
+            >>> fleet.run(fleet.drones[0].getHeight())
+        """
+        return self._call(coroutine, timeout)
+
+    def open(self):
+        """Open every port.
+
+        Returns: A list of bool, True where the port opened.
+        """
+        self.start()
+        return self._call(self._openAll())
+
+    def connect(self, timeout=5):
+        """Open every port, discover and connect all drones in parallel.
+
+        Returns: A list of bool, True where the drone connected.
+        """
+        self.start()
+        return self._call(self._gather([drone.connect(deviceName, portName, timeout)
+                                        for drone, deviceName, portName
+                                        in zip(self.drones, self.deviceNames, self.portNames)]))
+
+    def isConnected(self):
+        return [drone.isConnected() for drone in self.drones]
+
+    def gather(self, methodName, *args, **kwargs):
+        """Call a method of AsyncCoDrone on every drone at once, such as a getter.
+
+        Returns: A list of the results. A drone which raised has the exception in its place.
+        """
+        return self._call(self._gather([self._await(getattr(drone, methodName)(*args, **kwargs))
+                                        for drone in self.drones]))
+
+    def takeoff(self):
+        return self.gather("takeoff")
+
+    def land(self):
+        return self.gather("land")
+
+    def hover(self, duration=0):
+        return self.gather("hover", duration)
+
+    def emergencyStop(self):
+        return self.gather("emergencyStop")
+
+    def sendControl(self, roll, pitch, yaw, throttle):
+        """Send one control frame to every drone with the least skew between drones.
+
+        Args:
+            roll, pitch, yaw, throttle: the same values for every drone, or a list with one value per drone.
+
+        Returns: Seconds between the first and the last write.
+        """
+        setpoints = self._setpoints(roll, pitch, yaw, throttle)
+        return self._call(self._broadcast(setpoints))
+
+    def sendControlDuration(self, roll, pitch, yaw, throttle, duration, rate=50):
+        """Send synchronized control frames rate times per second for duration sec, then hover for 1 sec.
+        Values can be lists with one value per drone, see sendControl().
+        """
+        setpoints = self._setpoints(roll, pitch, yaw, throttle)
+        self._call(self._broadcastDuration(setpoints, duration, rate))
+        self.hover(1)
+
+    def getStats(self):
+        """Returns: A dict with the drones, the connected ones and the broadcast skew histogram in sec.
+        """
+        return {
+            "drones": len(self.drones),
+            "connected": sum(self.isConnected()),
+            "skew": self.skew.snapshot(),
+        }
+
+    def _call(self, coroutine, timeout=None):
+        if self._loop is None:
+            raise RuntimeError("the fleet is not started")
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result(timeout)
+
+    def _setpoints(self, roll, pitch, yaw, throttle):
+        values = []
+        for value in (roll, pitch, yaw, throttle):
+            if isinstance(value, (list, tuple)):
+                if len(value) != len(self.drones):
+                    raise ValueError("a list of values needs one value per drone")
+                values.append(list(value))
+            else:
+                values.append([value] * len(self.drones))
+        return list(zip(*values))
+
+    @staticmethod
+    async def _await(result):
+        if asyncio.iscoroutine(result):
+            return await result
+        return result
+
+    @staticmethod
+    async def _gather(coroutines):
+        return await asyncio.gather(*coroutines, return_exceptions=True)
+
+    async def _openAll(self):
+        return [drone.isOpen() or drone.open(portName) for drone, portName in zip(self.drones, self.portNames)]
+
+    async def _closeAll(self):
+        for drone in self.drones:
+            drone.close()
+
+    async def _broadcast(self, setpoints):
+        # patch every frame first, so only the writes are between the first and the last drone
+        frames = [(drone, drone._controlFrame.setAll(*setpoint))
+                  for drone, setpoint in zip(self.drones, setpoints) if drone.isOpen()]
+        if not frames:
+            return 0.0
+
+        timeFirst = perf_counter()
+        for drone, dataArray in frames:
+            drone._write(dataArray)     # never blocks the loop, see AsyncCoDrone._write()
+        skew = perf_counter() - timeFirst
+
+        self.skew.add(skew)
+        return skew
+
+    async def _broadcastDuration(self, setpoints, duration, rate):
+        period = 1 / rate
+        timeStart = self._loop.time()
+        deadline = timeStart
+        while (self._loop.time() - timeStart) < duration:
+            await self._broadcast(setpoints)
+            deadline += period
+            await asyncio.sleep(max(0.0, deadline - self._loop.time()))
@@ -0,0 +1,158 @@
+import mmap
+from enum import Enum
+from struct import Struct
+from threading import Lock
+from time import monotonic_ns
+
+from CoDrone.receiver import Receiver
+from CoDrone.storage import Parser
+
+
+class LogDirection(Enum):
+    Receive = 0x00  # bytes read from the serial port
+    Transfer = 0x01  # frames written to the serial port
+
+
+# File: magic(8 bytes) + records
+# Record: timestamp(u64, monotonic ns) + direction(u8) + length(u32) + raw bytes
+_magic = b"CDFLOG\x00\x01"
+_record = Struct('<QBI')
+_directions = tuple(LogDirection)
+
+
+class FlightLogRecorder:
+    """Append-only binary log of the raw serial traffic. Received bytes are stored as they are read from the
+    port(frames can be split or corrupted, the reader reassembles them) and transferred frames are stored
+    as they are written.
+
+    Examples:
+        >>> drone.startRecording("flight.cdlog")
+        >>> ...
+        >>> drone.stopRecording()
+    """
+
+    def __init__(self, fileName, bufferSize=65536):
+        self.fileName = fileName
+        self.countRecord = 0
+        self.countBytes = 0
+
+        self._lock = Lock()
+        self._file = open(fileName, "ab", buffering=bufferSize)
+        if self._file.tell() == 0:
+            self._file.write(_magic)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def isOpen(self):
+        return not self._file.closed
+
+    def write(self, direction, dataArray):
+        """Append one record.
+
+        Args:
+            direction: A member value in the LogDirection class.
+            dataArray: bytes, bytearray or memoryview of the raw data.
+        """
+        timestamp = monotonic_ns()
+
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(_record.pack(timestamp, direction.value, len(dataArray)))
+            self._file.write(dataArray)
+
+        self.countRecord += 1
+        self.countBytes += len(dataArray)
+
+    def flush(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+class FlightLogReader:
+    """Memory-mapped reader of a FlightLogRecorder file. Records are read in place without loading the file.
+
+    Examples:
+        >>> with FlightLogReader("flight.cdlog") as log:
+        ...     for timestamp, direction, header, data in log.messages():
+        ...         print(timestamp, header.dataType, data)
+    """
+
+    def __init__(self, fileName):
+        self.fileName = fileName
+
+        self._file = open(fileName, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise ValueError("{0} is not a flight log".format(fileName))
+
+        if self._mmap[:len(_magic)] != _magic:
+            self.close()
+            raise ValueError("{0} is not a flight log".format(fileName))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def close(self):
+        if not self._mmap.closed:
+            self._mmap.close()
+        self._file.close()
+
+    def records(self):
+        """Yields: (timestamp ns, LogDirection, bytes of the raw data) of every record.
+        A truncated last record(the recorder was killed while writing) is ignored.
+
+        Each record is sliced out of the map, so no buffer of the map is held between records and close() works
+        while the generator is suspended or after breaking out of it.
+        """
+        data = self._mmap
+        end = len(data)
+        offset = len(_magic)
+
+        while offset + _record.size <= end:
+            if data.closed:
+                return
+            timestamp, direction, length = _record.unpack_from(data, offset)
+            offset += _record.size
+            if offset + length > end:
+                break
+
+            yield timestamp, _directions[direction], data[offset:offset + length]
+            offset += length
+
+    def messages(self, direction=None):
+        """Reassemble the frames of the records and parse them with the Parser.
+
+        Args:
+            direction: A member value in the LogDirection class to read only one direction, None for both.
+
+        Yields: (timestamp ns, LogDirection, Header, data). data is None for the types the Parser does not know.
+        """
+        parser = Parser()
+        receivers = {LogDirection.Receive: Receiver(), LogDirection.Transfer: Receiver()}
+
+        for timestamp, logDirection, dataArray in self.records():
+            if (direction is not None) and (logDirection != direction):
+                continue
+
+            for header, data in receivers[logDirection].scan(dataArray):
+                parse = parser.d[header.dataType]
+                if (parse is None) and (parser.codec.d[header.dataType] is not None):
+                    parse = parser.codec.d[header.dataType].parse   # transfer only types such as Control
+
+                yield timestamp, logDirection, header, (parse(data) if parse is not None else None)
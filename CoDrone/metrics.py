@@ -0,0 +1,155 @@
+from bisect import bisect_left
+from time import perf_counter
+
+from CoDrone.protocol import DataType
+
+
+class Histogram:
+    """Latency histogram with preallocated power of 2 buckets from 1 us to about 1 sec.
+    add() only increments counters so it can stay on in flight.
+    """
+
+    # upper bound of each bucket in sec, the last bucket takes everything longer
+    bounds = tuple((2 ** i) / 1000000 for i in range(21))
+
+    def __init__(self):
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, ratio):
+        """Returns: The upper bound(at most max) of the bucket which contains the ratio(0 ~ 1) percentile
+            in sec, 0 if empty.
+        """
+        if self.count == 0:
+            return 0.0
+
+        target = ratio * self.count
+        accumulated = 0
+        for index, count in enumerate(self.counts):
+            accumulated += count
+            if (accumulated >= target) and (count > 0):
+                return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+
+        return self.max
+
+    def clear(self):
+        for index in range(len(self.counts)):
+            self.counts[index] = 0
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.50),
+            "p90": self.percentile(0.90),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+            "buckets": {"{0:g}".format(bound): count for bound, count in zip(self.bounds, self.counts) if count},
+            "overflow": self.counts[-1],
+        }
+
+
+class Metrics:
+    """Counters of the serial traffic of a CoDrone. Everything is preallocated and updated without locks,
+    a concurrent update can be lost in rare cases which is fine for monitoring.
+
+    Counters of each DataType:
+        received: frames with a valid crc
+        parsed: frames the Parser decoded
+        crcErrors: frames dropped by a crc mismatch
+        sent: frames transferred
+        timeouts: requests(_getDataWhile) or acks(_checkAck) that never arrived
+        retransmits: frames transferred again while waiting for the response
+
+    Examples:
+        >>> drone.getMetrics()["rtt"]["Attitude"]["p99"]
+    """
+
+    counterNames = ("received", "parsed", "crcErrors", "sent", "timeouts", "retransmits")
+
+    def __init__(self):
+        self.received = dict.fromkeys(list(DataType), 0)
+        self.parsed = dict.fromkeys(list(DataType), 0)
+        self.crcErrors = dict.fromkeys(list(DataType), 0)
+        self.sent = dict.fromkeys(list(DataType), 0)
+        self.timeouts = dict.fromkeys(list(DataType), 0)
+        self.retransmits = dict.fromkeys(list(DataType), 0)
+
+        # request -> response round trip of each requested DataType
+        self.rtt = {dataType: Histogram() for dataType in DataType}
+
+        self.bytesIn = 0
+        self.bytesOut = 0
+        self.receiveErrors = 0
+        self.queueDepth = 0     # bytes waiting in the receive buffer at the last check
+        self.queueDepthMax = 0
+
+        self.timeStart = perf_counter()
+
+    def updateQueueDepth(self, depth):
+        self.queueDepth = depth
+        if depth > self.queueDepthMax:
+            self.queueDepthMax = depth
+
+    def addResponse(self, dataType, rtt, retransmits):
+        """Record a request or an ack that arrived rtt sec after the first transfer.
+        """
+        self.rtt[dataType].add(rtt)
+        self.retransmits[dataType] += retransmits
+
+    def addTimeout(self, dataType, retransmits):
+        self.timeouts[dataType] += 1
+        self.retransmits[dataType] += retransmits
+
+    def reset(self):
+        for name in self.counterNames:
+            counter = getattr(self, name)
+            for dataType in counter:
+                counter[dataType] = 0
+
+        for histogram in self.rtt.values():
+            histogram.clear()
+
+        self.bytesIn = 0
+        self.bytesOut = 0
+        self.receiveErrors = 0
+        self.queueDepth = 0
+        self.queueDepthMax = 0
+        self.timeStart = perf_counter()
+
+    def snapshot(self):
+        """Returns: A dict of the current values. DataTypes without any count are left out.
+        """
+        interval = perf_counter() - self.timeStart
+
+        dataTypes = {}
+        for dataType in DataType:
+            counters = {name: getattr(self, name)[dataType] for name in self.counterNames}
+            if any(counters.values()):
+                dataTypes[dataType.name] = counters
+
+        return {
+            "uptime": interval,
+            "bytesIn": self.bytesIn,
+            "bytesOut": self.bytesOut,
+            "bytesInPerSec": self.bytesIn / interval if interval > 0 else 0.0,
+            "bytesOutPerSec": self.bytesOut / interval if interval > 0 else 0.0,
+            "receiveErrors": self.receiveErrors,
+            "queueDepth": self.queueDepth,
+            "queueDepthMax": self.queueDepthMax,
+            "dataTypes": dataTypes,
+            "rtt": {dataType.name: histogram.snapshot() for dataType, histogram in self.rtt.items()
+                    if histogram.count},
+        }
@@ -2,6 +2,7 @@ import abc
 from struct import *
 from time import time
 
+from CoDrone.crc import CRC16
 from CoDrone.system import *
 
 # ISerializable Start
@@ -9,6 +10,7 @@ from CoDrone.system import *
 
 class ISerializable:
     __metaclass__ = abc.ABCMeta
+    __slots__ = ()
 
     @abc.abstractmethod
     def getSize(self):
@@ -18,6 +20,17 @@ class ISerializable:
     def ToArray(self):
         pass
 
+    def packInto(self, buffer, offset=0):
+        """Write the data into buffer at offset without making a new array.
+        """
+        buffer[offset:offset + self.getSize()] = self.toArray()
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        """Parse the data at offset of buffer without slicing the buffer first.
+        """
+        return cls.parse(buffer[offset:offset + cls.getSize()])
+
 
 # ISerializable End
 
@@ -35,18 +48,8 @@ class EventStatesFunc:
 
 class Timer:
     def __init__(self):
-        # [ time interval, variable to save start time ]
-        self.address = [0, 0]
-        self.attitude = [0.1, 0]
-        self.battery = [5, 0]
-        self.imu = [0, 0]
-        self.pressure = [3, 0]
-        self.trim = [0, 0]
-        self.range = [0, 0]
-        self.state = [0.1, 0]
-        self.imageFlow = [0, 0]
-
-        # Event states flag
+        # [ time interval, variable to save start time ] of the event states flag
+        # the freshness of the sensor data is kept in storage.SensorCache
         self.upsideDown = [5, 0]
         self.takeoff = [5, 0]
         self.flying = [10, 0]
@@ -84,36 +87,29 @@ class Data(EventStatesFunc):
 
     def eventUpdateAddress(self, data):
         self.address = data.address
-        self.timer.address[1] = time()
 
     def eventUpdateAttitude(self, data):
         self.attitude = Angle(data.roll, data.pitch, data.yaw)
-        self.timer.address[1] = time()
 
     def eventUpdateBattery(self, data):
         self.batteryPercent = data.batteryPercent
         self.batteryVoltage = data.voltage
-        self.timer.battery[1] = time()
 
     def eventUpdateImu(self, data):
         self.accel = Axis(data.accelX, data.accelY, data.accelZ)
         self.gyro = Angle(data.gyroRoll, data.gyroPitch, data.gyroYaw)
-        self.timer.imu[1] = time()
 
     def eventUpdatePressure(self, data):
         self.pressure = data.pressure
         self.temperature = data.temperature
-        self.timer.pressure[1] = time()
 
     def eventUpdateRange(self, data):
         self.range = data.bottom
-        self.timer.range[1] = time()
 
     def eventUpdateState_(self, data):
         self.reversed = data.sensorOrientation
         self.batteryPercent = data.battery
         self.state = data.modeFlight
-        self.timer.state[1] = time()
 
     def eventUpdateState(self, data):
         self.reversed = data.sensorOrientation
@@ -157,11 +153,9 @@ class Data(EventStatesFunc):
 
     def eventUpdateTrim(self, data):
         self.trim = Flight(data.roll, data.pitch, data.yaw, data.throttle)
-        self.timer.trim[1] = time()
 
     def eventUpdateImageFlow(self, data):
         self.imageFlow = Position(data.positionX, data.positionY)
-        self.timer.imageFlow[1] = time()
 
     def eventUpdateAck(self, data):
         self.ack = data
@@ -308,6 +302,8 @@ class CommandType(Enum):
 
 
 class Header(ISerializable):
+    struct = Struct('<BB')
+
     def __init__(self):
         self.dataType = DataType.None_
         self.length = 0
@@ -317,20 +313,27 @@ class Header(ISerializable):
         return 2
 
     def toArray(self):
-        return pack('<BB', self.dataType.value, self.length)
+        return self.struct.pack(self.dataType.value, self.length)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.dataType.value, self.length)
 
     @classmethod
     def parse(cls, dataArray):
-        header = Header()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        header.dataType, header.length = unpack('<BB', dataArray)
+        return cls.parseFrom(dataArray)
 
-        header.dataType = DataType(header.dataType)
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
 
-        return header
+        data.dataType, data.length = cls.struct.unpack_from(buffer, offset)
+
+        data.dataType = DataType(data.dataType)
+
+        return data
 
 
 # Header End
@@ -341,6 +344,8 @@ class Header(ISerializable):
 
 
 class Ping(ISerializable):
+    struct = Struct('<I')
+
     def __init__(self):
         self.systemTime = 0
 
@@ -349,20 +354,30 @@ class Ping(ISerializable):
         return 4
 
     def toArray(self):
-        return pack('<I', self.systemTime)
+        return self.struct.pack(self.systemTime)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.systemTime)
 
     @classmethod
     def parse(cls, dataArray):
-        data = Ping()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.systemTime, = unpack('<I', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.systemTime, = cls.struct.unpack_from(buffer, offset)
+
         return data
 
 
 class Ack(ISerializable):
+    struct = Struct('<IB')
+
     def __init__(self):
         self.systemTime = 0
         self.dataType = DataType.None_
@@ -372,21 +387,31 @@ class Ack(ISerializable):
         return 5
 
     def toArray(self):
-        return pack('<IB', self.systemTime, self.dataType.value)
+        return self.struct.pack(self.systemTime, self.dataType.value)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.systemTime, self.dataType.value)
 
     @classmethod
     def parse(cls, dataArray):
-        data = Ack()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.systemTime, data.dataType = unpack('<IB', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.systemTime, data.dataType = cls.struct.unpack_from(buffer, offset)
+
         data.dataType = DataType(data.dataType)
 
         return data
 
 class Request(ISerializable):
+    struct = Struct('<B')
+
     def __init__(self):
         self.dataType = DataType.None_
 
@@ -395,21 +420,31 @@ class Request(ISerializable):
         return 1
 
     def toArray(self):
-        return pack('<B', self.dataType.value)
+        return self.struct.pack(self.dataType.value)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.dataType.value)
 
     @classmethod
     def parse(cls, dataArray):
-        data = Request()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.dataType, = unpack('<B', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.dataType, = cls.struct.unpack_from(buffer, offset)
+
         data.dataType = DataType(data.dataType)
 
         return data
 
 class Passcode(ISerializable):
+    struct = Struct('<I')
+
     def __init__(self):
         self.passcode = 0
 
@@ -418,16 +453,23 @@ class Passcode(ISerializable):
         return 4
 
     def toArray(self):
-        return pack('<I', self.passcode)
+        return self.struct.pack(self.passcode)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.passcode)
 
     @classmethod
     def parse(cls, dataArray):
-        data = Passcode()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.passcode, = unpack('<I', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.passcode, = cls.struct.unpack_from(buffer, offset)
 
         return data
 
@@ -454,10 +496,9 @@ class Move():
         return self._roll,self._pitch, self._yaw, self._throttle
 
     def setAll(self, roll, pitch, yaw, throttle):
-        self._roll = self._checkValue(roll)
-        self._pitch = self._checkValue(pitch)
-        self._yaw = self._checkValue(yaw)
-        self._throttle = self._checkValue(throttle)
+        # check every value first, so a bad one leaves all four unchanged
+        values = (self._checkValue(roll), self._checkValue(pitch), self._checkValue(yaw), self._checkValue(throttle))
+        self._roll, self._pitch, self._yaw, self._throttle = values
 
     @property
     def roll(self):
@@ -493,6 +534,8 @@ class Move():
 
 
 class Control(ISerializable, Move):
+    struct = Struct('<bbbb')
+
     def __init__(self):
         Move.__init__(self)
 
@@ -501,20 +544,72 @@ class Control(ISerializable, Move):
         return 4
 
     def toArray(self):
-        return pack('<bbbb', self._roll, self._pitch, self._yaw, self._throttle)
+        return self.struct.pack(self._roll, self._pitch, self._yaw, self._throttle)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self._roll, self._pitch, self._yaw, self._throttle)
 
     @classmethod
     def parse(cls, dataArray):
-        data = Control()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data._roll, data._pitch, data._yaw, data._throttle = unpack('<bbbb', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data._roll, data._pitch, data._yaw, data._throttle = cls.struct.unpack_from(buffer, offset)
+
         return data
 
 
+class ControlFrame:
+    """Prebuilt wire frame of Control(preamble, header, data, crc).
+    Only the data and crc bytes are patched when the values change, otherwise the same immutable bytes are
+    returned, so callers can queue them without a copy.
+    """
+    def __init__(self):
+        self._control = Control()
+
+        self.frame = bytearray(6 + Control.getSize())
+        self.frame[0] = 0x0A
+        self.frame[1] = 0x55
+        self.frame[2] = DataType.Control.value
+        self.frame[3] = Control.getSize()
+
+        self._crcHeader = CRC16.calc(self.frame[2:4], 0)
+        self._data = memoryview(self.frame)[4:4 + Control.getSize()]
+        self._update()
+
+    def _update(self):
+        self._control.packInto(self.frame, 4)
+        crc16 = CRC16.calc(self._data, self._crcHeader)
+        self.frame[-2] = crc16 & 0xFF
+        self.frame[-1] = crc16 >> 8
+        self.data = bytes(self.frame)
+
+    def setAll(self, roll, pitch, yaw, throttle):
+        """Set the control values.
+
+        Returns: The frame to transfer as bytes. Out of range values raise ValueError and keep the old frame.
+        """
+        control = self._control
+        if (roll != control._roll) or (pitch != control._pitch) or (yaw != control._yaw) or (
+                throttle != control._throttle):
+            control.setAll(roll, pitch, yaw, throttle)
+            self._update()
+
+        return self.data
+
+    def getAll(self):
+        return self._control.getAll()
+
+
 class Command(ISerializable):
+    struct = Struct('<BB')
+
     def __init__(self):
         self.commandType = CommandType.None_
         self.option = 0
@@ -524,16 +619,24 @@ class Command(ISerializable):
         return 2
 
     def toArray(self):
-        return pack('<BB', self.commandType.value, self.option)
+        return self.struct.pack(self.commandType.value, self.option)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.commandType.value, self.option)
 
     @classmethod
     def parse(cls, dataArray):
-        data = Command()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.commandType, data.option = unpack('<BB', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.commandType, data.option = cls.struct.unpack_from(buffer, offset)
+
         data.commandType = CommandType(data.commandType)
 
         return data
@@ -549,24 +652,30 @@ class Command2(ISerializable):
         return Command.getSize() + Command.getSize()
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(self.command1.toArray())
-        dataArray.extend(self.command2.toArray())
+        dataArray = bytearray(self.getSize())
+        self.packInto(dataArray)
         return dataArray
 
+    def packInto(self, buffer, offset=0):
+        self.command1.packInto(buffer, offset)
+        offset += Command.getSize()
+        self.command2.packInto(buffer, offset)
+
     @classmethod
     def parse(cls, dataArray):
-        data = Command2()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        indexStart = 0
-        indexEnd = Command.getSize()
-        data.command1 = Command.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += Command.getSize()
-        data.command2 = Command.parse(dataArray[indexStart:indexEnd])
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.command1 = Command.parseFrom(buffer, offset)
+        offset += Command.getSize()
+        data.command2 = Command.parseFrom(buffer, offset)
+
         return data
 
 
@@ -581,28 +690,34 @@ class Command3(ISerializable):
         return Command.getSize() + Command.getSize() + Command.getSize()
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(self.command1.toArray())
-        dataArray.extend(self.command2.toArray())
-        dataArray.extend(self.command3.toArray())
+        dataArray = bytearray(self.getSize())
+        self.packInto(dataArray)
         return dataArray
 
+    def packInto(self, buffer, offset=0):
+        self.command1.packInto(buffer, offset)
+        offset += Command.getSize()
+        self.command2.packInto(buffer, offset)
+        offset += Command.getSize()
+        self.command3.packInto(buffer, offset)
+
     @classmethod
     def parse(cls, dataArray):
-        data = Command3()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        indexStart = 0
-        indexEnd = Command.getSize()
-        data.command1 = Command.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += Command.getSize()
-        data.command2 = Command.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += Command.getSize()
-        data.command3 = Command.parse(dataArray[indexStart:indexEnd])
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.command1 = Command.parseFrom(buffer, offset)
+        offset += Command.getSize()
+        data.command2 = Command.parseFrom(buffer, offset)
+        offset += Command.getSize()
+        data.command3 = Command.parseFrom(buffer, offset)
+
         return data
 
 
@@ -637,6 +752,8 @@ class LightModeDrone(Enum):
 
 
 class Color(ISerializable):
+    struct = Struct('<BBB')
+
     def __init__(self):
         self.r = 0
         self.g = 0
@@ -647,16 +764,24 @@ class Color(ISerializable):
         return 3
 
     def toArray(self):
-        return pack('<BBB', self.r, self.g, self.b)
+        return self.struct.pack(self.r, self.g, self.b)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.r, self.g, self.b)
 
     @classmethod
     def parse(cls, dataArray):
-        data = Color()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.r, data.g, data.b = unpack('<BBB', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.r, data.g, data.b = cls.struct.unpack_from(buffer, offset)
+
         return data
 
 
@@ -807,6 +932,8 @@ class Colors(Enum):
 
 
 class LightMode(ISerializable):
+    struct = Struct('<BBB')
+
     def __init__(self):
         self.mode = LightModeDrone.None_
         self.colors = Colors.Black
@@ -817,16 +944,24 @@ class LightMode(ISerializable):
         return 3
 
     def toArray(self):
-        return pack('<BBB', self.mode.value, self.colors.value, self.interval)
+        return self.struct.pack(self.mode.value, self.colors.value, self.interval)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.mode.value, self.colors.value, self.interval)
 
     @classmethod
     def parse(cls, dataArray):
-        data = LightMode()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.mode, data.colors, data.interval = unpack('<BBB', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.mode, data.colors, data.interval = cls.struct.unpack_from(buffer, offset)
+
         data.mode = LightModeDrone(data.mode)
         data.colors = Colors(data.colors)
 
@@ -843,24 +978,30 @@ class LightMode2(ISerializable):
         return LightMode.getSize() + LightMode.getSize()
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(self.lightMode1.toArray())
-        dataArray.extend(self.lightMode2.toArray())
+        dataArray = bytearray(self.getSize())
+        self.packInto(dataArray)
         return dataArray
 
+    def packInto(self, buffer, offset=0):
+        self.lightMode1.packInto(buffer, offset)
+        offset += LightMode.getSize()
+        self.lightMode2.packInto(buffer, offset)
+
     @classmethod
     def parse(cls, dataArray):
-        data = LightMode2()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        indexStart = 0
-        indexEnd = LightMode.getSize()
-        data.lightMode1 = LightMode.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += LightMode.getSize()
-        data.lightMode2 = LightMode.parse(dataArray[indexStart:indexEnd])
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.lightMode1 = LightMode.parseFrom(buffer, offset)
+        offset += LightMode.getSize()
+        data.lightMode2 = LightMode.parseFrom(buffer, offset)
+
         return data
 
 
@@ -874,28 +1015,36 @@ class LightModeCommand(ISerializable):
         return LightMode.getSize() + Command.getSize()
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(self.lightMode.toArray())
-        dataArray.extend(self.command.toArray())
+        dataArray = bytearray(self.getSize())
+        self.packInto(dataArray)
         return dataArray
 
+    def packInto(self, buffer, offset=0):
+        self.lightMode.packInto(buffer, offset)
+        offset += LightMode.getSize()
+        self.command.packInto(buffer, offset)
+
     @classmethod
     def parse(cls, dataArray):
-        data = LightModeCommand()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        indexStart = 0
-        indexEnd = LightMode.getSize()
-        data.lightMode = LightMode.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += Command.getSize()
-        data.command = Command.parse(dataArray[indexStart:indexEnd])
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.lightMode = LightMode.parseFrom(buffer, offset)
+        offset += LightMode.getSize()
+        data.command = Command.parseFrom(buffer, offset)
+
         return data
 
 
 class LightModeCommandIr(ISerializable):
+    struct = Struct('<I')
+
     def __init__(self):
         self.lightMode = LightMode()
         self.command = Command()
@@ -906,34 +1055,41 @@ class LightModeCommandIr(ISerializable):
         return LightMode.getSize() + Command.getSize() + 4
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(self.lightMode.toArray())
-        dataArray.extend(self.command.toArray())
-        dataArray.extend(pack('<I', self.irData))
+        dataArray = bytearray(self.getSize())
+        self.packInto(dataArray)
         return dataArray
 
+    def packInto(self, buffer, offset=0):
+        self.lightMode.packInto(buffer, offset)
+        offset += LightMode.getSize()
+        self.command.packInto(buffer, offset)
+        offset += Command.getSize()
+        self.struct.pack_into(buffer, offset, self.irData)
+
     @classmethod
     def parse(cls, dataArray):
-        data = LightModeCommandIr()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        indexStart = 0
-        indexEnd = LightMode.getSize()
-        data.lightMode = LightMode.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += Command.getSize()
-        data.command = Command.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += 4
-        data.irData, = unpack('<I', dataArray[indexStart:indexEnd])
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.lightMode = LightMode.parseFrom(buffer, offset)
+        offset += LightMode.getSize()
+        data.command = Command.parseFrom(buffer, offset)
+        offset += Command.getSize()
+        data.irData, = cls.struct.unpack_from(buffer, offset)
 
         return data
 
 
 
 class LightModeColor(ISerializable):
+    struct = Struct('<BBBBB')
+
     def __init__(self):
         self.mode = LightModeDrone.None_
         self.color = Color()
@@ -944,28 +1100,23 @@ class LightModeColor(ISerializable):
         return 1 + Color.getSize() + 1
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(pack('<B', self.mode.value))
-        dataArray.extend(self.color.toArray())
-        dataArray.extend(pack('<B', self.interval))
-        return dataArray
+        return self.struct.pack(self.mode.value, self.color.r, self.color.g, self.color.b, self.interval)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.mode.value, self.color.r, self.color.g, self.color.b, self.interval)
 
     @classmethod
     def parse(cls, dataArray):
-        data = LightModeColor()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        indexStart = 0
-        indexEnd = 1
-        data.mode = unpack('<B', dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += Color.getSize()
-        data.color = Color.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += 1
-        data.interval = unpack('<B', dataArray[indexStart:indexEnd])
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.mode, data.color.r, data.color.g, data.color.b, data.interval = cls.struct.unpack_from(buffer, offset)
 
         data.mode = LightModeDrone(data.mode)
 
@@ -982,28 +1133,36 @@ class LightModeColor2(ISerializable):
         return LightModeColor.getSize() + LightModeColor.getSize()
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(self.lightModeColor1.toArray())
-        dataArray.extend(self.lightModeColor2.toArray())
+        dataArray = bytearray(self.getSize())
+        self.packInto(dataArray)
         return dataArray
 
+    def packInto(self, buffer, offset=0):
+        self.lightModeColor1.packInto(buffer, offset)
+        offset += LightModeColor.getSize()
+        self.lightModeColor2.packInto(buffer, offset)
+
     @classmethod
     def parse(cls, dataArray):
-        data = LightModeColor2()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        indexStart = 0
-        indexEnd = LightModeColor.getSize()
-        data.lightModeColor1 = LightModeColor.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += LightModeColor.getSize()
-        data.lightModeColor2 = LightModeColor.parse(dataArray[indexStart:indexEnd])
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.lightModeColor1 = LightModeColor.parseFrom(buffer, offset)
+        offset += LightModeColor.getSize()
+        data.lightModeColor2 = LightModeColor.parseFrom(buffer, offset)
+
         return data
 
 
 class LightEvent(ISerializable):
+    struct = Struct('<BBBB')
+
     def __init__(self):
         self.event = LightModeDrone.None_
         self.colors = Colors.Black
@@ -1015,16 +1174,24 @@ class LightEvent(ISerializable):
         return 4
 
     def toArray(self):
-        return pack('<BBBB', self.event.value, self.colors.value, self.interval, self.repeat)
+        return self.struct.pack(self.event.value, self.colors.value, self.interval, self.repeat)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.event.value, self.colors.value, self.interval, self.repeat)
 
     @classmethod
     def parse(cls, dataArray):
-        data = LightEvent()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.event, data.colors, data.interval, data.repeat = unpack('<BBBB', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.event, data.colors, data.interval, data.repeat = cls.struct.unpack_from(buffer, offset)
+
         data.event = LightModeDrone(data.event)
         data.colors = Colors(data.colors)
 
@@ -1041,24 +1208,30 @@ class LightEvent2(ISerializable):
         return LightEvent.getSize() + LightEvent.getSize()
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(self.lightEvent1.toArray())
-        dataArray.extend(self.lightEvent2.toArray())
+        dataArray = bytearray(self.getSize())
+        self.packInto(dataArray)
         return dataArray
 
+    def packInto(self, buffer, offset=0):
+        self.lightEvent1.packInto(buffer, offset)
+        offset += LightEvent.getSize()
+        self.lightEvent2.packInto(buffer, offset)
+
     @classmethod
     def parse(cls, dataArray):
-        data = LightEvent2()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        indexStart = 0
-        indexEnd = LightEvent.getSize()
-        data.lightEvent1 = LightEvent.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += LightEvent.getSize()
-        data.lightEvent2 = LightEvent.parse(dataArray[indexStart:indexEnd])
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.lightEvent1 = LightEvent.parseFrom(buffer, offset)
+        offset += LightEvent.getSize()
+        data.lightEvent2 = LightEvent.parseFrom(buffer, offset)
+
         return data
 
 
@@ -1072,29 +1245,36 @@ class LightEventCommand(ISerializable):
         return LightEvent.getSize() + Command.getSize()
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(self.lightEvent.toArray())
-        dataArray.extend(self.command.toArray())
+        dataArray = bytearray(self.getSize())
+        self.packInto(dataArray)
         return dataArray
 
+    def packInto(self, buffer, offset=0):
+        self.lightEvent.packInto(buffer, offset)
+        offset += LightEvent.getSize()
+        self.command.packInto(buffer, offset)
+
     @classmethod
     def parse(cls, dataArray):
-        data = LightEventCommand()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        indexStart = 0
-        indexEnd = LightEvent.getSize()
-        data.lightEvent = LightEvent.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += Command.getSize()
-        data.command = Command.parse(dataArray[indexStart:indexEnd])
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.lightEvent = LightEvent.parseFrom(buffer, offset)
+        offset += LightEvent.getSize()
+        data.command = Command.parseFrom(buffer, offset)
 
         return data
 
 
 class LightEventCommandIr(ISerializable):
+    struct = Struct('<I')
+
     def __init__(self):
         self.lightEvent = LightEvent()
         self.command = Command()
@@ -1105,33 +1285,40 @@ class LightEventCommandIr(ISerializable):
         return LightEvent.getSize() + Command.getSize() + 4
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(self.lightEvent.toArray())
-        dataArray.extend(self.command.toArray())
-        dataArray.extend(pack('<I', self.irData))
+        dataArray = bytearray(self.getSize())
+        self.packInto(dataArray)
         return dataArray
 
+    def packInto(self, buffer, offset=0):
+        self.lightEvent.packInto(buffer, offset)
+        offset += LightEvent.getSize()
+        self.command.packInto(buffer, offset)
+        offset += Command.getSize()
+        self.struct.pack_into(buffer, offset, self.irData)
+
     @classmethod
     def parse(cls, dataArray):
-        data = LightEventCommandIr()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        indexStart = 0
-        indexEnd = LightEvent.getSize()
-        data.lightEvent = LightEvent.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += Command.getSize()
-        data.command = Command.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += 4
-        data.irData, = unpack('<I', dataArray[indexStart:indexEnd])
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.lightEvent = LightEvent.parseFrom(buffer, offset)
+        offset += LightEvent.getSize()
+        data.command = Command.parseFrom(buffer, offset)
+        offset += Command.getSize()
+        data.irData, = cls.struct.unpack_from(buffer, offset)
 
         return data
 
 
 class LightEventColor(ISerializable):
+    struct = Struct('<BBBBBB')
+
     def __init__(self):
         self.event = LightModeDrone.None_
         self.color = Color()
@@ -1143,32 +1330,23 @@ class LightEventColor(ISerializable):
         return 1 + Color.getSize() + 2
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(pack('<B', self.event))
-        dataArray.extend(self.color.toArray())
-        dataArray.extend(pack('<B', self.interval))
-        dataArray.extend(pack('<B', self.repeat))
-        return dataArray
+        return self.struct.pack(self.event.value, self.color.r, self.color.g, self.color.b, self.interval, self.repeat)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.event.value, self.color.r, self.color.g, self.color.b, self.interval, self.repeat)
 
     @classmethod
     def parse(cls, dataArray):
-        data = LightEventColor()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        indexStart = 0
-        indexEnd = 1
-        data.event = unpack('<B', dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd = LightEvent.getSize()
-        data.color = Color.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += 1
-        data.interval = unpack('<B', dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += 1
-        data.repeat = unpack('<B', dataArray[indexStart:indexEnd])
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.event, data.color.r, data.color.g, data.color.b, data.interval, data.repeat = cls.struct.unpack_from(buffer, offset)
 
         data.event = LightModeDrone(data.event)
 
@@ -1178,31 +1356,37 @@ class LightEventColor(ISerializable):
 class LightEventColor2(ISerializable):
     def __init__(self):
         self.lightEventColor1 = LightEventColor()
-        self.lightEventColor1 = LightEventColor()
+        self.lightEventColor2 = LightEventColor()
 
     @classmethod
     def getSize(cls):
         return LightEventColor.getSize() + LightEventColor.getSize()
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(self.lightEventColor1.toArray())
-        dataArray.extend(self.lightEventColor2.toArray())
+        dataArray = bytearray(self.getSize())
+        self.packInto(dataArray)
         return dataArray
 
+    def packInto(self, buffer, offset=0):
+        self.lightEventColor1.packInto(buffer, offset)
+        offset += LightEventColor.getSize()
+        self.lightEventColor2.packInto(buffer, offset)
+
     @classmethod
     def parse(cls, dataArray):
-        data = LightEventColor2()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        indexStart = 0
-        indexEnd = LightEventColor.getSize()
-        data.lightEventColor1 = LightEventColor.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += LightEventColor.getSize()
-        data.lightEventColor2 = LightEventColor.parse(dataArray[indexStart:indexEnd])
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.lightEventColor1 = LightEventColor.parseFrom(buffer, offset)
+        offset += LightEventColor.getSize()
+        data.lightEventColor2 = LightEventColor.parseFrom(buffer, offset)
+
         return data
 
 
@@ -1234,16 +1418,24 @@ class Address(ISerializable):
 
     @classmethod
     def parse(cls, dataArray):
-        data = Address()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.address = dataArray[0:6]
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.address = bytearray(buffer[offset:offset + 6])
+
         return data
 
 
 class State(ISerializable):
+    __slots__ = ('modeVehicle', 'modeSystem', 'modeFlight', 'modeDrive', 'sensorOrientation', 'headless', 'battery')
+    struct = Struct('<BBBBBBB')
+
     def __init__(self):
         self.modeVehicle = ModeVehicle.None_
 
@@ -1260,25 +1452,28 @@ class State(ISerializable):
         return 7
 
     def toArray(self):
-        return pack('<BBBBBBB', self.modeVehicle.value, self.modeSystem.value, self.modeFlight.value,
-                    self.modeDrive.value, self.sensorOrientation.value, self.headless.value, self.battery)
+        return self.struct.pack(self.modeVehicle.value, self.modeSystem.value, self.modeFlight.value, self.modeDrive.value, self.sensorOrientation.value, self.headless.value, self.battery)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.modeVehicle.value, self.modeSystem.value, self.modeFlight.value, self.modeDrive.value, self.sensorOrientation.value, self.headless.value, self.battery)
 
     @classmethod
     def parse(cls, dataArray):
-        data = State()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.modeVehicle, data.modeSystem, data.modeFlight, data.modeDrive, data.sensorOrientation, data.headless, data.battery = unpack(
-            '<BBBBBBB', dataArray)
+        return cls.parseFrom(dataArray)
 
-        data.modeVehicle = ModeVehicle(data.modeVehicle)
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
 
+        data.modeVehicle, data.modeSystem, data.modeFlight, data.modeDrive, data.sensorOrientation, data.headless, data.battery = cls.struct.unpack_from(buffer, offset)
+
+        data.modeVehicle = ModeVehicle(data.modeVehicle)
         data.modeSystem = ModeSystem(data.modeSystem)
         data.modeFlight = ModeFlight(data.modeFlight)
         data.modeDrive = ModeDrive(data.modeDrive)
-
         data.sensorOrientation = SensorOrientation(data.sensorOrientation)
         data.headless = Headless(data.headless)
 
@@ -1286,6 +1481,9 @@ class State(ISerializable):
 
 
 class Attitude(ISerializable):
+    __slots__ = ('roll', 'pitch', 'yaw')
+    struct = Struct('<hhh')
+
     def __init__(self):
         self.roll = 0
         self.pitch = 0
@@ -1296,25 +1494,34 @@ class Attitude(ISerializable):
         return 6
 
     def toArray(self):
-        return pack('<hhh', self.roll, self.pitch, self.yaw)
+        return self.struct.pack(self.roll, self.pitch, self.yaw)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.roll, self.pitch, self.yaw)
 
     @classmethod
     def parse(cls, dataArray):
-        data = Attitude()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.roll, data.pitch, data.yaw = unpack('<hhh', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.roll, data.pitch, data.yaw = cls.struct.unpack_from(buffer, offset)
 
         return data
 
 
 class GyroBias(Attitude):
-    pass
+    __slots__ = ()
 
 
 class TrimFlight(ISerializable, Move):
+    struct = Struct('<hhhh')
+
     def __init__(self):
         Move.__init__(self)
 
@@ -1323,20 +1530,30 @@ class TrimFlight(ISerializable, Move):
         return 8
 
     def toArray(self):
-        return pack('<hhhh', self._roll, self._pitch, self._yaw, self._throttle)
+        return self.struct.pack(self._roll, self._pitch, self._yaw, self._throttle)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self._roll, self._pitch, self._yaw, self._throttle)
 
     @classmethod
     def parse(cls, dataArray):
-        data = TrimFlight()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data._roll, data._pitch, data._yaw, data._throttle = unpack('<hhhh', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data._roll, data._pitch, data._yaw, data._throttle = cls.struct.unpack_from(buffer, offset)
+
         return data
 
 
 class TrimDrive(ISerializable):
+    struct = Struct('<h')
+
     def __init__(self):
         self.wheel = 0
 
@@ -1345,16 +1562,24 @@ class TrimDrive(ISerializable):
         return 2
 
     def toArray(self):
-        return pack('<h', self.wheel)
+        return self.struct.pack(self.wheel)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.wheel)
 
     @classmethod
     def parse(cls, dataArray):
-        data = TrimDrive()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.wheel = unpack('<h', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.wheel, = cls.struct.unpack_from(buffer, offset)
+
         return data
 
 
@@ -1368,28 +1593,36 @@ class TrimAll(ISerializable):
         return TrimFlight.getSize() + TrimDrive.getSize()
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(self.flight.toArray())
-        dataArray.extend(self.drive.toArray())
+        dataArray = bytearray(self.getSize())
+        self.packInto(dataArray)
         return dataArray
 
+    def packInto(self, buffer, offset=0):
+        self.flight.packInto(buffer, offset)
+        offset += TrimFlight.getSize()
+        self.drive.packInto(buffer, offset)
+
     @classmethod
     def parse(cls, dataArray):
-        data = TrimAll()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        indexStart = 0
-        indexEnd = TrimFlight.getSize()
-        data.flight = TrimFlight.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += TrimDrive.getSize()
-        data.drive = TrimDrive.parse(dataArray[indexStart:indexEnd])
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.flight = TrimFlight.parseFrom(buffer, offset)
+        offset += TrimFlight.getSize()
+        data.drive = TrimDrive.parseFrom(buffer, offset)
+
         return data
 
 
 class CountFlight(ISerializable):
+    struct = Struct('<QHHH')
+
     def __init__(self):
         self.timeFlight = 0
 
@@ -1402,21 +1635,30 @@ class CountFlight(ISerializable):
         return 14
 
     def toArray(self):
-        return pack('<QHHH', self.timeFlight, self.countTakeOff, self.countLanding, self.countAccident)
+        return self.struct.pack(self.timeFlight, self.countTakeOff, self.countLanding, self.countAccident)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.timeFlight, self.countTakeOff, self.countLanding, self.countAccident)
 
     @classmethod
     def parse(cls, dataArray):
-        data = CountFlight()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.timeFlight, data.countTakeOff, data.countLanding, data.countAccident = unpack('<QHHH', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.timeFlight, data.countTakeOff, data.countLanding, data.countAccident = cls.struct.unpack_from(buffer, offset)
 
         return data
 
 
 class CountDrive(ISerializable):
+    struct = Struct('<QH')
+
     def __init__(self):
         self.timeDrive = 0
 
@@ -1427,21 +1669,30 @@ class CountDrive(ISerializable):
         return 10
 
     def toArray(self):
-        return pack('<QH', self.timeDrive, self.countAccident)
+        return self.struct.pack(self.timeDrive, self.countAccident)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.timeDrive, self.countAccident)
 
     @classmethod
     def parse(cls, dataArray):
-        data = CountDrive()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.timeDrive, data.countAccident = unpack('<QH', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.timeDrive, data.countAccident = cls.struct.unpack_from(buffer, offset)
 
         return data
 
 
 class IrMessage(ISerializable):
+    struct = Struct('<BI')
+
     def __init__(self):
         self.direction = Direction.None_
         self.irData = 0
@@ -1451,16 +1702,23 @@ class IrMessage(ISerializable):
         return 5
 
     def toArray(self):
-        return pack('<BI', self.direction.value, self.irData)
+        return self.struct.pack(self.direction.value, self.irData)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.direction.value, self.irData)
 
     @classmethod
     def parse(cls, dataArray):
-        data = IrMessage()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.direction, data.irData = unpack('<BI', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.direction, data.irData = cls.struct.unpack_from(buffer, offset)
 
         data.direction = Direction(data.direction)
 
@@ -1468,6 +1726,9 @@ class IrMessage(ISerializable):
 
 
 class Imu(ISerializable):
+    __slots__ = ('accelX', 'accelY', 'accelZ', 'gyroRoll', 'gyroPitch', 'gyroYaw', 'angleRoll', 'anglePitch', 'angleYaw')
+    struct = Struct('<hhhhhhhhh')
+
     def __init__(self):
         self.accelX = 0
         self.accelY = 0
@@ -1484,23 +1745,31 @@ class Imu(ISerializable):
         return 18
 
     def toArray(self):
-        return pack('<hhhhhhhhh', self.accelX, self.accelY, self.accelZ, self.gyroRoll, self.gyroPitch, self.gyroYaw,
-                    self.angleRoll, self.anglePitch, self.angleYaw)
+        return self.struct.pack(self.accelX, self.accelY, self.accelZ, self.gyroRoll, self.gyroPitch, self.gyroYaw, self.angleRoll, self.anglePitch, self.angleYaw)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.accelX, self.accelY, self.accelZ, self.gyroRoll, self.gyroPitch, self.gyroYaw, self.angleRoll, self.anglePitch, self.angleYaw)
 
     @classmethod
     def parse(cls, dataArray):
-        data = Imu()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.accelX, data.accelY, data.accelZ, data.gyroRoll, data.gyroPitch, data.gyroYaw, data.angleRoll, data.anglePitch, data.angleYaw = unpack(
-            '<hhhhhhhhh', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.accelX, data.accelY, data.accelZ, data.gyroRoll, data.gyroPitch, data.gyroYaw, data.angleRoll, data.anglePitch, data.angleYaw = cls.struct.unpack_from(buffer, offset)
 
         return data
 
 
 class Pressure(ISerializable):
+    __slots__ = ('d1', 'd2', 'temperature', 'pressure')
+    struct = Struct('<iiii')
+
     def __init__(self):
         self.d1 = 0
         self.d2 = 0
@@ -1512,21 +1781,31 @@ class Pressure(ISerializable):
         return 16
 
     def toArray(self):
-        return pack('<iiii', self.d1, self.d2, self.temperature, self.pressure)
+        return self.struct.pack(self.d1, self.d2, self.temperature, self.pressure)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.d1, self.d2, self.temperature, self.pressure)
 
     @classmethod
     def parse(cls, dataArray):
-        data = Pressure()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.d1, data.d2, data.temperature, data.pressure = unpack('<iiii', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.d1, data.d2, data.temperature, data.pressure = cls.struct.unpack_from(buffer, offset)
 
         return data
 
 
 class ImageFlow(ISerializable):
+    __slots__ = ('positionX', 'positionY')
+    struct = Struct('<ii')
+
     def __init__(self):
         self.positionX = 0
         self.positionY = 0
@@ -1536,16 +1815,23 @@ class ImageFlow(ISerializable):
         return 8
 
     def toArray(self):
-        return pack('<ii', self.positionX, self.positionY)
+        return self.struct.pack(self.positionX, self.positionY)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.positionX, self.positionY)
 
     @classmethod
     def parse(cls, dataArray):
-        data = ImageFlow()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.positionX, data.positionY = unpack('<ii', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.positionX, data.positionY = cls.struct.unpack_from(buffer, offset)
 
         return data
 
@@ -1557,6 +1843,8 @@ class ButtonFlag(Enum):
 
 
 class Button(ISerializable):
+    struct = Struct('<B')
+
     def __init__(self):
         self.button = 0
 
@@ -1565,21 +1853,32 @@ class Button(ISerializable):
         return 1
 
     def toArray(self):
-        return pack('<B', self.button)
+        return self.struct.pack(self.button)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.button)
 
     @classmethod
     def parse(cls, dataArray):
-        data = Button()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.button = unpack('<B', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.button, = cls.struct.unpack_from(buffer, offset)
 
         return data
 
 
 class Battery(ISerializable):
+    __slots__ = ('adjustGradient', 'adjustYIntercept', 'gradient', 'yIntercept', 'flagBatteryCalibration', 'batteryRaw',
+                 'batteryPercent', 'voltage')
+    struct = Struct('<hhhhBibh')
+
     def __init__(self):
         self.adjustGradient = 0
         self.adjustYIntercept = 0
@@ -1595,18 +1894,23 @@ class Battery(ISerializable):
         return 16
 
     def toArray(self):
-        return pack('<hhhhBibh', self.adjustGradient, self.adjustYIntercept, self.gradient, self.yIntercept,
-                    self.flagBatteryCalibration, self.batteryRaw, self.batteryPercent, self.voltage)
+        return self.struct.pack(self.adjustGradient, self.adjustYIntercept, self.gradient, self.yIntercept, self.flagBatteryCalibration, self.batteryRaw, self.batteryPercent, self.voltage)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.adjustGradient, self.adjustYIntercept, self.gradient, self.yIntercept, self.flagBatteryCalibration, self.batteryRaw, self.batteryPercent, self.voltage)
 
     @classmethod
     def parse(cls, dataArray):
-        data = Battery()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.adjustGradient, data.adjustYIntercept, data.gradient, data.yIntercept, data.flagBatteryCalibration, data.batteryRaw, data.batteryPercent, data.voltage = unpack(
-            '<hhhhBibh', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.adjustGradient, data.adjustYIntercept, data.gradient, data.yIntercept, data.flagBatteryCalibration, data.batteryRaw, data.batteryPercent, data.voltage = cls.struct.unpack_from(buffer, offset)
 
         data.flagBatteryCalibration = bool(data.flagBatteryCalibration)
 
@@ -1614,6 +1918,8 @@ class Battery(ISerializable):
 
 
 class MotorBlock(ISerializable):
+    struct = Struct('<hh')
+
     def __init__(self):
         self.forward = 0
         self.reverse = 0
@@ -1623,16 +1929,23 @@ class MotorBlock(ISerializable):
         return 4
 
     def toArray(self):
-        return pack('<hh', self.forward, self.reverse)
+        return self.struct.pack(self.forward, self.reverse)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.forward, self.reverse)
 
     @classmethod
     def parse(cls, dataArray):
-        data = MotorBlock()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.forward, data.reverse = unpack('<hh', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.forward, data.reverse = cls.struct.unpack_from(buffer, offset)
 
         return data
 
@@ -1650,37 +1963,34 @@ class Motor(ISerializable):
         return MotorBlock.getSize() * 4
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(self.motor[0].toArray())
-        dataArray.extend(self.motor[1].toArray())
-        dataArray.extend(self.motor[2].toArray())
-        dataArray.extend(self.motor[3].toArray())
+        dataArray = bytearray(self.getSize())
+        self.packInto(dataArray)
         return dataArray
 
+    def packInto(self, buffer, offset=0):
+        for i in range(4):
+            self.motor[i].packInto(buffer, offset + (i * MotorBlock.getSize()))
+
     @classmethod
     def parse(cls, dataArray):
-        data = Motor()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        indexStart = 0
-        indexEnd = MotorBlock.getSize()
-        data.motor[0] = MotorBlock.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += MotorBlock.getSize()
-        data.motor[1] = MotorBlock.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += MotorBlock.getSize()
-        data.motor[2] = MotorBlock.parse(dataArray[indexStart:indexEnd])
-        indexStart = indexEnd
-        indexEnd += MotorBlock.getSize()
-        data.motor[3] = MotorBlock.parse(dataArray[indexStart:indexEnd])
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        for i in range(4):
+            data.motor[i] = MotorBlock.parseFrom(buffer, offset + (i * MotorBlock.getSize()))
 
         return data
 
 
 class Temperature(ISerializable):
+    struct = Struct('<ii')
+
     def __init__(self):
         self.imu = 0
         self.pressure = 0
@@ -1690,21 +2000,31 @@ class Temperature(ISerializable):
         return 8
 
     def toArray(self):
-        return pack('<ii', self.imu, self.pressure)
+        return self.struct.pack(self.imu, self.pressure)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.imu, self.pressure)
 
     @classmethod
     def parse(cls, dataArray):
-        data = Temperature()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.imu, data.pressure = unpack('<ii', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.imu, data.pressure = cls.struct.unpack_from(buffer, offset)
 
         return data
 
 
 class Range(ISerializable):
+    __slots__ = ('left', 'front', 'right', 'rear', 'top', 'bottom')
+    struct = Struct('<HHHHHH')
+
     def __init__(self):
         self.left = 0
         self.front = 0
@@ -1718,16 +2038,23 @@ class Range(ISerializable):
         return 12
 
     def toArray(self):
-        return pack('<HHHHHH', self.left, self.front, self.right, self.rear, self.top, self.bottom)
+        return self.struct.pack(self.left, self.front, self.right, self.rear, self.top, self.bottom)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.left, self.front, self.right, self.rear, self.top, self.bottom)
 
     @classmethod
     def parse(cls, dataArray):
-        data = Range()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.left, data.front, data.right, data.rear, data.top, data.bottom = unpack('<HHHHHH', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.left, data.front, data.right, data.rear, data.top, data.bottom = cls.struct.unpack_from(buffer, offset)
 
         return data
 
@@ -1740,6 +2067,8 @@ class Range(ISerializable):
 
 
 class UpdateLookupTarget(ISerializable):
+    struct = Struct('<I')
+
     def __init__(self):
         self.deviceType = DeviceType.None_
 
@@ -1748,22 +2077,32 @@ class UpdateLookupTarget(ISerializable):
         return 4
 
     def toArray(self):
-        return pack('<I', self.deviceType.value)
+        return self.struct.pack(self.deviceType.value)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.deviceType.value)
 
     @classmethod
     def parse(cls, dataArray):
-        data = UpdateLookupTarget()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.deviceType, = unpack('<I', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.deviceType, = cls.struct.unpack_from(buffer, offset)
+
         data.deviceType = DeviceType(data.deviceType)
 
         return data
 
 
 class UpdateInformation(ISerializable):
+    struct = Struct('<BIBHBBB')
+
     def __init__(self):
         self.modeUpdate = ModeUpdate.None_  # 현재 업데이트 모드
 
@@ -1780,18 +2119,23 @@ class UpdateInformation(ISerializable):
         return 11
 
     def toArray(self):
-        return pack('<BIBHBBB', self.modeUpdate.value, self.deviceType.value, self.imageType.value, self.version,
-                    self.year, self.month, self.day)
+        return self.struct.pack(self.modeUpdate.value, self.deviceType.value, self.imageType.value, self.version, self.year, self.month, self.day)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.modeUpdate.value, self.deviceType.value, self.imageType.value, self.version, self.year, self.month, self.day)
 
     @classmethod
     def parse(cls, dataArray):
-        data = UpdateInformation()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.modeUpdate, data.deviceType, data.imageType, data.version, data.year, data.month, data.day = unpack(
-            '<BIBHBBB', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.modeUpdate, data.deviceType, data.imageType, data.version, data.year, data.month, data.day = cls.struct.unpack_from(buffer, offset)
 
         data.modeUpdate = ModeUpdate(data.modeUpdate)
         data.deviceType = DeviceType(data.deviceType)
@@ -1833,6 +2177,8 @@ class Update(ISerializable):
 
 
 class UpdateLocationCorrect(ISerializable):
+    struct = Struct('<H')
+
     def __init__(self):
         self.indexBlockNext = 0
 
@@ -1841,16 +2187,23 @@ class UpdateLocationCorrect(ISerializable):
         return 2
 
     def toArray(self):
-        return pack('<H', self.indexBlockNext)
+        return self.struct.pack(self.indexBlockNext)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.indexBlockNext)
 
     @classmethod
     def parse(cls, dataArray):
-        data = UpdateLocationCorrect()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.indexBlockNext, = unpack('<H', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.indexBlockNext, = cls.struct.unpack_from(buffer, offset)
 
         return data
 
@@ -1863,6 +2216,8 @@ class UpdateLocationCorrect(ISerializable):
 
 
 class LinkState(ISerializable):
+    struct = Struct('<BB')
+
     def __init__(self):
         self.modeLink = ModeLink.None_
         self.modeLinkBroadcast = ModeLinkBroadcast.None_
@@ -1872,16 +2227,24 @@ class LinkState(ISerializable):
         return 2
 
     def toArray(self):
-        return pack('<BB', self.modeLink, self.modeLinkBroadcast)
+        return self.struct.pack(self.modeLink.value, self.modeLinkBroadcast.value)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.modeLink.value, self.modeLinkBroadcast.value)
 
     @classmethod
     def parse(cls, dataArray):
-        data = LinkState()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.modeLink, data.modeLinkBroadcast = unpack('<BB', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.modeLink, data.modeLinkBroadcast = cls.struct.unpack_from(buffer, offset)
+
         data.modeLink = ModeLink(data.modeLink)
         data.modeLinkBroadcast = ModeLinkBroadcast(data.modeLinkBroadcast)
 
@@ -1889,6 +2252,8 @@ class LinkState(ISerializable):
 
 
 class LinkEvent(ISerializable):
+    struct = Struct('<BB')
+
     def __init__(self):
         self.eventLink = EventLink.None_
         self.eventResult = 0
@@ -1898,22 +2263,32 @@ class LinkEvent(ISerializable):
         return 2
 
     def toArray(self):
-        return pack('<BB', self.modeLink.value, self.eventResult)
+        return self.struct.pack(self.eventLink.value, self.eventResult)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.eventLink.value, self.eventResult)
 
     @classmethod
     def parse(cls, dataArray):
-        data = LinkEvent()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.eventLink, data.eventResult = unpack('<BB', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.eventLink, data.eventResult = cls.struct.unpack_from(buffer, offset)
+
         data.eventLink = EventLink(data.eventLink)
 
         return data
 
 
 class LinkEventAddress(ISerializable):
+    struct = Struct('<BB')
+
     def __init__(self):
         self.eventLink = EventLink.None_
         self.eventResult = 0
@@ -1924,20 +2299,27 @@ class LinkEventAddress(ISerializable):
         return 8
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(pack('<BB', self.modeLink.value, self.eventResult))
-        dataArray.extend(self.address)
+        dataArray = bytearray(self.getSize())
+        self.packInto(dataArray)
         return dataArray
 
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.eventLink.value, self.eventResult)
+        buffer[offset + 2:offset + 8] = self.address
+
     @classmethod
     def parse(cls, dataArray):
-        data = LinkEventAddress()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.eventLink, data.eventResult = unpack('<BB', dataArray[0:2])
-        data.address = dataArray[2:8]
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.eventLink, data.eventResult = cls.struct.unpack_from(buffer, offset)
+        data.address = bytearray(buffer[offset + 2:offset + 8])
 
         data.eventLink = EventLink(data.eventLink)
 
@@ -1945,6 +2327,8 @@ class LinkEventAddress(ISerializable):
 
 
 class LinkRssi(ISerializable):
+    struct = Struct('<b')
+
     def __init__(self):
         self.rssi = 0
 
@@ -1953,21 +2337,30 @@ class LinkRssi(ISerializable):
         return 1
 
     def toArray(self):
-        return pack('<b', self.rssi)
+        return self.struct.pack(self.rssi)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.rssi)
 
     @classmethod
     def parse(cls, dataArray):
-        data = LinkRssi()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.rssi, = unpack('<b', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.rssi, = cls.struct.unpack_from(buffer, offset)
 
         return data
 
 
 class LinkDiscoveredDevice(ISerializable):
+    struct = Struct('<B6s20sb')
+
     def __init__(self):
         self.index = 0
         self.address = bytearray()
@@ -1979,38 +2372,33 @@ class LinkDiscoveredDevice(ISerializable):
         return 28
 
     def toArray(self):
-        dataArray = bytearray()
-        dataArray.extend(pack('<B', self.index))
-        dataArray.extend(self.address)
-        dataArray.extend(self.name.encode('ascii',
-                                          'ignore'))  # 문자열 데이터의 길이가 고정이기 때문에 그에 대한 처리가 필요하나, 파이썬에서 이 데이터를 전송하지는 않기 때문에 일단 이대로 둠
-        dataArray.extend(pack('<b', self.rssi))
-        return dataArray
+        return self.struct.pack(self.index, bytes(self.address), self.name.encode('ascii', 'ignore'), self.rssi)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.index, bytes(self.address), self.name.encode('ascii', 'ignore'),
+                              self.rssi)
 
     @classmethod
     def parse(cls, dataArray):
-        data = LinkEventAddress()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        indexStart = 0
-        indexEnd = 1
-        data.index, = unpack('<B', (dataArray[indexStart:indexEnd]))
-        indexStart = indexEnd
-        indexEnd += 6
-        data.address = dataArray[indexStart:indexEnd]
-        indexStart = indexEnd
-        indexEnd += 20
-        data.name = dataArray[indexStart:indexEnd].decode()
-        indexStart = indexEnd
-        indexEnd += 1
-        data.rssi, = unpack('<b', (dataArray[indexStart:indexEnd]))
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.index, data.address, data.name, data.rssi = cls.struct.unpack_from(buffer, offset)
+        data.address = bytearray(data.address)
+        data.name = data.name.decode()
 
         return data
 
 
 class LinkPasscode(ISerializable):
+    struct = Struct('<I')
+
     def __init__(self):
         self.passcode = 0
 
@@ -2019,16 +2407,23 @@ class LinkPasscode(ISerializable):
         return 4
 
     def toArray(self):
-        return pack('<I', self.passcode)
+        return self.struct.pack(self.passcode)
+
+    def packInto(self, buffer, offset=0):
+        self.struct.pack_into(buffer, offset, self.passcode)
 
     @classmethod
     def parse(cls, dataArray):
-        data = LinkPasscode()
-
         if len(dataArray) != cls.getSize():
             return None
 
-        data.passcode, = unpack('<I', dataArray)
+        return cls.parseFrom(dataArray)
+
+    @classmethod
+    def parseFrom(cls, buffer, offset=0):
+        data = cls()
+
+        data.passcode, = cls.struct.unpack_from(buffer, offset)
 
         return data
 
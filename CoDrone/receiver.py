@@ -1,6 +1,6 @@
 from enum import Enum
 from CoDrone.crc import CRC16
-from time import clock
+from time import perf_counter
 
 from CoDrone.protocol import Header
 from CoDrone.protocol import DataType
@@ -19,6 +19,10 @@ class Section(Enum):
     End = 0x03
 
 
+# lookup table for the header byte, avoids an Enum call per frame
+_dataTypeByValue = {dataType.value: dataType for dataType in DataType}
+
+
 class Receiver:
     def __init__(self):
 
@@ -39,9 +43,14 @@ class Receiver:
 
         self.message = None
 
+        # scan() keeps the unfinished tail of the previous chunk here
+        self._pending = bytearray()
+        self.errors = []
+        self.crcErrors = []     # DataType of each frame dropped by scan() for a crc mismatch
+
     def call(self, data):
 
-        now = clock() * 1000
+        now = perf_counter() * 1000
 
         self.message = None
 
@@ -172,5 +181,122 @@ class Receiver:
 
         return self.state
 
+    def scan(self, dataArray):
+        """Bulk frame scanner. Find every complete frame in a received chunk.
+
+        The preamble is located with bytearray.find() and the header, payload and CRC of each frame are
+        sliced out in one step. An unfinished frame at the end of the chunk is kept until the next call and
+        is reflected in state/section the same way call() reports it.
+
+        Args:
+            dataArray: received bytes as type bytes, bytearray or memoryview.
+
+        Returns: A list of (Header, bytearray) tuples, one per frame whose CRC matched.
+            Error messages of dropped frames are stored in errors.
+        """
+        now = perf_counter() * 1000
+
+        frames = []
+        self.errors.clear()
+        self.crcErrors.clear()
+        buffer = self._pending
+
+        # drop a partial frame which is waiting for too long
+        if (self.state == StateLoading.Receiving) and ((self.timeReceiveStart + 600) < now):
+            self.errors.append("Error / Receiver / StateLoading.Receiving / Time over.")
+            del buffer[:1]
+
+        buffer.extend(dataArray)
+        length = len(buffer)
+        index = 0
+
+        with memoryview(buffer) as view:
+            while True:
+                start = buffer.find(b'\x0A\x55', index)
+
+                if start < 0:
+                    # last byte may be the first half of the next preamble
+                    if (length > index) and (buffer[length - 1] == 0x0A):
+                        index = length - 1
+                    else:
+                        index = length
+                    break
+
+                if start + 4 > length:
+                    index = start
+                    break
+
+                dataType = _dataTypeByValue.get(buffer[start + 2])
+                if dataType is None:
+                    self.errors.append("Error / Receiver / Section.Header / DataType Error. 0x{0:02X}".format(
+                        buffer[start + 2]))
+                    index = start + 2
+                    continue
+
+                dataLength = buffer[start + 3]
+                if dataLength > 128:
+                    self.errors.append(
+                        "Error / Receiver / Section.Header / Data length is longer than 128. [{0}]".format(dataLength))
+                    index = start + 2
+                    continue
+
+                end = start + 6 + dataLength
+                if end > length:
+                    index = start
+                    break
+
+                crc16received = buffer[end - 2] | (buffer[end - 1] << 8)
+                crc16calculated = CRC16.calc(view[start + 2:end - 2], 0)
+
+                if crc16received != crc16calculated:
+                    self.errors.append(
+                        "Error / Receiver / Section.End / CRC Error / {0} / [receive: 0x{1:04X}, calculate: 0x{2:04X}]".format(
+                            dataType, crc16received, crc16calculated))
+                    self.crcErrors.append(dataType)
+                    index = start + 2
+                    continue
+
+                header = Header()
+                header.dataType = dataType
+                header.length = dataLength
+                frames.append((header, bytearray(view[start + 4:end - 2])))
+                self.crc16received = self.crc16calculated = crc16received
+
+                index = end
+
+        del buffer[:index]
+
+        if frames:
+            self.header, self.data = frames[-1]
+            self.timeReceiveComplete = now
+
+        if self.errors:
+            self.message = self.errors[-1]
+
+        # keep the partial frame semantic of call()
+        length = len(buffer)
+        if length == 0:
+            self.state = StateLoading.Ready
+            self.section = Section.Start
+        else:
+            if self.state != StateLoading.Receiving:
+                self.timeReceiveStart = now
+            self.state = StateLoading.Receiving
+
+            if length < 2:
+                self.section = Section.Start
+            elif length < 4:
+                self.section = Section.Header
+            elif length < 4 + buffer[3]:
+                self.section = Section.Data
+            else:
+                self.section = Section.End
+
+        self.sectionOld = self.section
+
+        return frames
+
     def checked(self):
-        self.state = StateLoading.Ready
+        # scan() never leaves a frame in Loaded state, so only reset a frame completed by call()
+        if self.state == StateLoading.Loaded:
+            self.state = StateLoading.Ready
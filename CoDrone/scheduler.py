@@ -0,0 +1,308 @@
+from threading import Condition, Thread
+from time import perf_counter, sleep
+
+from CoDrone.metrics import Histogram
+
+
+class ControlScheduler:
+    """Send the latest control setpoint at a fixed rate from its own thread.
+
+    Each send has an absolute deadline(start + n * period), so the processing time does not make the rate
+    drift. A send later than a whole period counts as missed deadlines and the schedule skips ahead instead
+    of sending a burst to catch up. The lateness of every send is kept in a histogram as the jitter.
+
+    Examples:
+        >>> scheduler = ControlScheduler(drone._transferControl, 50)
+        >>> scheduler.start()
+        >>> scheduler.setSetpoint(0, 0, 30, 0)  # yaw right until the setpoint changes
+        >>> scheduler.clearSetpoint()   # stop sending
+
+    abort() stops sending and makes hold() return at once, setpoints are ignored until resume(). This way an
+    emergency stop from another thread also stops the rest of a running flight command.
+    """
+
+    def __init__(self, transfer, rate=50, onError=None):
+        """
+        Args:
+            transfer: function(roll, pitch, yaw, throttle) which sends one control frame.
+            rate: sends per second.
+            onError: function(error) called from the thread when transfer starts raising, the thread keeps running.
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self.rate = rate
+        self.period = 1 / rate
+
+        self._transfer = transfer
+        self._onError = onError
+        self._setpoint = None   # (roll, pitch, yaw, throttle), None while idle
+        self._throttle = None   # replaces the throttle of the setpoint while not None, see setThrottle()
+        self._flagAbort = False
+        self._thread = None
+        self._flagRun = False
+        self._condition = Condition()   # notified after every send
+        self._countTick = 0
+
+        # statistics
+        self.countSent = 0
+        self.countMissed = 0
+        self.countError = 0
+        self.lastError = None
+        self.jitter = Histogram()
+
+    def setRate(self, rate):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+
+        self.rate = rate
+        self.period = 1 / rate
+
+    def setSetpoint(self, roll, pitch, yaw, throttle):
+        """Replace the setpoint, it is sent from the next deadline on. Values are from -100 to 100.
+        Ignored while aborted.
+        """
+        setpoint = tuple(self._checkValue(value) for value in (roll, pitch, yaw, throttle))
+        if not self._flagAbort:
+            self._setpoint = setpoint
+
+    def getSetpoint(self):
+        return self._setpoint
+
+    def clearSetpoint(self):
+        """Stop sending until the next setSetpoint().
+        """
+        self._setpoint = None
+
+    def setThrottle(self, throttle):
+        """Override the throttle of every setpoint, for a controller running next to the other commands
+        (altitude hold). While idle, (0, 0, 0, throttle) is sent. None removes the override.
+        """
+        self._throttle = None if throttle is None else self._checkValue(throttle)
+
+    def abort(self):
+        """Clear the setpoint and ignore new ones until resume(). A running hold() returns at once.
+        """
+        with self._condition:
+            self._flagAbort = True
+            self._setpoint = None
+            self._condition.notify_all()
+
+    def resume(self):
+        self._flagAbort = False
+
+    def isAborted(self):
+        return self._flagAbort
+
+    def isRunning(self):
+        return self._flagRun
+
+    def start(self):
+        if self._flagRun:
+            return
+
+        self._flagRun = True
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._flagRun:
+            return
+
+        self._flagRun = False
+        with self._condition:
+            self._condition.notify_all()
+        self._thread.join()
+        self._thread = None
+
+    def waitTick(self, timeout=None):
+        """Block until the next control frame is sent, to run a sensing loop in step with the control rate.
+
+        Returns: True if a frame was sent, False on timeout or if the scheduler is not running.
+        """
+        if not self._flagRun:
+            return False
+
+        with self._condition:
+            countTick = self._countTick
+            return self._condition.wait_for(lambda: (self._countTick != countTick) or (not self._flagRun),
+                                            timeout) and self._flagRun
+
+    def hold(self, roll, pitch, yaw, throttle, duration):
+        """Send the setpoint for duration sec, then go idle.
+
+        Returns: True if the whole duration passed, False if aborted.
+        """
+        setpoint = tuple(self._checkValue(value) for value in (roll, pitch, yaw, throttle))
+        with self._condition:
+            if self._flagAbort:
+                return False
+            self._setpoint = setpoint
+            if self._condition.wait_for(lambda: self._flagAbort, duration):
+                return False
+            self._setpoint = None
+        return True
+
+    def getStats(self):
+        """Returns: A dict with the rate, frames sent, missed deadlines and the jitter(lateness) histogram in sec.
+        """
+        return {
+            "rate": self.rate,
+            "sent": self.countSent,
+            "missed": self.countMissed,
+            "errors": self.countError,
+            "jitter": self.jitter.snapshot(),
+        }
+
+    def resetStats(self):
+        self.countSent = 0
+        self.countMissed = 0
+        self.countError = 0
+        self.lastError = None
+        self.jitter.clear()
+
+    @staticmethod
+    def _checkValue(value):
+        try:
+            value = int(value)
+        except (TypeError, ValueError) as err:
+            raise ValueError('only integer values are permitted') from err
+
+        if (value > 100) or (value < -100):
+            raise ValueError('only values from -100 to 100 are permitted')
+        return value
+
+    def _run(self):
+        deadline = perf_counter()
+        failing = False
+
+        while self._flagRun:
+            period = self.period
+            remaining = deadline - perf_counter()
+            if remaining > 0:
+                sleep(remaining)
+
+            now = perf_counter()
+            lateness = now - deadline
+
+            setpoint = self._setpoint
+            throttle = self._throttle
+            if self._flagAbort:
+                setpoint = None
+            elif throttle is not None:
+                setpoint = (0, 0, 0, throttle) if setpoint is None else setpoint[:3] + (throttle,)
+
+            if setpoint is not None:
+                try:
+                    self._transfer(*setpoint)
+                    self.countSent += 1
+                    failing = False
+                except Exception as error:
+                    # a failed send must not end the thread, the next deadline tries again
+                    self.countError += 1
+                    self.lastError = error
+                    if (self._onError is not None) and (not failing):
+                        self._onError(error)    # once per run of failed sends
+                    failing = True
+                self.jitter.add(lateness)
+
+                # skip the deadlines that already passed instead of sending a burst
+                if lateness >= period:
+                    self.countMissed += int(lateness / period)
+
+            deadline += period
+            if deadline < now:
+                deadline += (int((now - deadline) / period) + 1) * period
+
+            with self._condition:
+                self._countTick += 1
+                self._condition.notify_all()
+
+
+class RequestScheduler:
+    """Send the requests of several DataTypes from one thread, each at its own rate.
+
+    Each DataType keeps its own deadline, the thread sleeps until the earliest one. A late request skips the
+    missed deadlines instead of sending a burst.
+
+    Examples:
+        >>> scheduler = RequestScheduler(drone._transferRequest)
+        >>> scheduler.start()
+        >>> scheduler.setRate(DataType.Attitude, 50)
+        >>> scheduler.setRate(DataType.Attitude, 0)     # stop requesting
+    """
+
+    def __init__(self, transfer):
+        """
+        Args:
+            transfer: function(dataType) which sends one request.
+        """
+        self._transfer = transfer
+        self._rates = {}        # DataType and requests per second
+        self._deadlines = {}    # DataType and perf_counter() of its next request
+        self._thread = None
+        self._flagRun = False
+        self._condition = Condition()
+
+        # statistics
+        self.countSent = 0
+
+    def setRate(self, dataType, rate):
+        """Request dataType rate times per second, 0 or None stops requesting it.
+        """
+        with self._condition:
+            if rate:
+                self._rates[dataType] = rate
+                self._deadlines.setdefault(dataType, perf_counter())
+            else:
+                self._rates.pop(dataType, None)
+                self._deadlines.pop(dataType, None)
+            self._condition.notify_all()
+
+    def getRates(self):
+        with self._condition:
+            return dict(self._rates)
+
+    def isRunning(self):
+        return self._flagRun
+
+    def start(self):
+        if self._flagRun:
+            return
+
+        self._flagRun = True
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self._flagRun:
+            return
+
+        with self._condition:
+            self._flagRun = False
+            self._condition.notify_all()
+        self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._flagRun:
+                    return
+
+                now = perf_counter()
+                due = [dataType for dataType, deadline in self._deadlines.items() if deadline <= now]
+                if not due:
+                    timeout = (min(self._deadlines.values()) - now) if self._deadlines else None
+                    self._condition.wait(timeout)
+                    continue
+
+                for dataType in due:
+                    period = 1 / self._rates[dataType]
+                    deadline = self._deadlines[dataType] + period
+                    self._deadlines[dataType] = deadline if deadline > now else now + period
+
+            # transfer without the lock, so setRate() never waits for the port
+            for dataType in due:
+                self._transfer(dataType)
+                self.countSent += 1
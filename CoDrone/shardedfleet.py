@@ -0,0 +1,584 @@
+import asyncio
+import multiprocessing
+import os
+import zlib
+from enum import Enum
+from multiprocessing import shared_memory
+from threading import Lock
+from time import perf_counter, sleep, time
+
+import numpy as np
+
+from CoDrone.asynccodrone import AsyncCoDrone
+from CoDrone.protocol import *
+
+
+def _attachSharedMemory(name):
+    """Attach an existing block. Only the creator unlinks it: workers started with spawn share the resource
+    tracker of the coordinator, where the block is already registered once.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)   # 3.13+
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _checksum(data, start=0):
+    """Returns: The crc32 of the bytes of a row or slot after its sequence and check fields(the first 8 bytes).
+    """
+    return zlib.crc32(data[8:], start)
+
+
+def _isValid(data):
+    return _checksum(data) == int(data[4:8].view("<u4")[0])
+
+
+class TelemetryTable:
+    """Latest telemetry of every drone in shared memory, one fixed size row per drone.
+
+    Each row is guarded by a sequence lock: the writer makes the sequence odd, writes the row and makes it even
+    again. A reader copies the row and retries if the sequence was odd or changed meanwhile, so readers never
+    block the writer. There is one writer per row(the worker of the drone).
+    numpy stores are plain memory writes without barriers, so on CPUs with weak memory ordering(arm64) another
+    process may see them in another order. Each row therefore carries a crc32 of its fields, and a copy only
+    counts if it matches, so a reader never returns a half written row whatever the order of the stores.
+    """
+
+    dtype = np.dtype([
+        ("sequence", "<u4"),
+        ("check", "<u4"),       # crc32 of the fields below, see _checksum()
+        ("ready", "u1"),        # the worker finished connecting
+        ("connected", "u1"),
+        ("state", "u1"),        # ModeFlight value
+        ("battery", "u1"),      # percent
+        ("roll", "<i2"),
+        ("pitch", "<i2"),
+        ("yaw", "<i2"),
+        ("range", "<i4"),       # bottom range in mm
+        ("time", "<f8"),        # time() of the last update
+    ], align=True)
+
+    def __init__(self, count, name=None):
+        """
+        Args:
+            count: rows(drones).
+            name: name of an existing table to attach, None to create one.
+        """
+        self.count = count
+        if name is None:
+            self._block = shared_memory.SharedMemory(create=True, size=max(1, count * self.dtype.itemsize))
+            self._owner = True
+        else:
+            self._block = _attachSharedMemory(name)
+            self._owner = False
+
+        self.name = self._block.name
+        self.rows = np.ndarray((count,), self.dtype, buffer=self._block.buf)
+        self._sequence = self.rows["sequence"]
+        self._raw = np.ndarray((count, self.dtype.itemsize), np.uint8, buffer=self._block.buf)
+        if self._owner:
+            self._raw[:] = 0
+            for index in range(count):
+                self.write(index, 0, 0, 0, 0, 0, 0, 0, 0, 0.0)
+
+    def close(self):
+        """Detach, and remove the table if this process created it.
+        """
+        self.rows = None
+        self._sequence = None
+        self._raw = None
+        self._block.close()
+        if self._owner:
+            self._block.unlink()
+
+    def write(self, index, ready, connected, state, battery, roll, pitch, yaw, range, timestamp):
+        row = np.zeros((), self.dtype)
+        row[()] = (0, 0, ready, connected, state, battery, roll, pitch, yaw, range, timestamp)
+        data = np.frombuffer(row.tobytes(), np.uint8).copy()
+        data[4:8] = np.array([_checksum(data)], "<u4").view(np.uint8)
+
+        sequence = int(self._sequence[index]) + 1
+        self._sequence[index] = sequence
+        self._raw[index, 4:] = data[4:]
+        self._sequence[index] = sequence + 1
+
+    def setConnected(self, index, connected):
+        """Rewrite the connected flag of a row, keeping the rest of it. Also marks the row ready.
+        """
+        row = self.read(index)
+        self.write(index, 1, connected, row["state"], row["battery"], row["roll"], row["pitch"], row["yaw"],
+                   row["range"], time())
+
+    def read(self, index, timeout=1.0):
+        """Returns: A consistent copy of the row of the drone.
+
+        Raises RuntimeError if no consistent copy could be read within timeout sec, as when its writer died in
+        the middle of a write(see release()).
+        """
+        timeEnd = None
+        while True:
+            sequence = self._sequence[index]
+            if not (sequence & 1):
+                data = self._raw[index].copy()
+                if (self._sequence[index] == sequence) and _isValid(data):
+                    return data.view(self.dtype)[0]
+
+            now = perf_counter()
+            if timeEnd is None:
+                timeEnd = now + timeout
+            elif now > timeEnd:
+                raise RuntimeError("row {0} of the telemetry table is stuck in a write".format(index))
+            sleep(0)
+
+    def release(self, index):
+        """Make the sequence of a row even again after its writer died, possibly in the middle of a write.
+        Only for a row without a writer left.
+        """
+        sequence = int(self._sequence[index])
+        if sequence & 1:
+            self._sequence[index] = sequence + 1
+
+    def readAll(self):
+        """Returns: A consistent copy of every row as a numpy structured array.
+        """
+        sequences = self._sequence.copy()
+        raw = self._raw.copy()
+        rows = raw.view(self.dtype).reshape(self.count)
+        changed = (sequences & 1) | (self._sequence != sequences)
+        for index in range(self.count):
+            if changed[index] or (not _isValid(raw[index])):
+                rows[index] = self.read(index)
+        return rows
+
+
+class ShardCommand(Enum):
+    Control = 0x01      # set the setpoint the worker sends at the control rate
+    Clear = 0x02        # stop sending the setpoint
+    TakeOff = 0x03
+    Land = 0x04
+    Stop = 0x05         # emergency stop
+    Quit = 0x06         # stop the worker
+
+
+class CommandRing:
+    """Single producer, single consumer ring of commands in shared memory.
+
+    The producer writes the slot and then advances head, the consumer reads the slot and then advances tail.
+    head and tail are aligned 64 bit counters in separate cache lines and each has only one writer, so no lock is
+    shared between the processes. numpy stores have no memory barriers, so the consumer may see the new head
+    before the slot on CPUs with weak memory ordering(arm64). Each slot therefore carries the head it was written
+    for and a crc32 of its fields: the consumer stops at the first slot which does not match yet and reads it on
+    the next pop().
+    """
+
+    dtype = np.dtype([
+        ("stamp", "<u4"),       # head + 1 at the time of the push, truncated to 32 bit
+        ("check", "<u4"),       # crc32 of the stamp and the fields below
+        ("index", "<u2"),
+        ("command", "u1"),
+        ("values", "<i2", 4),
+    ], align=True)
+    _offsetSlots = 128
+
+    def __init__(self, capacity=256, name=None):
+        """
+        Args:
+            capacity: slots.
+            name: name of an existing ring to attach, None to create one.
+        """
+        self.capacity = capacity
+        size = self._offsetSlots + capacity * self.dtype.itemsize
+        if name is None:
+            self._block = shared_memory.SharedMemory(create=True, size=size)
+            self._owner = True
+        else:
+            self._block = _attachSharedMemory(name)
+            self._owner = False
+
+        self.name = self._block.name
+        self._counters = np.ndarray((16,), np.uint64, buffer=self._block.buf)    # [0] head, [8] tail
+        self._raw = np.ndarray((capacity, self.dtype.itemsize), np.uint8, buffer=self._block.buf,
+                               offset=self._offsetSlots)
+        if self._owner:
+            self._counters[:] = 0
+            self._raw[:] = 0
+
+    def close(self):
+        self._counters = None
+        self._raw = None
+        self._block.close()
+        if self._owner:
+            self._block.unlink()
+
+    def push(self, index, command, values=(0, 0, 0, 0)):
+        """Producer side.
+
+        Returns: False if the ring is full.
+        """
+        head = int(self._counters[0])
+        if head - int(self._counters[8]) >= self.capacity:
+            return False
+
+        slot = np.zeros((), self.dtype)
+        slot[()] = ((head + 1) & 0xFFFFFFFF, 0, index, command.value, values)
+        data = np.frombuffer(slot.tobytes(), np.uint8).copy()
+        data[4:8] = np.array([_checksum(data, zlib.crc32(data[:4]))], "<u4").view(np.uint8)
+
+        self._raw[head % self.capacity] = data
+        self._counters[0] = head + 1
+        return True
+
+    def pop(self):
+        """Consumer side.
+
+        Returns: A list of (index, ShardCommand, values) of every pending command.
+        """
+        tail = int(self._counters[8])
+        head = int(self._counters[0])
+
+        commands = []
+        while tail < head:
+            data = self._raw[tail % self.capacity].copy()
+            slot = data.view(self.dtype)[0]
+            if (int(slot["stamp"]) != ((tail + 1) & 0xFFFFFFFF)) or \
+                    (_checksum(data, zlib.crc32(data[:4])) != int(slot["check"])):
+                break   # not visible yet
+            commands.append((int(slot["index"]), ShardCommand(int(slot["command"])), tuple(slot["values"].tolist())))
+            tail += 1
+
+        self._counters[8] = tail
+        return commands
+
+
+def _runShard(tableName, count, ringName, capacity, indices, portNames, deviceNames, requestRate, controlRate,
+              pollInterval):
+    """Entry point of a worker process.
+    """
+    asyncio.run(_shard(tableName, count, ringName, capacity, indices, portNames, deviceNames, requestRate,
+                       controlRate, pollInterval))
+
+
+async def _shard(tableName, count, ringName, capacity, indices, portNames, deviceNames, requestRate, controlRate,
+                 pollInterval):
+    table = TelemetryTable(count, tableName)
+    ring = CommandRing(capacity, ringName)
+    loop = asyncio.get_running_loop()
+
+    drones = {index: AsyncCoDrone() for index in indices}
+    results = await asyncio.gather(*[drones[index].connect(deviceName, portName)
+                                     for index, deviceName, portName in zip(indices, deviceNames, portNames)],
+                                   return_exceptions=True)
+    connected = {index: result is True for index, result in zip(indices, results)}
+
+    setpoints = dict.fromkeys(indices)
+    counts = dict.fromkeys(indices)
+    tasks = set()
+    dataTypes = (DataType.Attitude, DataType.Range, DataType.Battery, DataType.State)
+
+    def publish(index):
+        drone = drones[index]
+        data = drone._data
+        state = data.state.value if isinstance(data.state, Enum) else int(data.state)
+        attitude = data.attitude
+        table.write(index, 1, drone.isConnected(), state, data.batteryPercent,
+                    attitude.ROLL, attitude.PITCH, attitude.YAW, data.range, time())
+
+    for index in indices:
+        publish(index)
+
+    timeControl = timeRequest = timeRequestSlow = loop.time()
+    try:
+        while True:
+            for index, command, values in ring.pop():
+                if command == ShardCommand.Quit:
+                    return
+
+                drone = drones.get(index)
+                if (drone is None) or (not connected[index]):
+                    continue
+
+                if command == ShardCommand.Control:
+                    setpoints[index] = values
+                elif command == ShardCommand.Clear:
+                    setpoints[index] = None
+                else:
+                    setpoints[index] = None
+                    flight = {ShardCommand.TakeOff: drone.takeoff, ShardCommand.Land: drone.land,
+                              ShardCommand.Stop: drone.emergencyStop}[command]
+                    task = loop.create_task(flight())
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+
+            now = loop.time()
+            if now >= timeControl:
+                timeControl = max(timeControl + 1 / controlRate, now)
+                for index, setpoint in setpoints.items():
+                    if setpoint is not None:
+                        try:
+                            drones[index].sendControl(*setpoint)
+                        except Exception:
+                            setpoints[index] = None     # one bad drone must not stop the others
+
+            if now >= timeRequest:
+                timeRequest = max(timeRequest + 1 / requestRate, now)
+                slow = now >= timeRequestSlow
+                if slow:
+                    timeRequestSlow = now + 1
+                for index, drone in drones.items():
+                    if connected[index]:
+                        try:
+                            drone.sendRequest(DataType.Attitude)
+                            drone.sendRequest(DataType.Range)
+                            if slow:
+                                drone.sendRequest(DataType.Battery)
+                                drone.sendRequest(DataType.State)
+                        except Exception:
+                            connected[index] = False
+
+            # publish the drones which received anything since the last loop
+            for index, drone in drones.items():
+                count = tuple(drone.getCount(dataType) for dataType in dataTypes)
+                if count != counts[index]:
+                    counts[index] = count
+                    try:
+                        publish(index)
+                    except Exception:
+                        pass
+
+            await asyncio.sleep(pollInterval)
+    finally:
+        for task in tasks:
+            task.cancel()
+        for index, drone in drones.items():
+            try:
+                drone.close()
+            except Exception:
+                pass
+            table.setConnected(index, 0)
+        table.close()
+        ring.close()
+
+
+class ShardedFleet:
+    """Fleet split across worker processes, for more drones than one process can parse.
+
+    Each worker owns the serial ports of its shard and drives them with AsyncCoDrone on its own event loop, so the
+    receive path of different shards runs in parallel instead of sharing one GIL. Workers publish the latest
+    attitude, range, battery and state of every drone into a TelemetryTable and take commands from a CommandRing,
+    so reading the whole fleet or sending a command is a memory access, not an IPC round trip.
+    Setpoints are held by the workers and sent at controlRate until they change.
+
+    Examples:
+        >>> with ShardedFleet(portNames, deviceNames, processes=4) as fleet:
+        ...     fleet.takeoff()
+        ...     fleet.setSetpoint(0, 0, 30, 0)
+        ...     print(fleet.telemetry()["yaw"])
+        ...     fleet.land()
+    """
+
+    def __init__(self, portNames, deviceNames=None, processes=None, requestRate=20, controlRate=50,
+                 ringCapacity=256, pollInterval=0.001):
+        """
+        Args:
+            portNames: Serial port name of each LINK board.
+            deviceNames: 4 digit device name of the drone of each port, see Fleet.
+            processes: worker processes, the number of cpus by default(at most one per drone).
+            requestRate: requests per second of attitude and range, battery and state are requested every second.
+            controlRate: control frames per second of the held setpoints.
+            ringCapacity: commands each worker can have pending.
+            pollInterval: seconds a worker sleeps between two checks of its ring.
+        """
+        self.portNames = list(portNames)
+        self.deviceNames = list(deviceNames) if deviceNames is not None else ["None"] * len(self.portNames)
+        if len(self.deviceNames) != len(self.portNames):
+            raise ValueError("deviceNames must have one name per port")
+
+        count = len(self.portNames)
+        processes = processes or os.cpu_count() or 1
+        processes = max(1, min(processes, count))
+
+        self.requestRate = requestRate
+        self.controlRate = controlRate
+        self.ringCapacity = ringCapacity
+        self.pollInterval = pollInterval
+
+        # contiguous shards of about the same size
+        self.shards = [list(range(count * shard // processes, count * (shard + 1) // processes))
+                       for shard in range(processes)]
+        self._shardOf = {index: shard for shard, indices in enumerate(self.shards) for index in indices}
+
+        self._table = None
+        self._rings = []
+        self._locks = [Lock() for _ in self.shards]     # producers of the same ring in this process
+        self._processes = []
+        self._exited = set()    # shards whose worker exited, their rows are marked disconnected
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+
+    def __len__(self):
+        return len(self.portNames)
+
+    def isRunning(self):
+        return self._table is not None
+
+    def start(self, timeout=30):
+        """Start the workers, which connect their drones in parallel.
+
+        Returns: A list of bool, True where the drone connected within timeout sec.
+        """
+        if self._table is not None:
+            return self.isConnected()
+
+        self._exited = set()
+        context = multiprocessing.get_context("spawn")
+        self._table = TelemetryTable(len(self.portNames))
+        self._rings = [CommandRing(self.ringCapacity) for _ in self.shards]
+
+        for indices, ring in zip(self.shards, self._rings):
+            process = context.Process(target=_runShard, daemon=True, args=(
+                self._table.name, len(self.portNames), ring.name, self.ringCapacity, indices,
+                [self.portNames[index] for index in indices], [self.deviceNames[index] for index in indices],
+                self.requestRate, self.controlRate, self.pollInterval))
+            process.start()
+            self._processes.append(process)
+
+        timeEnd = perf_counter() + timeout
+        while perf_counter() < timeEnd:
+            if self.telemetry()["ready"].all() or not all(process.is_alive() for process in self._processes):
+                break
+            sleep(0.01)
+
+        return self.isConnected()
+
+    def stop(self, timeout=5):
+        """Stop the workers(they close their ports) and remove the shared memory.
+        """
+        if self._table is None:
+            return
+
+        for shard, indices in enumerate(self.shards):
+            if self._processes[shard].is_alive():
+                self._push(shard, indices[0] if indices else 0, ShardCommand.Quit)
+
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+        for ring in self._rings:
+            ring.close()
+        self._table.close()
+
+        self._processes = []
+        self._rings = []
+        self._table = None
+
+    def telemetry(self):
+        """Returns: A copy of the telemetry of every drone as a numpy structured array, see TelemetryTable.dtype.
+
+        Examples:
+            >>> telemetry = fleet.telemetry()
+            >>> telemetry["range"].min()
+        """
+        self._checkWorkers()
+        return self._table.readAll()
+
+    def getTelemetry(self, index):
+        """Returns: A dict of the telemetry of one drone.
+        """
+        self._checkWorkers()
+        row = self._table.read(index)
+        return {name: row[name].item() for name in TelemetryTable.dtype.names if name not in ("sequence", "check")}
+
+    def isConnected(self):
+        return [bool(connected) for connected in self.telemetry()["connected"]]
+
+    def setSetpoint(self, roll, pitch, yaw, throttle):
+        """Hold a control setpoint on every drone. Values are from -100 to 100, the same for every drone or a
+        list with one value per drone. Every value is checked before any is sent.
+        """
+        values = []
+        for value in (roll, pitch, yaw, throttle):
+            if isinstance(value, (list, tuple)):
+                if len(value) != len(self.portNames):
+                    raise ValueError("a list of values needs one value per drone")
+                values.append([self._checkValue(v) for v in value])
+            else:
+                values.append([self._checkValue(value)] * len(self.portNames))
+
+        self._pushAll([(index, ShardCommand.Control, setpoint) for index, setpoint in enumerate(zip(*values))])
+
+    def clearSetpoint(self):
+        self._broadcast(ShardCommand.Clear)
+
+    def takeoff(self):
+        self._broadcast(ShardCommand.TakeOff)
+
+    def land(self):
+        self._broadcast(ShardCommand.Land)
+
+    def emergencyStop(self):
+        self._broadcast(ShardCommand.Stop)
+
+    @staticmethod
+    def _checkValue(value):
+        try:
+            value = int(value)
+        except (TypeError, ValueError) as err:
+            raise ValueError('only integer values are permitted') from err
+
+        if (value > 100) or (value < -100):
+            raise ValueError('only values from -100 to 100 are permitted')
+        return value
+
+    def _broadcast(self, command):
+        self._pushAll([(index, command, (0, 0, 0, 0)) for index in range(len(self.portNames))])
+
+    def _pushAll(self, commands):
+        """Queue (index, command, values) to the shards of the drones. The shards still running get their
+        commands even if another one failed, then the first error is raised.
+        """
+        error = None
+        for index, command, values in commands:
+            try:
+                self._push(self._shardOf[index], index, command, values)
+            except RuntimeError as e:
+                error = error or e
+        if error is not None:
+            raise error
+
+    def _push(self, shard, index, command, values=(0, 0, 0, 0)):
+        """Queue a command, waiting up to 1 sec while the ring of the shard is full.
+        """
+        if self._table is None:
+            raise RuntimeError("the fleet is not started")
+
+        timeEnd = perf_counter() + 1
+        with self._locks[shard]:
+            while True:
+                if not self._processes[shard].is_alive():
+                    self._checkWorkers()
+                    raise RuntimeError("the worker of shard {0} exited(exitcode {1})".format(
+                        shard, self._processes[shard].exitcode))
+                if self._rings[shard].push(index, command, values):
+                    return
+                if perf_counter() > timeEnd:
+                    raise RuntimeError("the command ring of shard {0} is full".format(shard))
+                sleep(self.pollInterval)
+
+    def _checkWorkers(self):
+        """Mark the drones of a worker which exited without cleaning up(killed or crashed) as disconnected.
+        Its rows have no writer left, so the coordinator releases a row it left half written and rewrites them.
+        """
+        for shard, process in enumerate(self._processes):
+            if (shard not in self._exited) and (not process.is_alive()):
+                self._exited.add(shard)
+                for index in self.shards[shard]:
+                    self._table.release(index)
+                    self._table.setConnected(index, 0)
@@ -0,0 +1,427 @@
+import os
+import select
+import tty
+from heapq import heappop, heappush
+from math import radians, sin
+from threading import Thread
+from time import perf_counter, sleep
+
+from CoDrone.codrone import makeTransferDataArray
+from CoDrone.receiver import *
+from CoDrone.storage import *
+
+
+class Dynamics:
+    """Simple flight model driven by the Control inputs(-100 ~ 100).
+    Roll and pitch follow the stick with a first order lag, yaw and throttle are rate commands.
+    """
+
+    maxAngle = 30           # degree at full roll/pitch
+    maxYawRate = 180        # degree/sec at full yaw
+    maxClimbRate = 1000     # mm/sec at full throttle
+    maxSpeed = 1000         # mm/sec at maxAngle
+    takeoffHeight = 800     # mm
+    autoClimbRate = 500     # mm/sec while taking off and landing
+    timeConstant = 0.15     # sec of the roll/pitch lag
+
+    def __init__(self):
+        self.modeFlight = ModeFlight.READY
+        self.control = Control()
+
+        self.roll = 0.0
+        self.pitch = 0.0
+        self.yaw = 0.0
+        self.rateRoll = 0.0
+        self.ratePitch = 0.0
+        self.rateYaw = 0.0
+        self.height = 0.0
+        self.climbRate = 0.0
+        self.positionX = 0.0
+        self.positionY = 0.0
+        self.batteryPercent = 100.0
+
+    def flightEvent(self, flightEvent):
+        if (flightEvent == FlightEvent.TakeOff) and (self.modeFlight == ModeFlight.READY):
+            self.modeFlight = ModeFlight.TAKE_OFF
+        elif (flightEvent == FlightEvent.Landing) and (self.modeFlight in (ModeFlight.TAKE_OFF, ModeFlight.FLIGHT)):
+            self.modeFlight = ModeFlight.LANDING
+        elif flightEvent == FlightEvent.Stop:
+            self.stop()
+
+    def stop(self):
+        self.modeFlight = ModeFlight.READY
+        self.height = 0.0
+        self.climbRate = 0.0
+
+    def step(self, dt):
+        control = self.control
+        flying = self.modeFlight in (ModeFlight.TAKE_OFF, ModeFlight.FLIGHT, ModeFlight.LANDING)
+
+        # attitude
+        targetRoll = control.roll * self.maxAngle / 100 if flying else 0.0
+        targetPitch = control.pitch * self.maxAngle / 100 if flying else 0.0
+        alpha = min(1.0, dt / self.timeConstant)
+
+        roll = self.roll + (targetRoll - self.roll) * alpha
+        pitch = self.pitch + (targetPitch - self.pitch) * alpha
+        self.rateRoll = (roll - self.roll) / dt if dt > 0 else 0.0
+        self.ratePitch = (pitch - self.pitch) / dt if dt > 0 else 0.0
+        self.roll = roll
+        self.pitch = pitch
+
+        self.rateYaw = control.yaw * self.maxYawRate / 100 if flying else 0.0
+        self.yaw = (self.yaw + self.rateYaw * dt + 180) % 360 - 180
+
+        # height
+        if self.modeFlight == ModeFlight.TAKE_OFF:
+            self.climbRate = self.autoClimbRate
+            if self.height >= self.takeoffHeight:
+                self.modeFlight = ModeFlight.FLIGHT
+        elif self.modeFlight == ModeFlight.FLIGHT:
+            self.climbRate = control.throttle * self.maxClimbRate / 100
+        elif self.modeFlight == ModeFlight.LANDING:
+            self.climbRate = -self.autoClimbRate
+            if self.height <= 0:
+                self.stop()
+        else:
+            self.climbRate = 0.0
+
+        self.height = max(0.0, self.height + self.climbRate * dt)
+
+        # position, right = +x, forward = +y
+        if flying:
+            self.positionX += sin(radians(self.roll)) * self.maxSpeed / sin(radians(self.maxAngle)) * dt
+            self.positionY += sin(radians(self.pitch)) * self.maxSpeed / sin(radians(self.maxAngle)) * dt
+            self.batteryPercent = max(0.0, self.batteryPercent - dt / 3.6)   # 6 minutes of flight
+
+
+class VirtualCoDrone:
+    """Simulated CODRONE LINK and drone on a pseudo terminal, for hardware free tests and benchmarks.
+    The client opens portName like a real LINK board.
+
+    It answers Request with the simulated data, acks every other frame, plays the discovery
+    (LinkEvent Scanning, LinkDiscoveredDevice, LinkEvent ScanStop) and connection events, and streams
+    the types in rates without being requested. Control frames drive Dynamics.
+
+    Examples:
+        >>> with VirtualCoDrone(rates={DataType.Attitude: 100}) as simulator:
+        ...     drone = CoDrone()
+        ...     drone.connect(portName=simulator.portName)
+    """
+
+    def __init__(self, name="CODRONE_0001", rssi=-40, rates=None, connected=False, discoveryTime=0.5,
+                 connectTime=0.2, tickRate=200):
+        """
+        Args:
+            name: Device name sent in LinkDiscoveredDevice, the client matches name[8:12].
+            rssi: Signal strength sent in LinkDiscoveredDevice.
+            rates: dict of DataType and frames/sec streamed without request, for Attitude, Imu, Range,
+                Pressure, ImageFlow, Battery and State.
+            connected: Start connected to skip the discovery and connection.
+            discoveryTime: Seconds from LinkDiscoverStart to ScanStop.
+            connectTime: Seconds from LinkConnect to Connected.
+            tickRate: Steps/sec of the dynamics.
+        """
+        self.name = name
+        self.rssi = rssi
+        self.rates = dict(rates) if rates is not None else {}
+        self.connected = connected
+        self.discoveryTime = discoveryTime
+        self.connectTime = connectTime
+        self.tickRate = tickRate
+
+        self.portName = None
+        self.dynamics = Dynamics()
+
+        # statistics
+        self.countReceived = dict.fromkeys(list(DataType), 0)
+        self.countSent = dict.fromkeys(list(DataType), 0)
+        self.countDropped = 0
+        self.countErrors = 0    # received frames with a bad crc or length, interleaved writes end up here
+
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._flagRun = False
+        self._receiver = Receiver()
+        self._scheduled = []    # heap of (time, sequence, frame)
+        self._sequence = 0
+        self._timeStart = 0
+
+        self._headers = {}
+        for dataType in DataType:
+            header = Header()
+            header.dataType = dataType
+            self._headers[dataType] = header
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.stop()
+
+    def start(self):
+        """Open the pseudo terminal pair and start the simulation thread.
+
+        Returns: The port name for CoDrone.open()/connect().
+        """
+        if self._flagRun:
+            return self.portName
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        os.set_blocking(self._master, False)
+        self.portName = os.ttyname(self._slave)
+
+        self._timeStart = perf_counter()
+        self._flagRun = True
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+        return self.portName
+
+    def stop(self):
+        if not self._flagRun:
+            return
+
+        self._flagRun = False
+        self._thread.join()
+        os.close(self._master)
+        os.close(self._slave)
+
+    ### SIMULATION THREAD -------- START
+
+    def _run(self):
+        buffer = bytearray(4096)
+        timeTick = 1 / self.tickRate
+        now = perf_counter()
+        timeStep = now
+        timeNext = {dataType: now for dataType in self.rates}
+
+        while self._flagRun:
+            now = perf_counter()
+
+            # wait for the next tick, stream or scheduled frame
+            deadline = timeStep + timeTick
+            for dataType, rate in self.rates.items():
+                if rate > 0:
+                    deadline = min(deadline, timeNext[dataType])
+            if self._scheduled:
+                deadline = min(deadline, self._scheduled[0][0])
+
+            readable, _, _ = select.select([self._master], [], [], max(0.0, deadline - now))
+            if readable:
+                self._read(buffer)
+
+            now = perf_counter()
+            if now - timeStep >= timeTick:
+                self.dynamics.step(now - timeStep)
+                timeStep = now
+
+            # scheduled frames
+            while self._scheduled and (self._scheduled[0][0] <= now):
+                self._write(heappop(self._scheduled)[2])
+
+            # streams, every period missed since the last loop is sent at once
+            if self.connected:
+                for dataType, rate in self.rates.items():
+                    if (rate <= 0) or (timeNext[dataType] > now):
+                        continue
+
+                    count = min(int((now - timeNext[dataType]) * rate) + 1, 64)
+                    timeNext[dataType] = max(timeNext[dataType] + count / rate, now - 1 / rate)
+                    frame = self._makeFrame(dataType)
+                    self._write(frame * count, dataType, count)
+
+    def _read(self, buffer):
+        try:
+            size = os.readv(self._master, [buffer])
+        except (BlockingIOError, OSError):
+            return
+
+        frames = self._receiver.scan(memoryview(buffer)[:size])
+        self.countErrors += len(self._receiver.errors)
+
+        for header, dataArray in frames:
+            self.countReceived[header.dataType] += 1
+            try:
+                self._handler(header, dataArray)
+            except ValueError:
+                pass    # undefined enum value in the data
+
+    def _write(self, frame, dataType=None, count=1):
+        try:
+            os.write(self._master, frame)
+        except (BlockingIOError, OSError):
+            # the client does not read, drop like a full serial buffer
+            self.countDropped += count
+            return
+
+        if dataType is not None:
+            self.countSent[dataType] += count
+
+    def _send(self, dataType, data=None, delay=0):
+        if data is None:
+            frame = self._makeFrame(dataType)
+        else:
+            frame = self._makeFrameFrom(dataType, data)
+
+        if delay > 0:
+            self._sequence += 1
+            heappush(self._scheduled, (perf_counter() + delay, self._sequence, frame))
+        else:
+            self._write(frame, dataType)
+
+    def _sendLinkEvent(self, eventLink, delay=0):
+        data = LinkEvent()
+        data.eventLink = eventLink
+        self._send(DataType.LinkEvent, data, delay)
+
+    ### SIMULATION THREAD -------- END
+
+
+    ### FRAMES -------- START
+
+    def _makeFrameFrom(self, dataType, data):
+        header = self._headers[dataType]
+        header.length = data.getSize()
+        return bytes(makeTransferDataArray(header, data))
+
+    def _makeFrame(self, dataType):
+        """Make the frame of dataType from the current state of the dynamics.
+        """
+        dynamics = self.dynamics
+
+        if dataType == DataType.Attitude:
+            data = Attitude()
+            data.roll, data.pitch, data.yaw = int(dynamics.roll), int(dynamics.pitch), int(dynamics.yaw)
+
+        elif dataType == DataType.Imu:
+            data = Imu()
+            data.accelX = int(sin(radians(dynamics.roll)) * 1000)
+            data.accelY = int(sin(radians(dynamics.pitch)) * 1000)
+            data.accelZ = 1000
+            data.gyroRoll, data.gyroPitch, data.gyroYaw = \
+                int(dynamics.rateRoll), int(dynamics.ratePitch), int(dynamics.rateYaw)
+            data.angleRoll, data.anglePitch, data.angleYaw = \
+                int(dynamics.roll), int(dynamics.pitch), int(dynamics.yaw)
+
+        elif dataType == DataType.Range:
+            data = Range()
+            data.bottom = int(dynamics.height)
+
+        elif dataType == DataType.Pressure:
+            data = Pressure()
+            data.temperature = 25
+            data.pressure = int(101325 - dynamics.height * 0.012)
+
+        elif dataType == DataType.ImageFlow:
+            data = ImageFlow()
+            data.positionX, data.positionY = int(dynamics.positionX), int(dynamics.positionY)
+
+        elif dataType == DataType.Battery:
+            data = Battery()
+            data.batteryPercent = int(dynamics.batteryPercent)
+            data.voltage = int(3300 + dynamics.batteryPercent * 9)
+
+        elif dataType == DataType.State:
+            data = State()
+            data.modeVehicle = ModeVehicle.FlightGuard
+            data.modeSystem = ModeSystem.Running
+            data.modeFlight = dynamics.modeFlight
+            data.modeDrive = ModeDrive.None_
+            data.sensorOrientation = SensorOrientation.Normal
+            data.headless = Headless.Normal
+            data.battery = int(dynamics.batteryPercent)
+
+        elif dataType == DataType.TrimFlight:
+            data = TrimFlight()
+
+        elif dataType == DataType.Address:
+            data = Address()
+            data.address = bytearray(6)
+
+        else:
+            return None
+
+        return self._makeFrameFrom(dataType, data)
+
+    ### FRAMES -------- END
+
+
+    ### HANDLER -------- START
+
+    def _handler(self, header, dataArray):
+        dataType = header.dataType
+
+        if dataType == DataType.Request:
+            request = Request.parse(dataArray)
+            if (request is not None) and self.connected:
+                frame = self._makeFrame(request.dataType)
+                if frame is not None:
+                    self._write(frame, request.dataType)
+            return
+
+        if dataType == DataType.Command:
+            self._handleCommand(Command.parse(dataArray))
+
+        elif (dataType == DataType.Control) and self.connected:
+            control = Control.parse(dataArray)
+            if control is not None:
+                self.dynamics.control = control
+
+        # the LINK acks its own commands, the drone acks the rest only when connected
+        if self.connected or (dataType == DataType.Command):
+            ack = Ack()
+            ack.systemTime = int((perf_counter() - self._timeStart) * 1000) & 0xFFFFFFFF
+            ack.dataType = dataType
+            self._send(DataType.Ack, ack)
+
+    def _handleCommand(self, command):
+        if command is None:
+            return
+
+        commandType = command.commandType
+
+        if commandType == CommandType.LinkDiscoverStart:
+            self._sendLinkEvent(EventLink.Scanning)
+
+            device = LinkDiscoveredDevice()
+            device.index = 0
+            device.address = bytearray(b'\x01\x02\x03\x04\x05\x06')
+            device.name = self.name
+            device.rssi = self.rssi
+            self._send(DataType.LinkDiscoveredDevice, device, self.discoveryTime / 2)
+
+            self._sendLinkEvent(EventLink.ScanStop, self.discoveryTime)
+
+        elif commandType == CommandType.LinkConnect:
+            self._sendLinkEvent(EventLink.Connecting)
+            self._sendLinkEvent(EventLink.Connected, self.connectTime)
+            self._sendLinkEvent(EventLink.ReadyToControl, self.connectTime)
+            self.connected = True
+
+        elif commandType == CommandType.LinkDisconnect:
+            if self.connected:
+                self._sendLinkEvent(EventLink.Disconnected)
+            self.connected = False
+            self.dynamics.stop()
+
+        elif (commandType == CommandType.FlightEvent) and self.connected:
+            self.dynamics.flightEvent(FlightEvent(command.option))
+
+        elif (commandType == CommandType.Stop) and self.connected:
+            self.dynamics.stop()
+
+    ### HANDLER -------- END
+
+
+if __name__ == "__main__":
+    simulator = VirtualCoDrone(rates={DataType.Attitude: 50, DataType.Range: 20})
+    print("Virtual CoDrone on {0}".format(simulator.start()))
+    try:
+        while True:
+            sleep(1)
+    except KeyboardInterrupt:
+        simulator.stop()
@@ -1,3 +1,7 @@
+from time import perf_counter
+
+import numpy as np
+
 from CoDrone.protocol import *
 
 # EventHandler
@@ -27,46 +31,296 @@ class StorageCount:
             self.d[key] = 0
 
 
+# History
+class History:
+    """Fixed capacity ring buffer of one numeric DataType. Each record is the received data laid out as a
+    numpy structured array with the arrival time in the "time" field, so append() is one copy of the raw
+    bytes. Records are written twice(at index and index + capacity) so that every last(n)/window() result
+    is a contiguous view and nothing is copied when reading.
+
+    The views are overwritten once capacity more records arrive, call copy() to keep them.
+
+    Examples:
+        >>> history = drone.enableHistory(DataType.Attitude, 1000)
+        >>> attitude = history.window(2.0)
+        >>> attitude["yaw"].mean(), attitude["time"][-1] - attitude["time"][0]
+    """
+
+    # field names in the order of the struct of each message class
+    fields = {
+        DataType.Attitude: ("roll", "pitch", "yaw"),
+        DataType.Imu: ("accelX", "accelY", "accelZ", "gyroRoll", "gyroPitch", "gyroYaw",
+                       "angleRoll", "anglePitch", "angleYaw"),
+        DataType.Range: ("left", "front", "right", "rear", "top", "bottom"),
+        DataType.Pressure: ("d1", "d2", "temperature", "pressure"),
+        DataType.ImageFlow: ("positionX", "positionY"),
+        DataType.Battery: ("adjustGradient", "adjustYIntercept", "gradient", "yIntercept",
+                           "flagBatteryCalibration", "batteryRaw", "batteryPercent", "voltage"),
+    }
+
+    def __init__(self, dataType, capacity=1024):
+        if dataType not in self.fields:
+            raise ValueError("History is not supported for {0}".format(dataType))
+        if capacity < 1:
+            raise ValueError("capacity must be positive")
+
+        formats = Codec().d[dataType].struct.format.lstrip("<")
+        dtype = np.dtype({"names": ["time"] + list(self.fields[dataType]),
+                          "formats": ["<f8"] + ["<" + code for code in formats]})
+
+        self.dataType = dataType
+        self.capacity = capacity
+        self.dtype = dtype
+        self.count = 0
+
+        self._size = dtype.itemsize
+        self._offset = dtype.fields[self.fields[dataType][0]][1]
+        self._array = np.zeros(capacity * 2, dtype)
+        self._raw = memoryview(self._array.view(np.uint8))
+        self._time = self._array["time"]
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def append(self, dataArray, timestamp):
+        """Record the raw data(without header and crc) received at timestamp.
+        """
+        index = self.count % self.capacity
+
+        for position in (index, index + self.capacity):
+            start = position * self._size + self._offset
+            self._raw[start:start + self._size - self._offset] = dataArray
+            self._time[position] = timestamp
+
+        self.count += 1
+
+    def last(self, n=None):
+        """Returns: A view of the last n records(all if None), oldest first.
+        """
+        length = len(self)
+        n = length if n is None else max(0, min(n, length))
+        end = self.count % self.capacity + self.capacity
+        return self._array[end - n:end]
+
+    def window(self, seconds, now=None):
+        """Returns: A view of the records that arrived in the last seconds before now(default time()).
+        """
+        records = self.last()
+        if now is None:
+            now = time()
+        start = np.searchsorted(records["time"], now - seconds, side="left")
+        return records[start:]
+
+    def clear(self):
+        self.count = 0
+
+
+# Storage History
+class StorageHistory:
+    def __init__(self):
+        self.d = dict.fromkeys(list(DataType))
+
+
+class SensorCache:
+    """Arrival time of the data of each DataType, so the getters skip the request while the stored data is fresh.
+
+    Every parsed frame updates the time of its DataType, whether it was requested, streamed or part of a snapshot.
+    Times come from perf_counter(), so a change of the system clock does not make data look fresh or stale.
+    hits and misses count the checks of each DataType.
+
+    Examples:
+        >>> drone.setMaxAge(DataType.Range, 0.05)
+        >>> drone.getHeight()   # requests only if the last range is older than 50 ms
+        >>> drone.getHeight(maxAge=0)   # always requests
+    """
+
+    # seconds the data may be old before a getter requests it again, 0 for the other DataTypes
+    defaultMaxAge = {DataType.Attitude: 0.1, DataType.Battery: 5, DataType.Pressure: 3, DataType.State: 0.1}
+
+    def __init__(self):
+        self.maxAge = dict.fromkeys(list(DataType), 0)
+        self.maxAge.update(self.defaultMaxAge)
+        self.times = dict.fromkeys(list(DataType))
+        self.hits = dict.fromkeys(list(DataType), 0)
+        self.misses = dict.fromkeys(list(DataType), 0)
+
+    def update(self, dataType, now=None):
+        self.times[dataType] = perf_counter() if now is None else now
+
+    def invalidate(self, dataType=None):
+        """Make the data of dataType(every DataType if None) stale.
+        """
+        for key in (self.times if dataType is None else (dataType,)):
+            self.times[key] = None
+
+    def getAge(self, dataType):
+        """Returns: Seconds since the last data of dataType arrived, None if it never arrived.
+        """
+        timeUpdate = self.times[dataType]
+        return None if timeUpdate is None else perf_counter() - timeUpdate
+
+    def isFresh(self, dataType, maxAge=None):
+        """Returns: True if the data of dataType is at most maxAge sec old(the maxAge of the DataType if None).
+            0 is never fresh.
+        """
+        if maxAge is None:
+            maxAge = self.maxAge[dataType]
+
+        timeUpdate = self.times[dataType]
+        if (maxAge > 0) and (timeUpdate is not None) and (perf_counter() - timeUpdate <= maxAge):
+            self.hits[dataType] += 1
+            return True
+
+        self.misses[dataType] += 1
+        return False
+
+    def resetStats(self):
+        for dataType in DataType:
+            self.hits[dataType] = 0
+            self.misses[dataType] = 0
+
+    def snapshot(self):
+        """Returns: A dict of DataType name and its maxAge, age, hits, misses and hit ratio, for the checked DataTypes.
+        """
+        result = {}
+        for dataType in DataType:
+            checks = self.hits[dataType] + self.misses[dataType]
+            if checks:
+                result[dataType.name] = {
+                    "maxAge": self.maxAge[dataType],
+                    "age": self.getAge(dataType),
+                    "hits": self.hits[dataType],
+                    "misses": self.misses[dataType],
+                    "hitRatio": self.hits[dataType] / checks,
+                }
+        return result
+
+
+class Snapshot:
+    """Data of several DataTypes requested together, see CoDrone.getSnapshot().
+
+    time: time() when the last data arrived, or the deadline passed
+    data: DataType and the parsed data, only for the DataTypes which arrived
+    times: DataType and time() of its arrival
+    missing: DataTypes which did not arrive before the deadline
+    """
+    __slots__ = ('time', 'data', 'times', 'missing')
+
+    def __init__(self, time, data, times, missing):
+        self.time = time
+        self.data = data
+        self.times = times
+        self.missing = missing
+
+    def __getitem__(self, dataType):
+        return self.data[dataType]
+
+    def __contains__(self, dataType):
+        return dataType in self.data
+
+    def isComplete(self):
+        return not self.missing
+
+
+# Codec
+class Codec:
+    """Message class of each DataType. Fixed size classes keep a precompiled struct.Struct
+    and decode with parseFrom(buffer, offset) / encode with packInto(buffer, offset).
+    """
+    def __init__(self):
+        self.d = dict.fromkeys(list(DataType))
+
+        self.d[DataType.Ping] = Ping
+        self.d[DataType.Ack] = Ack
+        self.d[DataType.Request] = Request
+        self.d[DataType.Passcode] = Passcode
+
+        self.d[DataType.Control] = Control
+        self.d[DataType.Command] = Command
+        self.d[DataType.Command2] = Command2
+        self.d[DataType.Command3] = Command3
+
+        self.d[DataType.LightMode] = LightMode
+        self.d[DataType.LightMode2] = LightMode2
+        self.d[DataType.LightModeCommand] = LightModeCommand
+        self.d[DataType.LightModeCommandIr] = LightModeCommandIr
+        self.d[DataType.LightModeColor] = LightModeColor
+        self.d[DataType.LightModeColor2] = LightModeColor2
+
+        self.d[DataType.LightEvent] = LightEvent
+        self.d[DataType.LightEvent2] = LightEvent2
+        self.d[DataType.LightEventCommand] = LightEventCommand
+        self.d[DataType.LightEventCommandIr] = LightEventCommandIr
+        self.d[DataType.LightEventColor] = LightEventColor
+        self.d[DataType.LightEventColor2] = LightEventColor2
+
+        self.d[DataType.LightModeDefaultColor] = LightModeDefaultColor
+        self.d[DataType.LightModeDefaultColor2] = LightModeDefaultColor2
+
+        self.d[DataType.Address] = Address
+        self.d[DataType.State] = State
+        self.d[DataType.Attitude] = Attitude
+        self.d[DataType.GyroBias] = GyroBias
+        self.d[DataType.TrimFlight] = TrimFlight
+        self.d[DataType.TrimDrive] = TrimDrive
+        self.d[DataType.TrimAll] = TrimAll
+
+        self.d[DataType.CountFlight] = CountFlight
+        self.d[DataType.CountDrive] = CountDrive
+        self.d[DataType.IrMessage] = IrMessage
+
+        self.d[DataType.Imu] = Imu
+        self.d[DataType.Pressure] = Pressure
+        self.d[DataType.ImageFlow] = ImageFlow
+        self.d[DataType.Button] = Button
+        self.d[DataType.Battery] = Battery
+        self.d[DataType.Motor] = Motor
+        self.d[DataType.Temperature] = Temperature
+        self.d[DataType.Range] = Range
+
+        self.d[DataType.UpdateLookupTarget] = UpdateLookupTarget
+        self.d[DataType.UpdateInformation] = UpdateInformation
+        self.d[DataType.UpdateLocationCorrect] = UpdateLocationCorrect
+
+        self.d[DataType.LinkState] = LinkState
+        self.d[DataType.LinkEvent] = LinkEvent
+        self.d[DataType.LinkEventAddress] = LinkEventAddress
+        self.d[DataType.LinkRssi] = LinkRssi
+        self.d[DataType.LinkDiscoveredDevice] = LinkDiscoveredDevice
+        self.d[DataType.LinkPasscode] = LinkPasscode
+
+    def parseFrom(self, dataType, buffer, offset=0):
+        """Decode the data of dataType at offset of buffer. Returns None for unknown types.
+        """
+        if self.d[dataType] is None:
+            return None
+
+        return self.d[dataType].parseFrom(buffer, offset)
+
+
 # Storage
 class Parser:
+    """parse function of each received DataType.
+
+    Receiver.scan() slices each payload out of its pending buffer once, as that buffer is compacted when scan()
+    returns and the payload outlives the call(history, subscribers, flight log). parse() checks the length and
+    decodes that slice with parseFrom() through struct.unpack_from, so there is no second copy.
+    """
+
     def __init__(self):
+        self.codec = Codec()
         self.d = dict.fromkeys(list(DataType))
 
-        self.d[DataType.Ping] = Ping.parse
-        self.d[DataType.Ack] = Ack.parse
-        self.d[DataType.Request] = Request.parse
-        self.d[DataType.Passcode] = Passcode.parse
-
-        self.d[DataType.Address] = Address.parse
-        self.d[DataType.State] = State.parse
-        self.d[DataType.Attitude] = Attitude.parse
-        self.d[DataType.GyroBias] = GyroBias.parse
-        self.d[DataType.TrimFlight] = TrimFlight.parse
-        self.d[DataType.TrimDrive] = TrimDrive.parse
-        self.d[DataType.TrimAll] = TrimAll.parse
-
-        self.d[DataType.CountFlight] = CountFlight.parse
-        self.d[DataType.CountDrive] = CountDrive.parse
-        self.d[DataType.IrMessage] = IrMessage.parse
-
-        self.d[DataType.Imu] = Imu.parse
-        self.d[DataType.Pressure] = Pressure.parse
-        self.d[DataType.ImageFlow] = ImageFlow.parse
-        self.d[DataType.Button] = Button.parse
-        self.d[DataType.Battery] = Battery.parse
-        self.d[DataType.Motor] = Motor.parse
-        self.d[DataType.Temperature] = Temperature.parse
-        self.d[DataType.Range] = Range.parse
-
-        self.d[DataType.UpdateInformation] = UpdateInformation.parse
-        self.d[DataType.UpdateLocationCorrect] = UpdateLocationCorrect.parse
-
-        self.d[DataType.LinkState] = LinkState.parse
-        self.d[DataType.LinkEvent] = LinkEvent.parse
-        self.d[DataType.LinkEventAddress] = LinkEventAddress.parse
-        self.d[DataType.LinkRssi] = LinkRssi.parse
-        self.d[DataType.LinkDiscoveredDevice] = LinkDiscoveredDevice.parse
-        self.d[DataType.LinkPasscode] = LinkPasscode.parse
+        # received data types
+        for dataType in (DataType.Ping, DataType.Ack, DataType.Request, DataType.Passcode,
+                         DataType.Address, DataType.State, DataType.Attitude, DataType.GyroBias,
+                         DataType.TrimFlight, DataType.TrimDrive, DataType.TrimAll,
+                         DataType.CountFlight, DataType.CountDrive, DataType.IrMessage,
+                         DataType.Imu, DataType.Pressure, DataType.ImageFlow, DataType.Button,
+                         DataType.Battery, DataType.Motor, DataType.Temperature, DataType.Range,
+                         DataType.UpdateInformation, DataType.UpdateLocationCorrect,
+                         DataType.LinkState, DataType.LinkEvent, DataType.LinkEventAddress,
+                         DataType.LinkRssi, DataType.LinkDiscoveredDevice, DataType.LinkPasscode):
+            self.d[dataType] = self.codec.d[dataType].parse
 
         self.d[DataType.Message] = Message.parse
-
@@ -0,0 +1,126 @@
+import argparse
+import sys
+from threading import Event, Thread
+from time import perf_counter, sleep
+
+from CoDrone.codrone import CoDrone
+from CoDrone.protocol import *
+from CoDrone.simulator import VirtualCoDrone
+
+
+def _worker(stop, counts, index, func):
+    while not stop.is_set():
+        func(counts[index])
+        counts[index] += 1
+
+
+def stress(duration=5.0, threads=3, joinTimeout=5.0):
+    """Call the library from several threads at once against the VirtualCoDrone.
+
+    Workers of each kind run for duration sec:
+        control: sendControl() with a different setpoint every call
+        getter: the sensor getters one after another
+        led: setArmRGB()/setEyeRGB()
+        flight: turnBy() and goToHeight(), interrupted by emergencyStop() from another thread
+
+    Checks:
+        interleaving: the simulator received no frame with a bad crc or length
+        deadlock: every worker stopped within joinTimeout sec after the run
+        progress: every worker finished at least one call
+        stop: emergencyStop() returned while a flight command held the flight lock
+
+    Returns: A dict with "passed" and the counters behind it.
+    """
+    getters = (CoDrone.getHeight, CoDrone.getGyroAngles, CoDrone.getBatteryPercentage, CoDrone.getPressure,
+               CoDrone.getAngularSpeed, CoDrone.getState)
+
+    with VirtualCoDrone(connected=True, rates={DataType.Attitude: 50}) as simulator:
+        drone = CoDrone()
+        drone.open(simulator.portName)
+        drone.takeoff()
+
+        def control(count):
+            drone.sendControl(0, 0, count % 20 - 10, 0)
+
+        def getter(count):
+            getters[count % len(getters)](drone)
+
+        def led(count):
+            if count % 2:
+                drone.setArmRGB(count % 256, 0, 0)
+            else:
+                drone.setEyeRGB(0, count % 256, 0)
+
+        stopLatency = []
+
+        def flight(count):
+            if count % 2:
+                drone.turnBy(45)
+                return
+
+            # emergencyStop() from another thread while goToHeight() holds the flight lock
+            timeStop = []
+            stopper = Thread(target=lambda: (sleep(0.3), timeStop.append(perf_counter()), drone.emergencyStop()))
+            stopper.start()
+            drone.goToHeight(1500)
+            stopper.join()
+            stopLatency.append(perf_counter() - timeStop[0])
+            drone.takeoff()
+
+        kinds = [("control", control), ("getter", getter), ("led", led)]
+        workers = [(name, func) for name, func in kinds for _ in range(threads)] + [("flight", flight)]
+
+        stop = Event()
+        counts = [0] * len(workers)
+        running = [Thread(target=_worker, args=(stop, counts, index, func), daemon=True)
+                   for index, (name, func) in enumerate(workers)]
+
+        for thread in running:
+            thread.start()
+        sleep(duration)
+        stop.set()
+
+        timeJoin = perf_counter() + joinTimeout
+        for thread in running:
+            thread.join(max(0.0, timeJoin - perf_counter()))
+        stuck = [workers[index][0] for index, thread in enumerate(running) if thread.is_alive()]
+
+        drone.land()
+        drone.close()
+
+        calls = {}
+        for (name, func), count in zip(workers, counts):
+            calls[name] = calls.get(name, 0) + count
+
+        result = {
+            "duration": duration,
+            "calls": calls,
+            "framesReceived": sum(simulator.countReceived.values()),
+            "framesBad": simulator.countErrors,
+            "receiveErrors": drone.metrics.receiveErrors,
+            "send": drone.getSendStats(),
+            "stuck": stuck,
+            "idle": [workers[index][0] for index, count in enumerate(counts) if count == 0],
+            "stopLatencyMax": max(stopLatency) if stopLatency else None,
+        }
+
+    result["passed"] = ((result["framesBad"] == 0) and (not result["stuck"]) and (not result["idle"]) and
+                        (bool(stopLatency)) and (result["stopLatencyMax"] < 1.0))
+    return result
+
+
+def main():
+    argumentParser = argparse.ArgumentParser(description="CoDrone multi-thread stress test against the simulator")
+    argumentParser.add_argument("--duration", type=float, default=5.0, help="seconds to run the workers")
+    argumentParser.add_argument("--threads", type=int, default=3, help="workers of each kind")
+    arguments = argumentParser.parse_args()
+
+    result = stress(arguments.duration, arguments.threads)
+    for name, value in result.items():
+        print("{0:16s} : {1}".format(name, value))
+
+    sys.exit(0 if result["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+from collections import deque
+from threading import Condition
+
+
+class Subscription:
+    """Updates of the DataTypes of CoDrone.subscribe(), delivered by the receiving thread as they arrive.
+
+    Every update goes to the callback if there is one, otherwise into a queue read with get() or by iterating.
+    If the reader is slower than the updates, the oldest ones are dropped. latest() returns the last data of a
+    DataType without waiting.
+
+    Examples:
+        >>> with drone.subscribe([DataType.Attitude, DataType.Range], 50) as subscription:
+        ...     for dataType, data in subscription:
+        ...         print(dataType, data)
+    """
+
+    def __init__(self, dataTypes, rate, callback=None, maxsize=64, cancel=None):
+        """
+        Args:
+            dataTypes: DataTypes to deliver.
+            rate: requests per second of each DataType, 0 to only receive what the drone streams.
+            callback: function(dataType, data) called on the receiving thread, it must return quickly.
+            maxsize: updates kept in the queue when there is no callback.
+            cancel: function(subscription) which removes it from the drone.
+        """
+        self.dataTypes = tuple(dataTypes)
+        self.rate = rate
+        self.callback = callback
+
+        self._queue = deque(maxlen=maxsize)
+        self._condition = Condition()
+        self._latest = dict.fromkeys(self.dataTypes)
+        self._cancel = cancel
+        self._flagActive = True
+
+        # statistics
+        self.countReceived = 0
+        self.countDropped = 0
+        self.lastError = None   # the last exception raised by the callback
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.cancel()
+
+    def __iter__(self):
+        """Yields: (DataType, data) until cancel(). Blocks while there is no update.
+        """
+        while True:
+            update = self.get()
+            if update is None:
+                return
+            yield update
+
+    def isActive(self):
+        return self._flagActive
+
+    def cancel(self):
+        """Stop the updates and the requests of this subscription. Iterators end after the queued updates.
+        """
+        if not self._flagActive:
+            return
+
+        self._flagActive = False
+        if self._cancel is not None:
+            self._cancel(self)
+
+        with self._condition:
+            self._condition.notify_all()
+
+    def latest(self, dataType=None):
+        """Returns: The last data of dataType(the first subscribed DataType if None), None before the first update.
+        """
+        return self._latest[self.dataTypes[0] if dataType is None else dataType]
+
+    def get(self, timeout=None):
+        """Take the oldest update from the queue.
+
+        Returns: (DataType, data), None on timeout or after cancel() once the queue is empty.
+        """
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._queue or not self._flagActive, timeout):
+                return None
+            return self._queue.popleft() if self._queue else None
+
+    def _deliver(self, dataType, data):
+        self._latest[dataType] = data
+        self.countReceived += 1
+
+        if self.callback is not None:
+            try:
+                self.callback(dataType, data)
+            except Exception as e:
+                self.lastError = e
+            return
+
+        with self._condition:
+            if len(self._queue) == self._queue.maxlen:
+                self.countDropped += 1
+            self._queue.append((dataType, data))
+            self._condition.notify_all()
@@ -1,6 +1,8 @@
 from enum import Enum
 
 class Flight:
+    __slots__ = ('ROLL', 'PITCH', 'YAW', 'THROTTLE')
+
     def __init__(self, roll, pitch, yaw, throttle):
         self.ROLL = roll
         self.PITCH = pitch
@@ -8,17 +10,23 @@ class Flight:
         self.THROTTLE = throttle
 
 class Position:
+    __slots__ = ('X', 'Y')
+
     def __init__(self, x, y):
         self.X = x
         self.Y = y
 
 class Angle:
+    __slots__ = ('ROLL', 'PITCH', 'YAW')
+
     def __init__(self, roll, pitch, yaw):
         self.ROLL = roll
         self.PITCH = pitch
         self.YAW = yaw
 
 class Axis:
+    __slots__ = ('X', 'Y', 'Z')
+
     def __init__(self, x, y, z):
         self.X = x
         self.Y = y
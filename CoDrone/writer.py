@@ -0,0 +1,179 @@
+from collections import deque
+from enum import Enum
+from threading import Condition, Thread
+
+
+class TransferPriority(Enum):
+    EmergencyStop = 0x00    # stop the motors
+    Control = 0x01          # roll, pitch, yaw, throttle
+    Request = 0x02          # requests, commands and settings
+    Led = 0x03              # light modes and events
+
+
+class FrameWriter:
+    """Single thread which writes the encoded frames to the serial port, so callers never block on a slow write
+    and frames from different threads never interleave.
+
+    Pending frames are written in order of TransferPriority, first in first out within a priority. A pending
+    Control frame is replaced by a newer one(only the latest setpoint matters), so a slow port does not build
+    up a backlog of stale controls.
+
+    Examples:
+        >>> writer = FrameWriter(serialport.write)
+        >>> writer.start()
+        >>> writer.send(dataArray, DataType.Control, TransferPriority.Control)
+        >>> future = writer.send(dataArray, DataType.Command, TransferPriority.Request, Future())
+        >>> future.result(0.1)     # True once written
+    """
+
+    def __init__(self, write, onWritten=None, onError=None):
+        """
+        Args:
+            write: function(dataArray) which writes to the port.
+            onWritten: function(dataType, dataArray) called after every write, from the writer thread.
+            onError: function(dataType, exception) called when a write raised, from the writer thread.
+        """
+        self._write = write
+        self._onWritten = onWritten
+        self._onError = onError
+
+        self._queues = tuple(deque() for _ in TransferPriority)    # [dataArray, dataType, futures] by priority
+        self._condition = Condition()
+        self._countPending = 0
+        self._flagWriting = False
+        self._thread = None
+        self._flagRun = False
+
+        # statistics
+        self.countWritten = 0
+        self.countCoalesced = 0
+        self.countErrors = 0
+        self.pendingMax = 0
+
+    def isRunning(self):
+        return self._flagRun
+
+    def start(self):
+        if self._flagRun:
+            return
+
+        self._flagRun = True
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=0.1):
+        """Write the pending frames for at most timeout sec, then stop the thread. Frames left are dropped.
+        """
+        if not self._flagRun:
+            return
+
+        self.flush(timeout)
+        with self._condition:
+            self._flagRun = False
+            self._condition.notify_all()
+        self._thread.join()
+        self._thread = None
+        self.clear()
+
+    def send(self, dataArray, dataType, priority=TransferPriority.Request, future=None):
+        """Queue a frame without waiting for the write.
+
+        Args:
+            dataArray: the encoded frame, it must not change after the call.
+            dataType: A member value in the DataType class, passed back to onWritten.
+            priority: A member value in the TransferPriority class.
+            future: A concurrent.futures.Future which gets True once the frame is written(or the exception of
+                the write), None to not be notified.
+
+        Returns: The future.
+        """
+        futures = [] if future is None else [future]
+
+        with self._condition:
+            queue = self._queues[priority.value]
+            if (priority == TransferPriority.Control) and queue:
+                entry = queue[-1]
+                entry[0] = dataArray
+                entry[1] = dataType
+                entry[2].extend(futures)
+                self.countCoalesced += 1
+            else:
+                queue.append([dataArray, dataType, futures])
+                self._countPending += 1
+                if self._countPending > self.pendingMax:
+                    self.pendingMax = self._countPending
+                self._condition.notify_all()
+
+        return future
+
+    def clear(self, priority=None):
+        """Drop the pending frames of priority, or every pending frame if None. Their futures are cancelled.
+        """
+        with self._condition:
+            queues = self._queues if priority is None else (self._queues[priority.value],)
+            for queue in queues:
+                while queue:
+                    for future in queue.popleft()[2]:
+                        future.cancel()
+                    self._countPending -= 1
+            self._condition.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until every pending frame is written.
+
+        Returns: True if the queue is empty, False on timeout.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: (self._countPending == 0 and not self._flagWriting) or
+                                            (not self._flagRun), timeout) and self._countPending == 0
+
+    def getPending(self):
+        return self._countPending
+
+    def getStats(self):
+        """Returns: A dict with the frames written, coalesced controls, write errors and the pending frames.
+        """
+        return {
+            "written": self.countWritten,
+            "coalesced": self.countCoalesced,
+            "errors": self.countErrors,
+            "pending": self._countPending,
+            "pendingMax": self.pendingMax,
+        }
+
+    def _pop(self):
+        for queue in self._queues:
+            if queue:
+                self._countPending -= 1
+                return queue.popleft()
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._flagWriting = False
+                self._condition.notify_all()
+                self._condition.wait_for(lambda: self._countPending or not self._flagRun)
+                if not self._flagRun:
+                    return
+                dataArray, dataType, futures = self._pop()
+                self._flagWriting = True
+
+            try:
+                self._write(dataArray)
+            except Exception as e:
+                self.countErrors += 1
+                for future in futures:
+                    if future.set_running_or_notify_cancel():
+                        future.set_exception(e)
+                if self._onError is not None:
+                    self._onError(dataType, e)
+                continue
+
+            self.countWritten += 1
+            if self._onWritten is not None:
+                self._onWritten(dataType, dataArray)
+
+            for future in futures:
+                if future.set_running_or_notify_cancel():
+                    future.set_result(True)
@@ -28,5 +28,5 @@ setup(
     install_requires=install_requires,
     setup_requires=setup_requires,
     dependency_links=dependency_links,
-    python_requires='>=3',
+    python_requires='>=3.8',
     )